@@ -1,26 +1,196 @@
 from __future__ import annotations
 
-from collections.abc import Generator
+import time
+from collections.abc import AsyncGenerator, Generator
+from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 
-from api.settings import get_settings
+from api.services.metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_PINGS,
+    DB_POOL_TIMEOUTS,
+    instrument_engine,
+    metrics,
+)
+from api.settings import Settings, get_settings
 
 settings = get_settings()
 
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+# Driver async por dialecto cuando ASYNC_DATABASE_URL no se indica (psycopg 3 ya es async).
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+}
+
+# Engines por nombre (`sync`, `async`) cuyo pool se expone en métricas y /api/admin/ops/cache. Se guarda el
+# engine y no el pool: `dispose()` lo sustituye por uno nuevo.
+_engines: dict[str, Engine] = {}
+
+
+class _InstrumentedPoolMixin:
+    """Cronometra cada checkout y cuenta los que agotan `pool_timeout` con el pool lleno."""
+
+    pool_label = "sync"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(self.pool_label)
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, self.pool_label)
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pool_label = "sync"
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pool_label = "async"
+
+
+def _install_idle_pre_ping(pool: Pool, label: str, idle_seconds: float) -> None:
+    """Ping (`SELECT 1`) solo si la conexión lleva más de `idle_seconds` en el pool.
+
+    `pool_pre_ping=True` hace un ida y vuelta en cada checkout; las conexiones que el servidor o un
+    balanceador cierran son las que llevan rato paradas, así que con tráfico sostenido no hay pings.
+    Si el ping falla, `DisconnectionError` hace que el pool descarte la conexión y abra otra.
+    """
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as error:
+            DB_POOL_PINGS.inc(label, "failed")
+            raise exc.DisconnectionError("Conexion inactiva cerrada por el servidor") from error
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        DB_POOL_PINGS.inc(label, "ok")
+
+
+def pool_engine_kwargs(url: str, config: Settings, *, asynchronous: bool = False) -> dict[str, Any]:
+    """Pool de `create_engine` / `create_async_engine` según los `DB_POOL_*` de `config`.
+
+    SQLite en memoria conserva el pool propio del dialecto (una conexión por hilo o compartida).
+    """
+    strategy = config.db_pool_pre_ping
+    if strategy not in PRE_PING_STRATEGIES:
+        raise ValueError(f"DB_POOL_PRE_PING debe ser uno de {PRE_PING_STRATEGIES}: {strategy!r}")
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {"pool_pre_ping": strategy == "always"}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": config.db_pool_size,
+        "max_overflow": config.db_max_overflow,
+        "pool_timeout": config.db_pool_timeout_seconds,
+        "pool_recycle": config.db_pool_recycle_seconds,
+        "pool_pre_ping": strategy == "always",
+    }
+
+
+def _register_pool(label: str, sync_engine: Engine, config: Settings) -> None:
+    if config.db_pool_pre_ping == "idle":
+        # Los listeners del pool se conservan cuando `dispose()` lo recrea.
+        _install_idle_pre_ping(sync_engine.pool, label, config.db_pool_pre_ping_idle_seconds)
+    _engines[label] = sync_engine
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    stats = {}
+    for label, sync_engine in _engines.items():
+        pool = sync_engine.pool
+        if not isinstance(pool, QueuePool):
+            stats[label] = {"pool": type(pool).__name__}
+            continue
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        stats[label] = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+        }
+    return stats
+
+
+def warm_pool(size: int | None = None) -> int:
+    """Abre `size` conexiones (por defecto DB_POOL_SIZE) y las deja libres en el pool del engine sync.
+
+    Así las primeras peticiones tras el arranque no pagan el connect (TCP + TLS + auth en Postgres).
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    connections = []
+    try:
+        for _ in range(size if size is not None else settings.db_pool_size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def _pool_gauge(field: str) -> dict[tuple[str, ...], float]:
+    return {(label,): values[field] for label, values in pool_stats().items() if field in values}
+
+
+metrics.callback(
+    "iei_db_pool_checked_out",
+    "Conexiones prestadas ahora mismo.",
+    lambda: _pool_gauge("checked_out"),
+    labels=("pool",),
+)
+metrics.callback("iei_db_pool_idle", "Conexiones libres en el pool.", lambda: _pool_gauge("idle"), labels=("pool",))
+metrics.callback(
+    "iei_db_pool_saturation",
+    "Prestadas / (DB_POOL_SIZE + DB_MAX_OVERFLOW); a 1 los checkouts esperan.",
+    lambda: _pool_gauge("saturation"),
+    labels=("pool",),
+)
+
 engine_kwargs = {
     "future": True,
-    "pool_pre_ping": True,
+    **pool_engine_kwargs(settings.database_url, settings),
 }
 
 if settings.database_url.startswith("sqlite"):
     engine_kwargs["connect_args"] = {"check_same_thread": False}
 
 engine = create_engine(settings.database_url, **engine_kwargs)
+instrument_engine(engine)
+_register_pool("sync", engine, settings)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
 
 def get_db() -> Generator:
     db = SessionLocal()
@@ -28,3 +198,43 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+def async_database_url(url: str | None = None) -> str:
+    """URL del engine async: ASYNC_DATABASE_URL o DATABASE_URL con el driver async del dialecto."""
+    if url is None:
+        if settings.async_database_url:
+            return settings.async_database_url
+        url = settings.database_url
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in _ASYNC_DRIVERS:
+        raise ValueError(f"Sin driver async conocido para {scheme!r}; define ASYNC_DATABASE_URL")
+    return f"{_ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Engine y sessionmaker async, creados al primer uso (con DB_ASYNC=false nunca se crean)."""
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        url = async_database_url()
+        _async_engine = create_async_engine(url, **pool_engine_kwargs(url, settings, asynchronous=True))
+        instrument_engine(_async_engine.sync_engine)
+        _register_pool("async", _async_engine.sync_engine, settings)
+        # expire_on_commit=False: tras el commit no hay lazy loads (en async fallarían fuera de un await).
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
+    _engines.pop("async", None)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -3,12 +3,16 @@ from __future__ import annotations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.db import Base, SessionLocal, engine
+from api.db import dispose_async_engine
 from api.errors import register_exception_handlers
-from api.middleware.rate_limit import SimpleRateLimitMiddleware
+from api.middleware.db_profile import DbProfileMiddleware
+from api.middleware.metrics import MetricsMiddleware
+from api.middleware.rate_limit import RateLimitMiddleware
 from api.middleware.request_id import RequestIDMiddleware
-from api.routes import admin_auth, admin_leads, admin_zones, events, iei, leads, privacy
-from api.services.zone_service import ZoneService
+from api.routes import admin_auth, admin_leads, admin_ops, admin_zones, events, iei, leads, metrics, privacy
+from api.services.event_queue import event_queue
+from api.services.reservation_sweeper import reservation_sweeper
+from api.services.startup import run_startup
 from api.settings import get_settings
 
 settings = get_settings()
@@ -16,7 +20,12 @@ settings = get_settings()
 app = FastAPI(title=settings.app_name)
 
 app.add_middleware(RequestIDMiddleware)
-app.add_middleware(SimpleRateLimitMiddleware)
+app.add_middleware(RateLimitMiddleware)
+if settings.db_profile_headers:
+    app.add_middleware(DbProfileMiddleware)
+if settings.metrics_enabled:
+    # Por fuera del rate limit para que los 429 también se midan; `app.routes` se rellena más abajo.
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -32,18 +41,26 @@ app.include_router(leads.router)
 app.include_router(admin_auth.router)
 app.include_router(admin_leads.router)
 app.include_router(admin_zones.router)
+app.include_router(admin_ops.router)
 app.include_router(events.router)
 app.include_router(privacy.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        ZoneService.ensure_default_zones(db)
-    finally:
-        db.close()
+    run_startup()
+    reservation_sweeper.start()
+    event_queue.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    reservation_sweeper.stop()
+    event_queue.stop()
+    # Con DB_ASYNC, cierra las conexiones del pool async dentro del event loop que las abrió.
+    await dispose_async_engine()
 
 
 @app.get("/health")
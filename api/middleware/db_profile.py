@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from api.services.metrics import RequestDbStats, request_db_stats
+
+
+class DbProfileMiddleware:
+    """Cabeceras de depuración con el SQL de la petición (`DB_PROFILE_HEADERS=true`), ASGI puro:
+
+    - `x-db-queries`: sentencias ejecutadas.
+    - `x-db-time-ms`: tiempo total en la DB.
+    - `x-db-duplicate-queries`: ejecuciones que repiten una forma de SQL ya vista (N+1).
+
+    Cuentan lo ejecutado hasta enviar las cabeceras (en una respuesta en streaming, lo previo al primer
+    trozo). Reutiliza el acumulador de `MetricsMiddleware` si está por fuera; si no, abre el suyo.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = request_db_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestDbStats()
+            token = request_db_stats.set(stats)
+        stats.statements = {}
+
+        async def send_with_db_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.queries).encode("latin-1")))
+                headers.append((b"x-db-time-ms", f"{stats.seconds * 1000:.3f}".encode("latin-1")))
+                headers.append((b"x-db-duplicate-queries", str(stats.duplicates).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_db_headers)
+        finally:
+            if token is not None:
+                request_db_stats.reset(token)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import time
+
+from starlette.routing import Match
+
+from api.services.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_SECONDS_PER_REQUEST,
+    HTTP_REQUEST_SECONDS,
+    RequestDbStats,
+    request_db_stats,
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Latencia por plantilla de ruta (`/api/admin/leads/{lead_id}`, no la URL concreta) y consultas SQL
+    por petición, como middleware ASGI puro.
+
+    La plantilla la deja FastAPI en `scope["route"]` al enrutar; si la petición no llega al router (429 del
+    rate limit) se resuelve contra `routes`, y lo que no casa con ninguna se agrupa en `<unmatched>` para
+    que las URLs arbitrarias no creen series nuevas.
+    """
+
+    def __init__(self, app, routes: list | None = None):
+        self.app = app
+        self.routes = routes if routes is not None else []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+        db_stats = RequestDbStats()
+        token = request_db_stats.set(db_stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_db_stats.reset(token)
+            route = self._route_template(scope)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route, str(status))
+            DB_QUERIES_PER_REQUEST.observe(db_stats.queries, route)
+            DB_SECONDS_PER_REQUEST.observe(db_stats.seconds, route)
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        for candidate in self.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                return candidate.path
+        return UNMATCHED_ROUTE
@@ -1,57 +1,296 @@
 from __future__ import annotations
 
+import importlib
+import json
+import math
+import sqlite3
 import threading
 import time
-from collections import defaultdict, deque
-
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from typing import Protocol
 
+from api.errors import error_payload
+from api.services.metrics import RATE_LIMIT_REJECTIONS
 from api.settings import get_settings
-from api.utils.ip_hash import request_ip_hash
+from api.utils.ip_hash import hash_ip, scope_client_ip
+
+RATE_LIMIT_PERIOD_SECONDS = 60.0
+# Cada cuántas operaciones de un shard se purgan las claves ya inactivas.
+SWEEP_EVERY = 1024
+# Espera máxima por el lock del fichero SQLite: `hit()` se llama desde el event loop.
+SQLITE_BUSY_TIMEOUT_SECONDS = 0.005
+
+
+class RateLimitBackend(Protocol):
+    """Estado del rate limit. `hit()` devuelve 0.0 si la petición pasa o los segundos hasta poder reintentar.
+
+    Implementaciones: `GcraRateLimiter` (memoria del proceso), `SqliteRateLimiter` (fichero compartido por
+    los workers de un host) o una externa vía `RATE_LIMIT_BACKEND=paquete.modulo:Fabrica` (p.ej. un store
+    de red compartido por varios hosts).
+    """
+
+    def hit(self, key: str, limit: int, now: float | None = None) -> float: ...
+
+    def reset(self) -> None: ...
+
+    def stats(self) -> dict[str, int | str]: ...
+
+
+class _Shard:
+    __slots__ = ("lock", "entries", "ops")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # clave -> TAT (theoretical arrival time). Orden de inserción = orden de último uso.
+        self.entries: dict[str, float] = {}
+        self.ops = 0
+
+
+class GcraRateLimiter:
+    """Rate limit GCRA: un float por clave activa, sin historial de timestamps.
+
+    Con `limit` peticiones por `period`, cada petición adelanta el TAT de la clave `period / limit`
+    segundos; se rechaza si eso lo deja más de `period` por delante de ahora (ráfaga máxima = `limit`).
+    Una clave con TAT pasado equivale a una clave nueva, así que se puede olvidar sin cambiar el
+    resultado: las inactivas se purgan por shard y, bajo inundación, `RATE_LIMIT_MAX_KEYS` acota la
+    memoria expulsando las de uso más antiguo. El estado se reparte en `RATE_LIMIT_SHARDS` shards con su
+    propio lock.
+    """
+
+    def __init__(
+        self,
+        *,
+        period: float = RATE_LIMIT_PERIOD_SECONDS,
+        max_keys: int | None = None,
+        shards: int | None = None,
+    ):
+        settings = get_settings()
+        shard_count = 1 << max(0, (shards or settings.rate_limit_shards) - 1).bit_length()
+        self.period = period
+        self.max_keys = max_keys or settings.rate_limit_max_keys
+        self._mask = shard_count - 1
+        self._shard_max_keys = max(1, math.ceil(self.max_keys / shard_count))
+        self._shards = [_Shard() for _ in range(shard_count)]
+        self.allowed = 0
+        self.limited = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def hit(self, key: str, limit: int, now: float | None = None) -> float:
+        """Registra una petición; devuelve 0.0 si pasa o los segundos hasta poder reintentar."""
+        now = time.monotonic() if now is None else now
+        if limit <= 0:
+            self.limited += 1
+            return self.period
+
+        interval = self.period / limit
+        shard = self._shards[hash(key) & self._mask]
+        with shard.lock:
+            entries = shard.entries
+            # pop + reinserción: la clave pasa al final (más reciente) en O(1).
+            tat = entries.pop(key, now)
+            if tat < now:
+                tat = now
+            new_tat = tat + interval
+            retry_after = new_tat - now - self.period
+            entries[key] = tat if retry_after > 0 else new_tat
+
+            shard.ops += 1
+            if shard.ops >= SWEEP_EVERY or len(entries) > self._shard_max_keys:
+                self._sweep(shard, now)
+
+        if retry_after > 0:
+            self.limited += 1
+            return retry_after
+        self.allowed += 1
+        return 0.0
+
+    def _sweep(self, shard: _Shard, now: float) -> None:
+        """Con el lock del shard tomado: purga desde la clave de uso más antiguo."""
+        shard.ops = 0
+        entries = shard.entries
+        while entries:
+            key = next(iter(entries))
+            if entries[key] > now:
+                break
+            del entries[key]
+            self.expired += 1
+        while len(entries) > self._shard_max_keys:
+            del entries[next(iter(entries))]
+            self.evicted += 1
+
+    def reset(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.ops = 0
 
+    def stats(self) -> dict[str, int | str]:
+        return {
+            "backend": "memory",
+            "keys": sum(len(shard.entries) for shard in self._shards),
+            "max_keys": self.max_keys,
+            "shards": len(self._shards),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
 
-class SimpleRateLimitMiddleware(BaseHTTPMiddleware):
-    _lock = threading.Lock()
-    _hits: dict[str, deque[float]] = defaultdict(deque)
 
-    async def dispatch(self, request, call_next):
-        path = request.url.path
+class SqliteRateLimiter:
+    """GCRA sobre un fichero SQLite en modo WAL: un único contador para todos los workers del host.
 
-        # Endpoints administrativos y health fuera del rate limit MVP.
+    Cada `hit()` es un solo UPSERT condicional (autocommit, `synchronous=OFF`: el estado es efímero y
+    perderlo en un corte solo relaja el límite unos segundos). Usa reloj de pared, común a los procesos.
+    Si el fichero sigue bloqueado tras `SQLITE_BUSY_TIMEOUT_SECONDS`, decide con un `GcraRateLimiter` en
+    memoria (por proceso) en vez de bloquear el event loop.
+    """
+
+    SWEEP_EVERY = 10_000
+
+    def __init__(self, path: str | None = None, *, period: float = RATE_LIMIT_PERIOD_SECONDS):
+        self.path = path or get_settings().rate_limit_sqlite_path
+        self.period = period
+        self._local = threading.local()
+        self._ops = 0
+        self.allowed = 0
+        self.limited = 0
+        self.expired = 0
+        self.fallbacks = 0
+        self._fallback = GcraRateLimiter()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=off")
+            conn.execute("create table if not exists rate_limit (key text primary key, tat real not null) without rowid")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: int, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        if limit <= 0:
+            self.limited += 1
+            return self.period
+
+        interval = self.period / limit
+        try:
+            conn = self._connection()
+            # Nueva clave: siempre pasa (interval <= period). Existente: solo avanza el TAT si cabe en la ráfaga.
+            row = conn.execute(
+                "insert into rate_limit (key, tat) values (?1, ?2 + ?3) "
+                "on conflict (key) do update set tat = max(tat, ?2) + ?3 "
+                "where max(tat, ?2) + ?3 - ?2 <= ?4 "
+                "returning tat",
+                (key, now, interval, self.period),
+            ).fetchone()
+
+            self._ops += 1
+            if self._ops >= self.SWEEP_EVERY:
+                self._ops = 0
+                self.expired += conn.execute("delete from rate_limit where tat <= ?", (now,)).rowcount
+
+            current = None if row is not None else conn.execute("select tat from rate_limit where key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            # Fichero bloqueado por otro worker (o inaccesible): límite por proceso para esta petición.
+            self.fallbacks += 1
+            return self._fallback.hit(key, limit, now)
+
+        if row is not None:
+            self.allowed += 1
+            return 0.0
+        self.limited += 1
+        return max(current[0] + interval - now - self.period, 0.001) if current else 0.001
+
+    def reset(self) -> None:
+        self._connection().execute("delete from rate_limit")
+
+    def stats(self) -> dict[str, int | str]:
+        return {
+            "backend": "sqlite",
+            "keys": self._connection().execute("select count(*) from rate_limit").fetchone()[0],
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "expired": self.expired,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def build_rate_limiter(backend: str | None = None) -> RateLimitBackend:
+    """`RATE_LIMIT_BACKEND`: `memory`, `sqlite` o `paquete.modulo:Fabrica` (se llama sin argumentos)."""
+    backend = backend or get_settings().rate_limit_backend
+    if backend == "memory":
+        return GcraRateLimiter()
+    if backend == "sqlite":
+        return SqliteRateLimiter()
+    module_name, sep, attr = backend.partition(":")
+    if not sep:
+        raise ValueError(f"RATE_LIMIT_BACKEND desconocido: {backend!r}")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+rate_limiter = build_rate_limiter()
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI puro (sin `BaseHTTPMiddleware`): decide con el scope y no envuelve la respuesta."""
+
+    def __init__(self, app, limiter: RateLimitBackend | None = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+
+        # Endpoints administrativos y health fuera del rate limit MVP. `/metrics` sigue dentro: frena
+        # la fuerza bruta sobre `METRICS_TOKEN` y un scraper cada 15 s queda muy por debajo del límite.
         if path.startswith("/api/admin") or path == "/health":
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         settings = get_settings()
-        ip_hash = request_ip_hash(request)
+        ip_hash = hash_ip(scope_client_ip(scope))
 
         limit = settings.rate_limit_per_minute
-        session_id = request.headers.get("x-session-id", "").strip()
         if path == "/api/leads":
             limit = settings.rate_limit_leads_per_minute
+            session_id = ""
+            for name, value in scope["headers"]:
+                if name == b"x-session-id":
+                    session_id = value.decode("latin-1").strip()
+                    break
             key = f"{ip_hash}:{session_id or 'no-session'}:{path}"
         else:
             key = f"{ip_hash}:{path}"
 
-        window_start = time.time() - 60.0
-
-        with self._lock:
-            queue = self._hits[key]
-            while queue and queue[0] < window_start:
-                queue.popleft()
+        retry_after = self.limiter.hit(key, limit)
+        if retry_after > 0:
+            RATE_LIMIT_REJECTIONS.inc("leads" if path == "/api/leads" else "default")
+            await _send_rate_limited(send, path, retry_after)
+            return
 
-            if len(queue) >= limit:
-                return JSONResponse(
-                    status_code=429,
-                    content={
-                        "error": {
-                            "code": "RATE_LIMITED",
-                            "message": "Demasiadas solicitudes para este endpoint.",
-                            "details": {"path": path},
-                        }
-                    },
-                )
+        await self.app(scope, receive, send)
 
-            queue.append(time.time())
 
-        return await call_next(request)
+async def _send_rate_limited(send, path: str, retry_after: float) -> None:
+    body = json.dumps(
+        error_payload("RATE_LIMITED", "Demasiadas solicitudes para este endpoint.", {"path": path})
+    ).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(math.ceil(retry_after)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
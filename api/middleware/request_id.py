@@ -2,14 +2,35 @@ from __future__ import annotations
 
 import uuid
 
-from starlette.middleware.base import BaseHTTPMiddleware
 
+class RequestIDMiddleware:
+    """Propaga `x-request-id` (o genera uno) como middleware ASGI puro: solo añade la cabecera al
+    `http.response.start`, sin envolver el cuerpo, así que las respuestas en streaming pasan intactas."""
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
-        request.state.request_id = request_id
+    def __init__(self, app):
+        self.app = app
 
-        response = await call_next(request)
-        response.headers["x-request-id"] = request_id
-        return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id:
+            request_id = str(uuid.uuid4())
+        # Visible como `request.state.request_id` en las rutas.
+        scope.setdefault("state", {})["request_id"] = request_id
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = [item for item in message.get("headers", []) if item[0] != b"x-request-id"]
+                headers.append(header)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
@@ -1,6 +1,20 @@
 from __future__ import annotations
 
-from sqlalchemy import JSON, Boolean, CheckConstraint, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    CheckConstraint,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    text,
+)
 from sqlalchemy.sql import func
 
 from api.db import Base
@@ -146,6 +160,16 @@ class Zone(Base):
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
 
+class ZonesVersion(Base):
+    __tablename__ = "zones_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (CheckConstraint("id = 1", name="ck_zones_version_singleton"),)
+
+
 class Agency(Base):
     __tablename__ = "agencies"
 
@@ -198,6 +222,16 @@ class Event(Base):
 
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
+    __table_args__ = (
+        Index(
+            "uq_events_submit_lead",
+            "lead_id",
+            unique=True,
+            postgresql_where=text("event_name = 'submit_lead' and lead_id is not null"),
+            sqlite_where=text("event_name = 'submit_lead' and lead_id is not null"),
+        ),
+    )
+
 
 class PrivacyDeleteRequest(Base):
     __tablename__ = "privacy_delete_requests"
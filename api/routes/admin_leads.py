@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import codecs
+from collections.abc import Iterator
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, Query, Response
+import anyio
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from api.db import get_db
+from api.errors import ApiException
 from api.schemas import (
     AdminLeadListResponseSchema,
     AgenciesListResponseSchema,
+    LeadImportResponseSchema,
     ReleaseReservationRequestSchema,
     ReleaseReservationResponseSchema,
     ReserveLeadRequestSchema,
@@ -20,7 +27,9 @@ from api.schemas import (
 )
 from api.services.auth_service import require_admin
 from api.services.commercial_service import CommercialService
+from api.services.lead_import import IMPORT_FORMATS, LeadImportService, iter_records
 from api.services.lead_service import LeadService
+from api.utils.ip_hash import request_ip_hash
 
 router = APIRouter(prefix="/api/admin", tags=["admin-leads"])
 
@@ -48,6 +57,8 @@ def list_leads(
     date_to: str | None = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    include_total: bool = True,
     _: None = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
@@ -61,9 +72,59 @@ def list_leads(
         date_to=parse_optional_datetime(date_to),
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        include_total=include_total,
     )
 
 
+def _body_lines(request: Request) -> Iterator[str]:
+    """Líneas del body leídas de forma incremental; se consume desde un hilo del threadpool."""
+    stream = request.stream().__aiter__()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            break
+        # Solo "\n" separa filas: `splitlines()` también corta en \x0b, \x0c, \x1c-\x1e, \x85, U+2028 y
+        # U+2029, que son válidos dentro de un string NDJSON o de un campo CSV.
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line.removesuffix("\r") + "\n"
+    tail = pending + decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+@router.post("/leads/import", response_model=LeadImportResponseSchema)
+async def import_leads(
+    request: Request,
+    import_format: str | None = Query(None, alias="format"),
+    chunk_size: int | None = Query(None, ge=1, le=5000),
+    _: None = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    content_type = request.headers.get("content-type", "")
+    import_format = import_format or ("csv" if "csv" in content_type else "ndjson")
+    if import_format not in IMPORT_FORMATS:
+        raise ApiException(
+            status_code=400,
+            code="VALIDATION_ERROR",
+            message="Formato de importacion no soportado.",
+            details={"field": "format", "allowed": list(IMPORT_FORMATS)},
+        )
+
+    report = await run_in_threadpool(
+        LeadImportService.import_records,
+        db,
+        iter_records(_body_lines(request), import_format),
+        chunk_size=chunk_size,
+        ip_hash=request_ip_hash(request),
+    )
+    return report.as_dict()
+
+
 @router.get("/leads/{lead_id}")
 def lead_detail(
     lead_id: str,
@@ -122,18 +183,16 @@ def export_sales_csv(
     agency_id: str | None = None,
     tier: str | None = None,
     _: None = Depends(require_admin),
-    db: Session = Depends(get_db),
 ):
-    csv_text = CommercialService.export_sales_csv(
-        db,
+    chunks = CommercialService.iter_sales_csv(
         date_from=parse_optional_datetime(date_from),
         date_to=parse_optional_datetime(date_to),
         zone_key=zone_key,
         agency_id=agency_id,
         tier=tier,
     )
-    return Response(
-        content=csv_text,
+    return StreamingResponse(
+        chunks,
         media_type="text/csv; charset=utf-8",
         headers={"Content-Disposition": "attachment; filename=sales_export.csv"},
     )
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+
+from api.db import pool_stats
+from api.middleware.rate_limit import rate_limiter
+from api.services.auth_service import require_admin
+from api.services.event_queue import event_queue
+from api.services.reservation_sweeper import reservation_sweeper
+from api.services.score_cache import score_cache
+from api.services.startup import startup_stats
+from api.services.zone_registry import zone_registry
+
+router = APIRouter(prefix="/api/admin/ops", tags=["admin-ops"])
+
+
+@router.get("/cache")
+def cache_stats(_: None = Depends(require_admin)):
+    return {
+        "score_cache": score_cache.stats(),
+        "zone_registry": zone_registry.stats(),
+        "reservation_sweeper": reservation_sweeper.stats(),
+        "event_queue": event_queue.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "db_pool": pool_stats(),
+        "startup": startup_stats(),
+    }
@@ -1,20 +1,18 @@
 from __future__ import annotations
 
-from uuid import uuid4
+from uuid import UUID
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter
 
-from api.db import get_db
 from api.errors import ApiException
-from api.models import Event
 from api.schemas import EventRequestSchema, EventResponseSchema
+from api.services.event_queue import event_queue
 
 router = APIRouter(prefix="/api", tags=["events"])
 
 
-@router.post("/events", response_model=EventResponseSchema)
-def track_event(payload: EventRequestSchema, db: Session = Depends(get_db)):
+@router.post("/events", response_model=EventResponseSchema, status_code=202)
+async def track_event(payload: EventRequestSchema):
     if not payload.session_id:
         raise ApiException(
             status_code=400,
@@ -23,25 +21,26 @@ def track_event(payload: EventRequestSchema, db: Session = Depends(get_db)):
             details={"field": "session_id"},
         )
 
-    if payload.event_name == "submit_lead" and payload.lead_id:
-        existing = (
-            db.query(Event)
-            .filter(Event.event_name == "submit_lead", Event.lead_id == payload.lead_id)
-            .first()
-        )
-        if existing:
-            return {"ok": True, "deduplicated": True}
-
-    row = Event(
-        id=str(uuid4()),
+    lead_id = payload.lead_id
+    if lead_id is not None:
+        # `events.lead_id` es uuid en Postgres: un valor inválido haría fallar el INSERT de todo el lote.
+        try:
+            lead_id = str(UUID(lead_id))
+        except ValueError:
+            raise ApiException(
+                status_code=400,
+                code="VALIDATION_ERROR",
+                message="lead_id debe ser un UUID.",
+                details={"field": "lead_id"},
+            ) from None
+
+    # Se acepta sin tocar la DB: los `submit_lead` repetidos los corta el LRU de la cola y, si se escapan,
+    # el índice único parcial al volcar.
+    deduplicated = event_queue.submit(
         event_name=payload.event_name,
         event_version=payload.event_version,
         session_id=payload.session_id,
-        lead_id=payload.lead_id,
-        payload_json=payload.payload,
+        lead_id=lead_id,
+        payload=payload.payload,
     )
-
-    db.add(row)
-    db.commit()
-
-    return {"ok": True, "deduplicated": False}
+    return {"ok": True, "deduplicated": deduplicated, "queued": not deduplicated}
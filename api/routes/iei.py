@@ -1,21 +1,60 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Response
 
-from api.db import get_db
-from api.schemas import IEIResultSchema, LeadInputSchema
-from api.services.iei_service import compute_pricing_from_result, get_framework_metadata, score_lead
+from api.errors import ApiException
+from api.schemas import IEIResultSchema, LeadInputSchema, ScoreBatchRequestSchema, ScoreBatchResponseSchema
+from api.services.iei_service import compute_pricing_from_result, get_framework_metadata, score_lead, score_leads_batch
+from api.services.score_cache import canonical_input_hash, score_cache
+from api.services.score_token import issue_score_token
+from api.services.zone_service import ZoneService
+from api.settings import get_settings
 from api.utils.validation import validate_lead_input
 
 router = APIRouter(prefix="/api/iei", tags=["iei"])
 
 
-@router.post("/score", response_model=IEIResultSchema)
-def score(payload: LeadInputSchema, db: Session = Depends(get_db)):
+def score(payload: LeadInputSchema):
+    return _score_response(payload)
+
+
+async def score_async(payload: LeadInputSchema):
+    """Con DB_ASYNC: el scoring solo lee el snapshot de zonas en memoria, así que no abre sesión ni pasa
+    por el threadpool (salvo la primera carga del registro)."""
+    await ZoneService.ensure_snapshot_loaded()
+    return _score_response(payload)
+
+
+router.add_api_route(
+    "/score",
+    score_async if get_settings().db_async else score,
+    methods=["POST"],
+    response_model=IEIResultSchema,
+)
+
+
+def _score_response(payload: LeadInputSchema) -> Response:
     validate_lead_input(payload)
-    _, _, result = score_lead(db, payload)
-    pricing = compute_pricing_from_result(db, payload, result)
+
+    settings = get_settings()
+    snapshot = ZoneService.snapshot()
+    zones_version = ZoneService.zones_version(snapshot)
+
+    cache_key = None
+    if settings.score_cache_enabled:
+        cache_key = score_cache.key_for(payload, zones_version)
+        cached = score_cache.get(cache_key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+
+    _, _, result = score_lead(payload, snapshot=snapshot)
+    pricing = compute_pricing_from_result(payload, result, snapshot=snapshot)
+    score_token = issue_score_token(
+        input_hash=canonical_input_hash(payload),
+        zones_version=zones_version,
+        result=result,
+        pricing=pricing,
+    )
     result["pricing"] = {
         "lead_price_eur": pricing["lead_price_eur"],
         "segment": pricing["segment"],
@@ -25,4 +64,25 @@ def score(payload: LeadInputSchema, db: Session = Depends(get_db)):
     framework = get_framework_metadata()
     if framework:
         result["iei_framework"] = framework
-    return result
+    result["score_token"] = score_token
+
+    body = IEIResultSchema.model_validate(result).model_dump_json().encode("utf-8")
+    if cache_key is not None:
+        score_cache.put(cache_key, body)
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/score:batch", response_model=ScoreBatchResponseSchema)
+def score_batch(payload: ScoreBatchRequestSchema):
+    settings = get_settings()
+    if len(payload.items) > settings.score_batch_max_items:
+        raise ApiException(
+            status_code=400,
+            code="VALIDATION_ERROR",
+            message=f"Maximo {settings.score_batch_max_items} items por lote.",
+            details={"field": "items", "max_items": settings.score_batch_max_items},
+        )
+
+    items = score_leads_batch(payload.items)
+    scored = sum(1 for item in items if item["ok"])
+    return {"items": items, "scored": scored, "failed": len(items) - scored}
@@ -1,29 +1,21 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from api.db import get_db
+from api.db import get_async_db, get_db
 from api.errors import ApiException
 from api.schemas import LeadCreateRequestSchema, LeadCreateResponseSchema, LeadDuplicateResponseSchema
 from api.services.lead_service import LeadService
+from api.settings import get_settings
 from api.utils.ip_hash import request_ip_hash
 from api.utils.validation import validate_lead_input
 
 router = APIRouter(prefix="/api", tags=["leads"])
 
 
-@router.post(
-    "/leads",
-    response_model=LeadCreateResponseSchema | LeadDuplicateResponseSchema,
-    status_code=status.HTTP_201_CREATED,
-)
-def create_lead(
-    payload: LeadCreateRequestSchema,
-    request: Request,
-    response: Response,
-    db: Session = Depends(get_db),
-):
+def _check_lead_request(payload: LeadCreateRequestSchema) -> None:
     if payload.company_website and payload.company_website.strip():
         raise ApiException(
             status_code=400,
@@ -33,8 +25,41 @@ def create_lead(
         )
 
     validate_lead_input(payload.input)
+
+
+def create_lead(
+    payload: LeadCreateRequestSchema,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
+    _check_lead_request(payload)
     ip_hash = request_ip_hash(request)
     result = LeadService.create_lead(db, payload, ip_hash=ip_hash)
     if result.get("duplicate") is True:
         response.status_code = status.HTTP_200_OK
     return result
+
+
+async def create_lead_async(
+    payload: LeadCreateRequestSchema,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Con DB_ASYNC: corre en el event loop y no ocupa un token del threadpool mientras espera a la DB."""
+    _check_lead_request(payload)
+    ip_hash = request_ip_hash(request)
+    result = await LeadService.create_lead_async(db, payload, ip_hash=ip_hash)
+    if result.get("duplicate") is True:
+        response.status_code = status.HTTP_200_OK
+    return result
+
+
+router.add_api_route(
+    "/leads",
+    create_lead_async if get_settings().db_async else create_lead,
+    methods=["POST"],
+    response_model=LeadCreateResponseSchema | LeadDuplicateResponseSchema,
+    status_code=status.HTTP_201_CREATED,
+)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from api.middleware.rate_limit import rate_limiter
+from api.services.auth_service import require_metrics_access
+from api.services.event_queue import event_queue
+from api.services.metrics import metrics
+from api.services.score_cache import score_cache
+from api.services.zone_registry import zone_registry
+
+router = APIRouter(tags=["ops"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Los servicios ya llevan sus contadores en `stats()` (los de /api/admin/ops/cache): se leen al exponer,
+# sin coste en el camino de la petición.
+metrics.callback(
+    "iei_zone_registry_hits_total",
+    "Lecturas del snapshot de zonas servidas desde memoria.",
+    lambda: zone_registry.hits,
+    kind="counter",
+)
+metrics.callback(
+    "iei_zone_registry_refreshes_total",
+    "Recargas del registro de zonas por tipo (en línea o en segundo plano).",
+    lambda: {("inline",): zone_registry.loads, ("background",): zone_registry.background_refreshes},
+    kind="counter",
+    labels=("kind",),
+)
+metrics.callback(
+    "iei_zone_registry_failures_total",
+    "Recargas del registro de zonas fallidas.",
+    lambda: zone_registry.failures,
+    kind="counter",
+)
+metrics.callback(
+    "iei_score_cache_requests_total",
+    "Consultas a la caché de /api/iei/score por resultado.",
+    lambda: {("hit",): score_cache.hits, ("miss",): score_cache.misses},
+    kind="counter",
+    labels=("result",),
+)
+metrics.callback("iei_score_cache_entries", "Entradas en la caché de /api/iei/score.", lambda: score_cache.stats()["size"])
+metrics.callback("iei_event_queue_depth", "Eventos pendientes de volcar.", lambda: event_queue.stats()["depth"])
+metrics.callback(
+    "iei_event_queue_events_total",
+    "Eventos de /api/events por destino.",
+    lambda: {
+        ("accepted",): event_queue.accepted,
+        ("rejected",): event_queue.rejected,
+        ("flushed",): event_queue.flushed,
+        ("dropped",): event_queue.dropped,
+    },
+    kind="counter",
+    labels=("outcome",),
+)
+metrics.callback("iei_rate_limit_keys", "Claves vivas en el rate limit.", lambda: rate_limiter.stats().get("keys"))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint(_: None = Depends(require_metrics_access)) -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
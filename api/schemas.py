@@ -93,8 +93,10 @@ class IEIResultSchema(BaseModel):
     price_estimate: PriceEstimateSchema
     pricing_alignment: PricingAlignmentSchema
     recommendation: str
+    zone_tables_version: Optional[int] = None
     pricing: Optional[dict[str, Any]] = None
     iei_framework: Optional[IEIFrameworkSchema] = None
+    score_token: Optional[str] = None
 
 
 class LeadCreateInfoSchema(BaseModel):
@@ -117,6 +119,7 @@ class LeadCreateRequestSchema(BaseModel):
     lead: LeadCreateInfoSchema
     input: LeadInputSchema
     company_website: Optional[str] = None
+    score_token: Optional[str] = None
 
 
 class LeadCreateResponseSchema(BaseModel):
@@ -160,7 +163,8 @@ class AdminLeadListResponseSchema(BaseModel):
     items: list[AdminLeadItemSchema]
     page: int
     page_size: int
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class UpdateLeadStatusRequestSchema(BaseModel):
@@ -274,6 +278,7 @@ class EventRequestSchema(BaseModel):
 class EventResponseSchema(BaseModel):
     ok: bool
     deduplicated: bool = False
+    queued: bool = False
 
 
 class PrivacyDeleteRequestSchema(BaseModel):
@@ -303,3 +308,35 @@ class ErrorBodySchema(BaseModel):
 
 class ErrorEnvelopeSchema(BaseModel):
     error: ErrorBodySchema
+
+
+class ScoreBatchRequestSchema(BaseModel):
+    items: list[dict[str, Any]] = Field(min_length=1)
+
+
+class ScoreBatchItemSchema(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[IEIResultSchema] = None
+    error: Optional[ErrorBodySchema] = None
+
+
+class ScoreBatchResponseSchema(BaseModel):
+    items: list[ScoreBatchItemSchema]
+    scored: int
+    failed: int
+
+
+class LeadImportRejectSchema(BaseModel):
+    row: int
+    error: ErrorBodySchema
+
+
+class LeadImportResponseSchema(BaseModel):
+    received: int
+    imported: int
+    duplicates: int
+    rejected: int
+    chunks: int
+    rejects: list[LeadImportRejectSchema]
+    rejects_truncated: bool
@@ -36,3 +36,12 @@ def require_admin(request: Request) -> None:
             message="Sesion admin no valida.",
             details={},
         )
+
+
+def require_metrics_access(request: Request) -> None:
+    """`/metrics`: `Authorization: Bearer <METRICS_TOKEN>` (scraper) o sesion admin."""
+    expected = get_settings().metrics_token
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if expected and scheme.lower() == "bearer" and hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+        return
+    require_admin(request)
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import csv
+from collections.abc import Iterator
 from datetime import UTC, datetime, timedelta
 from io import StringIO
 from uuid import uuid4
 
+from sqlalchemy import DateTime, bindparam, case, exists, literal, select, text, update
 from sqlalchemy.orm import Session
 
+from api.db import SessionLocal
 from api.errors import ApiException
 from api.iei_framework import IEI_FRAMEWORK_VERSION, IEI_POWERED_BY
 from api.models import Agency, IEIResultRecord, Lead, LeadReservation, LeadSale, PropertyInput
+from api.services.lead_totals import lead_totals_cache
 from api.settings import get_settings
 
 
@@ -47,6 +51,74 @@ def _mask_email(email: str | None, *, export_pii: bool) -> str:
     return f"{local[:2]}***@{domain}"
 
 
+SALES_CSV_COLUMNS = [
+    "sold_at",
+    "lead_id",
+    "agency_id",
+    "agency_name",
+    "zone_key",
+    "tier",
+    "segment",
+    "pricing_policy",
+    "lead_price_eur",
+    "price_eur",
+    "iei_score",
+    "iei_framework_version",
+    "powered_by",
+    "owner_phone_masked",
+    "owner_email_masked",
+]
+
+
+# Tier vigente del lead: último resultado IEI (índice iei_results (lead_id, created_at desc)).
+_TIER_SQL = "(select r.tier from iei_results r where r.lead_id = :lead_id order by r.created_at desc limit 1)"
+
+# Reserva en un solo statement: lead existente, agencia activa, Tier A y sin venta en el SELECT; una reserva
+# vigente (de cualquier agencia) bloquea el upsert en su WHERE. Sin fila devuelta -> conflicto.
+# SQL textual (válido en PostgreSQL y SQLite): los `insert` de dialecto con ON CONFLICT no entran en la caché
+# de compilación de SQLAlchemy y se recompilarían en cada llamada.
+_RESERVE_LEAD = text(
+    f"""
+    insert into lead_reservations (id, lead_id, agency_id, reserved_at, reserved_until, status, released_at)
+    select :reservation_id, l.id, a.id, :now, :reserved_until, 'active', null
+    from leads l
+    join agencies a on a.id = :agency_id and a.is_active = true
+    where l.id = :lead_id
+      and {_TIER_SQL} = 'A'
+      and not exists (select 1 from lead_sales s where s.lead_id = :lead_id)
+    on conflict (lead_id) do update set
+      agency_id = excluded.agency_id,
+      reserved_at = excluded.reserved_at,
+      reserved_until = excluded.reserved_until,
+      status = 'active',
+      released_at = null
+    where lead_reservations.status <> 'active' or lead_reservations.reserved_until <= :now
+    returning lead_id
+    """
+).bindparams(
+    bindparam("now", type_=DateTime(timezone=True)),
+    bindparam("reserved_until", type_=DateTime(timezone=True)),
+)
+
+# Venta: la decide la restricción única de lead_sales.lead_id; agencia activa y ausencia de reserva vigente
+# de otra agencia se comprueban en el mismo INSERT ... SELECT.
+_SELL_LEAD = text(
+    f"""
+    insert into lead_sales (id, lead_id, agency_id, sold_at, tier, price_eur, notes)
+    select :sale_id, l.id, a.id, :now, coalesce({_TIER_SQL}, 'D'), :price_eur, :notes
+    from leads l
+    join agencies a on a.id = :agency_id and a.is_active = true
+    where l.id = :lead_id
+      and not exists (
+        select 1 from lead_reservations r
+        where r.lead_id = :lead_id and r.agency_id <> :agency_id and r.status = 'active' and r.reserved_until > :now
+      )
+    on conflict (lead_id) do nothing
+    returning tier
+    """
+).bindparams(bindparam("now", type_=DateTime(timezone=True)))
+
+
 class CommercialService:
     @staticmethod
     def list_agencies(db: Session) -> list[Agency]:
@@ -70,26 +142,86 @@ class CommercialService:
         return lead
 
     @staticmethod
-    def _get_active_agency_or_404(db: Session, agency_id: str) -> Agency:
-        agency = db.query(Agency).filter(Agency.id == agency_id, Agency.is_active.is_(True)).first()
-        if not agency:
+    def _tier_subquery(lead_id: str):
+        """Tier del último resultado IEI del lead, como subconsulta escalar."""
+        return (
+            select(IEIResultRecord.tier)
+            .where(IEIResultRecord.lead_id == lead_id)
+            .order_by(IEIResultRecord.created_at.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    @classmethod
+    def _raise_conflict(cls, db: Session, lead_id: str, agency_id: str, now: datetime, *, for_reservation: bool) -> None:
+        """Tras un INSERT condicional sin filas, una sola consulta de diagnóstico decide el código de error."""
+        state = db.execute(
+            select(
+                exists().where(Lead.id == lead_id).label("lead_exists"),
+                exists().where(Agency.id == agency_id, Agency.is_active.is_(True)).label("agency_active"),
+                cls._tier_subquery(lead_id).label("tier"),
+                exists().where(LeadSale.lead_id == lead_id).label("sold"),
+                select(LeadReservation.agency_id)
+                .where(
+                    LeadReservation.lead_id == lead_id,
+                    LeadReservation.status == "active",
+                    LeadReservation.reserved_until > now,
+                )
+                .scalar_subquery()
+                .label("reserved_to"),
+            )
+        ).one()
+        db.rollback()
+
+        if not state.lead_exists:
+            raise ApiException(
+                status_code=404,
+                code="NOT_FOUND",
+                message="Lead no encontrado.",
+                details={"lead_id": lead_id},
+            )
+        if not state.agency_active:
             raise ApiException(
                 status_code=404,
                 code="NOT_FOUND",
                 message="Agencia no encontrada o inactiva.",
                 details={"agency_id": agency_id},
             )
-        return agency
-
-    @staticmethod
-    def _lead_tier(db: Session, lead_id: str) -> str | None:
-        row = (
-            db.query(IEIResultRecord)
-            .filter(IEIResultRecord.lead_id == lead_id)
-            .order_by(IEIResultRecord.created_at.desc())
-            .first()
+        if for_reservation and state.tier != "A":
+            raise ApiException(
+                status_code=400,
+                code="RESERVATION_ONLY_TIER_A",
+                message="Solo se permite reserva en leads Tier A.",
+                details={"lead_id": lead_id, "tier": state.tier},
+            )
+        if state.sold:
+            raise ApiException(
+                status_code=409,
+                code="SOLD",
+                message="Lead ya vendido.",
+                details={"lead_id": lead_id},
+            )
+        if for_reservation and state.reserved_to:
+            raise ApiException(
+                status_code=409,
+                code="RESERVED",
+                message="Lead ya reservado.",
+                details={"lead_id": lead_id, "agency_id": state.reserved_to},
+            )
+        if not for_reservation and state.reserved_to and state.reserved_to != agency_id:
+            raise ApiException(
+                status_code=409,
+                code="RESERVED_FOR_OTHER",
+                message="Lead reservado por otra agencia.",
+                details={"lead_id": lead_id, "agency_id": state.reserved_to},
+            )
+        # El estado cambió entre el INSERT y el diagnóstico (otra petición concurrente): el cliente reintenta.
+        raise ApiException(
+            status_code=409,
+            code="CONFLICT",
+            message="Estado comercial modificado en paralelo; reintentar.",
+            details={"lead_id": lead_id},
         )
-        return row.tier if row else None
 
     @staticmethod
     def _sale_for_lead(db: Session, lead_id: str) -> LeadSale | None:
@@ -99,16 +231,22 @@ class CommercialService:
     def _reservation_for_lead(db: Session, lead_id: str) -> LeadReservation | None:
         return db.query(LeadReservation).filter(LeadReservation.lead_id == lead_id).first()
 
-    @classmethod
-    def _normalize_reservation_state(cls, db: Session, reservation: LeadReservation | None) -> LeadReservation | None:
-        if not reservation:
-            return None
-        if reservation.status == "active" and _as_utc(reservation.reserved_until) <= _now():
-            reservation.status = "expired"
-            db.add(reservation)
-            db.commit()
-            db.refresh(reservation)
-        return reservation
+    @staticmethod
+    def _is_active_reservation(reservation: LeadReservation | None, now: datetime) -> bool:
+        # Estado efectivo sin escribir: una reserva "active" vencida ya no bloquea el lead aunque el
+        # barrido (`expire_reservations`) aún no la haya marcado como "expired".
+        return bool(reservation and reservation.status == "active" and _as_utc(reservation.reserved_until) > now)
+
+    @staticmethod
+    def expire_reservations(db: Session, now: datetime | None = None) -> int:
+        """Marca como "expired" todas las reservas activas vencidas en un único UPDATE."""
+        result = db.execute(
+            update(LeadReservation)
+            .where(LeadReservation.status == "active", LeadReservation.reserved_until <= (now or _now()))
+            .values(status="expired")
+        )
+        db.commit()
+        return result.rowcount
 
     @classmethod
     def get_commercial_state(cls, db: Session, lead_id: str) -> dict:
@@ -121,8 +259,8 @@ class CommercialService:
                 "sold_at": sale.sold_at,
             }
 
-        reservation = cls._normalize_reservation_state(db, cls._reservation_for_lead(db, lead_id))
-        if reservation and reservation.status == "active":
+        reservation = cls._reservation_for_lead(db, lead_id)
+        if cls._is_active_reservation(reservation, _now()):
             return {
                 "commercial_state": "reserved",
                 "reserved_until": reservation.reserved_until,
@@ -156,61 +294,26 @@ class CommercialService:
                 details={"field": "hours"},
             )
 
-        cls._get_lead_or_404(db, lead_id)
-        cls._get_active_agency_or_404(db, agency_id)
-
-        tier = cls._lead_tier(db, lead_id)
-        if tier != "A":
-            raise ApiException(
-                status_code=400,
-                code="RESERVATION_ONLY_TIER_A",
-                message="Solo se permite reserva en leads Tier A.",
-                details={"lead_id": lead_id, "tier": tier},
-            )
-
-        sale = cls._sale_for_lead(db, lead_id)
-        if sale:
-            raise ApiException(
-                status_code=409,
-                code="SOLD",
-                message="Lead ya vendido.",
-                details={"lead_id": lead_id},
-            )
-
-        reservation = cls._normalize_reservation_state(db, cls._reservation_for_lead(db, lead_id))
-        if reservation and reservation.status == "active":
-            raise ApiException(
-                status_code=409,
-                code="RESERVED",
-                message="Lead ya reservado.",
-                details={"lead_id": lead_id, "agency_id": reservation.agency_id},
-            )
-
         now = _now()
         reserved_until = now + timedelta(hours=hours)
-        if reservation:
-            reservation.agency_id = agency_id
-            reservation.reserved_at = now
-            reservation.reserved_until = reserved_until
-            reservation.status = "active"
-            reservation.released_at = None
-        else:
-            reservation = LeadReservation(
-                id=str(uuid4()),
-                lead_id=lead_id,
-                agency_id=agency_id,
-                reserved_at=now,
-                reserved_until=reserved_until,
-                status="active",
-            )
-            db.add(reservation)
+        reserved = db.execute(
+            _RESERVE_LEAD,
+            {
+                "reservation_id": str(uuid4()),
+                "lead_id": lead_id,
+                "agency_id": agency_id,
+                "now": now,
+                "reserved_until": reserved_until,
+            },
+        ).first()
+        if reserved is None:
+            cls._raise_conflict(db, lead_id, agency_id, now, for_reservation=True)
 
         db.commit()
-        db.refresh(reservation)
         return {
             "lead_id": lead_id,
             "agency_id": agency_id,
-            "reserved_until": reservation.reserved_until,
+            "reserved_until": reserved_until,
             "status": "active",
         }
 
@@ -243,133 +346,134 @@ class CommercialService:
                 details={"field": "price_eur"},
             )
 
-        lead = cls._get_lead_or_404(db, lead_id)
-        cls._get_active_agency_or_404(db, agency_id)
-
-        existing_sale = cls._sale_for_lead(db, lead_id)
-        if existing_sale:
-            raise ApiException(
-                status_code=409,
-                code="SOLD",
-                message="Lead ya vendido.",
-                details={"lead_id": lead_id},
-            )
-
-        reservation = cls._normalize_reservation_state(db, cls._reservation_for_lead(db, lead_id))
-        if reservation and reservation.status == "active" and reservation.agency_id != agency_id:
-            raise ApiException(
-                status_code=409,
-                code="RESERVED_FOR_OTHER",
-                message="Lead reservado por otra agencia.",
-                details={"lead_id": lead_id, "agency_id": reservation.agency_id},
-            )
-
-        tier = cls._lead_tier(db, lead_id) or "D"
         now = _now()
-        sale = LeadSale(
-            id=str(uuid4()),
-            lead_id=lead_id,
-            agency_id=agency_id,
-            sold_at=now,
-            tier=tier,
-            price_eur=price_eur,
-            notes=notes,
+        tier = db.execute(
+            _SELL_LEAD,
+            {
+                "sale_id": str(uuid4()),
+                "lead_id": lead_id,
+                "agency_id": agency_id,
+                "now": now,
+                "price_eur": price_eur,
+                "notes": notes,
+            },
+        ).scalar()
+        if tier is None:
+            cls._raise_conflict(db, lead_id, agency_id, now, for_reservation=False)
+
+        db.execute(update(Lead).where(Lead.id == lead_id).values(status="vendido", updated_at=now))
+        # Reserva vigente -> "released"; ya vencida -> "expired". Misma transacción que la venta.
+        still_active = LeadReservation.reserved_until > now
+        db.execute(
+            update(LeadReservation)
+            .where(LeadReservation.lead_id == lead_id, LeadReservation.status == "active")
+            .values(
+                status=case((still_active, "released"), else_="expired"),
+                released_at=case((still_active, literal(now, DateTime(timezone=True))), else_=LeadReservation.released_at),
+            )
         )
-        db.add(sale)
-
-        lead.status = "vendido"
-        lead.updated_at = now
-        db.add(lead)
-
-        if reservation and reservation.status == "active":
-            reservation.status = "released"
-            reservation.released_at = now
-            db.add(reservation)
-
         db.commit()
-        db.refresh(sale)
+        lead_totals_cache.invalidate()
         return {
             "lead_id": lead_id,
             "agency_id": agency_id,
-            "sold_at": sale.sold_at,
-            "price_eur": sale.price_eur,
+            "sold_at": now,
+            "price_eur": price_eur,
             "tier": tier,
         }
 
-    @classmethod
-    def export_sales_csv(
-        cls,
-        db: Session,
+    @staticmethod
+    def iter_sales_csv(
         *,
         date_from: datetime | None,
         date_to: datetime | None,
         zone_key: str | None,
         agency_id: str | None,
         tier: str | None,
-    ) -> str:
-        query = (
-            db.query(LeadSale, Lead, Agency, PropertyInput, IEIResultRecord)
-            .join(Lead, Lead.id == LeadSale.lead_id)
-            .join(Agency, Agency.id == LeadSale.agency_id)
-            .join(PropertyInput, PropertyInput.lead_id == Lead.id)
-            .join(IEIResultRecord, IEIResultRecord.lead_id == Lead.id)
+        chunk_rows: int = 500,
+    ) -> Iterator[str]:
+        """CSV de ventas en trozos de `chunk_rows` filas, en memoria constante.
+
+        Abre su propia sesión: el generador se consume tras cerrar las dependencias del request. Lee solo
+        las columnas exportadas (de `lead_card_json`, únicamente las dos rutas JSON necesarias) con un
+        cursor de servidor (`yield_per`).
+        """
+        lead_card = IEIResultRecord.lead_card_json
+        query_columns = (
+            LeadSale.sold_at,
+            Lead.id.label("lead_id"),
+            Agency.id.label("agency_id"),
+            Agency.name.label("agency_name"),
+            PropertyInput.zone_key,
+            LeadSale.tier,
+            Lead.segment,
+            Lead.pricing_policy,
+            Lead.lead_price_eur,
+            LeadSale.price_eur,
+            IEIResultRecord.iei_score,
+            lead_card[("iei_framework", "version")].as_string().label("iei_framework_version"),
+            lead_card["powered_by"].as_string().label("powered_by"),
+            Lead.owner_phone,
+            Lead.owner_email,
         )
-
-        if date_from:
-            query = query.filter(LeadSale.sold_at >= date_from)
-        if date_to:
-            query = query.filter(LeadSale.sold_at <= date_to)
-        if zone_key:
-            query = query.filter(PropertyInput.zone_key == zone_key.lower().strip())
-        if agency_id:
-            query = query.filter(LeadSale.agency_id == agency_id)
-        if tier:
-            query = query.filter(LeadSale.tier == tier)
-
-        rows = query.order_by(LeadSale.sold_at.desc()).all()
         settings = get_settings()
 
-        out = StringIO()
-        writer = csv.writer(out)
-        writer.writerow(
-            [
-                "sold_at",
-                "lead_id",
-                "agency_id",
-                "agency_name",
-                "zone_key",
-                "tier",
-                "segment",
-                "pricing_policy",
-                "lead_price_eur",
-                "price_eur",
-                "iei_score",
-                "iei_framework_version",
-                "powered_by",
-                "owner_phone_masked",
-                "owner_email_masked",
-            ]
-        )
-
-        for sale, lead, agency, prop, iei in rows:
-            writer.writerow(
-                [
-                    sale.sold_at.isoformat() if sale.sold_at else "",
-                    lead.id,
-                    agency.id,
-                    agency.name,
-                    prop.zone_key,
-                    sale.tier,
-                    lead.segment or sale.tier,
-                    lead.pricing_policy or "",
-                    lead.lead_price_eur if lead.lead_price_eur is not None else "",
-                    sale.price_eur,
-                    iei.iei_score,
-                    ((iei.lead_card_json or {}).get("iei_framework") or {}).get("version") or IEI_FRAMEWORK_VERSION,
-                    (iei.lead_card_json or {}).get("powered_by") or IEI_POWERED_BY,
-                    _mask_phone(lead.owner_phone, export_pii=settings.export_pii),
-                    _mask_email(lead.owner_email, export_pii=settings.export_pii),
-                ]
+        db = SessionLocal()
+        try:
+            query = (
+                db.query(*query_columns)
+                .select_from(LeadSale)
+                .join(Lead, Lead.id == LeadSale.lead_id)
+                .join(Agency, Agency.id == LeadSale.agency_id)
+                .join(PropertyInput, PropertyInput.lead_id == Lead.id)
+                .join(IEIResultRecord, IEIResultRecord.lead_id == Lead.id)
             )
 
-        return out.getvalue()
+            if date_from:
+                query = query.filter(LeadSale.sold_at >= date_from)
+            if date_to:
+                query = query.filter(LeadSale.sold_at <= date_to)
+            if zone_key:
+                query = query.filter(PropertyInput.zone_key == zone_key.lower().strip())
+            if agency_id:
+                query = query.filter(LeadSale.agency_id == agency_id)
+            if tier:
+                query = query.filter(LeadSale.tier == tier)
+
+            out = StringIO()
+            writer = csv.writer(out)
+            writer.writerow(SALES_CSV_COLUMNS)
+
+            pending = 0
+            for row in query.order_by(LeadSale.sold_at.desc()).yield_per(chunk_rows):
+                writer.writerow(
+                    [
+                        row.sold_at.isoformat() if row.sold_at else "",
+                        row.lead_id,
+                        row.agency_id,
+                        row.agency_name,
+                        row.zone_key,
+                        row.tier,
+                        row.segment or row.tier,
+                        row.pricing_policy or "",
+                        row.lead_price_eur if row.lead_price_eur is not None else "",
+                        row.price_eur,
+                        row.iei_score,
+                        row.iei_framework_version or IEI_FRAMEWORK_VERSION,
+                        row.powered_by or IEI_POWERED_BY,
+                        _mask_phone(row.owner_phone, export_pii=settings.export_pii),
+                        _mask_email(row.owner_email, export_pii=settings.export_pii),
+                    ]
+                )
+                pending += 1
+                if pending >= chunk_rows:
+                    yield out.getvalue()
+                    out.seek(0)
+                    out.truncate(0)
+                    pending = 0
+
+            tail = out.getvalue()
+            if tail:
+                yield tail
+        finally:
+            db.close()
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy.orm import Session
+
+from api.errors import ApiException
+from api.models import Event
+from api.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Reintentos de un lote que falla al insertar antes de descartarlo (se cuenta en `dropped`).
+FLUSH_ATTEMPTS = 3
+FLUSH_RETRY_SECONDS = 1.0
+
+
+class EventQueue:
+    """Cola acotada de eventos del funnel con escritura diferida (write-behind).
+
+    `submit()` solo encola y responde; un hilo vuelca los eventos en INSERT multi-fila cuando se juntan
+    `EVENT_FLUSH_BATCH_SIZE` o pasan `EVENT_FLUSH_INTERVAL_SECONDS` desde el primero del lote. Con la cola
+    llena (`EVENT_QUEUE_MAX_SIZE`) `submit()` rechaza con 503 en vez de acumular memoria. `stop()` vacía la
+    cola antes de terminar.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] | None = None,
+        *,
+        max_size: int | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        dedupe_cache_size: int | None = None,
+    ):
+        settings = get_settings()
+        self._session_factory = session_factory
+        self.max_size = max_size or settings.event_queue_max_size
+        self.batch_size = batch_size or settings.event_flush_batch_size
+        self.flush_interval = settings.event_flush_interval_seconds if flush_interval is None else flush_interval
+        self.dedupe_cache_size = dedupe_cache_size or settings.event_dedupe_cache_size
+        self._queue: queue.Queue[dict[str, Any]] = queue.Queue(maxsize=self.max_size)
+        # LRU de lead_ids con `submit_lead` ya aceptado en este proceso: el repetido no llega a la cola.
+        self._seen_submit_leads: OrderedDict[str, None] = OrderedDict()
+        self._seen_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flush_requested = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.deduplicated_cache = 0
+        self.deduplicated_db = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self._flush_ms_last = 0.0
+        self._flush_ms_max = 0.0
+        self._flush_ms_total = 0.0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from api.db import SessionLocal
+
+            return SessionLocal()
+        return self._session_factory()
+
+    def submit(
+        self,
+        *,
+        event_name: str,
+        event_version: str,
+        session_id: str,
+        lead_id: str | None,
+        payload: dict[str, Any],
+    ) -> bool:
+        """Encola el evento; devuelve True si es un `submit_lead` ya visto (no se encola)."""
+        dedupe_key = lead_id if event_name == "submit_lead" and lead_id else None
+        if dedupe_key is not None and self._seen_submit_lead(dedupe_key):
+            self.deduplicated_cache += 1
+            return True
+
+        row = {
+            "id": str(uuid4()),
+            "event_name": event_name,
+            "event_version": event_version,
+            "session_id": session_id,
+            "lead_id": lead_id,
+            "payload_json": payload,
+            # Hora de recepción, no de volcado.
+            "created_at": datetime.now(UTC),
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.rejected += 1
+            if dedupe_key is not None:
+                self._forget_submit_lead(dedupe_key)
+            raise ApiException(
+                status_code=503,
+                code="EVENT_QUEUE_FULL",
+                message="Cola de eventos llena; reintentar mas tarde.",
+                details={"retry_after_seconds": max(1, round(self.flush_interval))},
+            ) from None
+        self.accepted += 1
+        self.start()
+        return False
+
+    def _seen_submit_lead(self, lead_id: str) -> bool:
+        """Comprueba y registra en un solo paso (dos requests simultáneos: solo uno pasa)."""
+        with self._seen_lock:
+            if lead_id in self._seen_submit_leads:
+                self._seen_submit_leads.move_to_end(lead_id)
+                return True
+            self._seen_submit_leads[lead_id] = None
+            while len(self._seen_submit_leads) > self.dedupe_cache_size:
+                self._seen_submit_leads.popitem(last=False)
+            return False
+
+    def _forget_submit_lead(self, lead_id: str) -> None:
+        with self._seen_lock:
+            self._seen_submit_leads.pop(lead_id, None)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="event-queue-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Vuelca lo pendiente y detiene el hilo (apagado ordenado)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Lo que quede (p.ej. si el hilo nunca arrancó) se vuelca aquí.
+        self._drain()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Corta el lote en curso y espera a que todo lo encolado esté escrito."""
+        deadline = time.monotonic() + timeout
+        self._flush_requested.set()
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "depth": self._queue.qsize(),
+            "max_size": self.max_size,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "deduplicated_cache": self.deduplicated_cache,
+            "deduplicated_db": self.deduplicated_db,
+            "dedupe_cache_size": len(self._seen_submit_leads),
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "flush_ms_last": round(self._flush_ms_last, 3),
+            "flush_ms_max": round(self._flush_ms_max, 3),
+            "flush_ms_avg": round(self._flush_ms_total / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        self._drain()
+
+    def _next_batch(self) -> list[dict[str, Any]]:
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._stop.is_set() or self._flush_requested.is_set():
+                # Apagado o flush(): no se espera al temporizador, solo se recoge lo ya encolado.
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    self._flush_requested.clear()
+                    break
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self) -> None:
+        while True:
+            batch: list[dict[str, Any]] = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        try:
+            for attempt in range(1, FLUSH_ATTEMPTS + 1):
+                started = time.perf_counter()
+                db = self._new_session()
+                try:
+                    inserted = self._insert_ignoring_duplicates(db, batch)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    self.failures += 1
+                    logger.exception("event flush failed (attempt %s/%s, %s events)", attempt, FLUSH_ATTEMPTS, len(batch))
+                    if attempt == FLUSH_ATTEMPTS:
+                        self.dropped += len(batch)
+                        # Sin fila escrita, el reintento del cliente debe volver a encolarse.
+                        for row in batch:
+                            if row["event_name"] == "submit_lead" and row["lead_id"]:
+                                self._forget_submit_lead(row["lead_id"])
+                        return
+                    self._stop.wait(FLUSH_RETRY_SECONDS)
+                    continue
+                finally:
+                    db.close()
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.flushes += 1
+                self.flushed += inserted
+                self.deduplicated_db += len(batch) - inserted
+                self._flush_ms_last = elapsed_ms
+                self._flush_ms_max = max(self._flush_ms_max, elapsed_ms)
+                self._flush_ms_total += elapsed_ms
+                return
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    @staticmethod
+    def _insert_ignoring_duplicates(db: Session, rows: list[dict[str, Any]]) -> int:
+        """INSERT multi-fila idempotente: el índice único parcial `uq_events_submit_lead` descarta los
+        `submit_lead` repetidos (de otro worker, o que el LRU ya olvidó) sin consulta previa."""
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(Event).on_conflict_do_nothing().returning(Event.id)
+        return len(db.execute(stmt, rows).all())
+
+
+event_queue = EventQueue()
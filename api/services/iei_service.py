@@ -1,18 +1,24 @@
 from __future__ import annotations
 
+import time
 from dataclasses import asdict
 from typing import Any
 
 import iei_engine as engine_module
-from sqlalchemy.orm import Session
+from iei_engine_batch import LeadBatch, compute_iei_batch
+from pydantic import ValidationError
 
-from api.errors import ApiException
+from api.errors import ApiException, error_payload
 from api.iei_framework import IEI_POWERED_BY, iei_framework_metadata
 from api.schemas import LeadInputSchema
+from api.services.metrics import ENGINE_SECONDS
 from api.services.pricing_policy import PricingContext, PricingPolicyService
+from api.services.score_cache import canonical_input_hash
+from api.services.score_token import read_score_token
+from api.services.zone_registry import ZoneSnapshot
 from api.services.zone_service import ZoneService
 from api.settings import get_settings
-from api.utils.validation import normalize_zone_key
+from api.utils.validation import normalize_zone_key, validate_lead_input
 
 
 def _to_property_features(payload):
@@ -62,6 +68,25 @@ def _serialize_result(result: engine_module.IEIResult) -> dict[str, Any]:
     return data
 
 
+def _deserialize_result(data: dict[str, Any]) -> engine_module.IEIResult:
+    price = dict(data["price_estimate"])
+    price["demand_level"] = engine_module.DemandLevel(price["demand_level"])
+    alignment = dict(data["pricing_alignment"])
+    estimated_range = alignment.get("estimated_range")
+    if isinstance(estimated_range, list):
+        alignment["estimated_range"] = tuple(estimated_range)
+
+    return engine_module.IEIResult(
+        iei_score=data["iei_score"],
+        tier=engine_module.Tier(data["tier"]),
+        breakdown=dict(data["breakdown"]),
+        price_estimate=engine_module.PriceEstimate(**price),
+        pricing_alignment=alignment,
+        recommendation=data["recommendation"],
+        zone_tables_version=data.get("zone_tables_version"),
+    )
+
+
 def _serialize_lead_card(card: dict[str, Any]) -> dict[str, Any]:
     data = dict(card)
     pricing = dict(data.get("pricing", {}))
@@ -72,15 +97,20 @@ def _serialize_lead_card(card: dict[str, Any]) -> dict[str, Any]:
     return data
 
 
-def score_lead(db: Session, payload: LeadInputSchema) -> tuple[engine_module.LeadInput, engine_module.IEIResult, dict[str, Any]]:
+def score_lead(
+    payload: LeadInputSchema,
+    *,
+    snapshot: ZoneSnapshot | None = None,
+) -> tuple[engine_module.LeadInput, engine_module.IEIResult, dict[str, Any]]:
     lead = build_lead_input(payload)
     zone_key = normalize_zone_key(lead.property.zone_key)
 
-    ZoneService.assert_zone_configured(db, zone_key)
-    ZoneService.apply_runtime_engine_zone_tables(db)
+    snapshot = snapshot or ZoneService.snapshot()
+    ZoneService.assert_zone_configured(zone_key, snapshot)
 
+    started = time.perf_counter()
     try:
-        result = engine_module.compute_iei(lead)
+        result = engine_module.compute_iei(lead, snapshot.tables)
     except ValueError as exc:
         message = str(exc)
         if "Zona no configurada" in message:
@@ -91,11 +121,38 @@ def score_lead(db: Session, payload: LeadInputSchema) -> tuple[engine_module.Lea
                 details={"zone_key": zone_key},
             ) from exc
         raise
+    ENGINE_SECONDS.observe(time.perf_counter() - started, "compute_iei")
 
     serialized = _serialize_result(result)
     return lead, result, serialized
 
 
+def score_lead_from_token(
+    payload: LeadInputSchema,
+    token: str | None,
+) -> tuple[engine_module.LeadInput, engine_module.IEIResult, dict[str, Any], dict[str, Any]] | None:
+    """Reutiliza el resultado y el pricing firmados por /api/iei/score si siguen siendo válidos para este input.
+
+    No ejecuta el motor ni el pricing: con la misma versión de zonas, `policy_json` sale del snapshot.
+    """
+    if not token:
+        return None
+
+    snapshot = ZoneService.snapshot()
+    claims = read_score_token(
+        token,
+        input_hash=canonical_input_hash(payload),
+        zones_version=ZoneService.zones_version(snapshot),
+    )
+    if claims is None:
+        return None
+
+    result = claims["r"]
+    _, _, policy_json = snapshot.policy(normalize_zone_key(payload.property.zone_key))
+    pricing = {**claims["p"], "policy_json": policy_json}
+    return build_lead_input(payload), _deserialize_result(result), result, pricing
+
+
 def build_lead_card(lead: engine_module.LeadInput, result: engine_module.IEIResult) -> dict[str, Any]:
     card = engine_module.lead_card(lead, result)
     serialized = _serialize_lead_card(card)
@@ -106,14 +163,8 @@ def build_lead_card(lead: engine_module.LeadInput, result: engine_module.IEIResu
     return serialized
 
 
-def compute_pricing_from_result(
-    db: Session,
-    payload: LeadInputSchema,
-    result: dict[str, Any],
-    *,
-    confidence_bucket: str | None = None,
-) -> dict[str, Any]:
-    context = PricingContext(
+def _pricing_context(payload: LeadInputSchema, result: dict[str, Any], confidence_bucket: str | None) -> PricingContext:
+    return PricingContext(
         tier=result["tier"],
         zone_key=payload.property.zone_key,
         sale_horizon=payload.owner.sale_horizon,
@@ -122,7 +173,130 @@ def compute_pricing_from_result(
         demand_level=result.get("price_estimate", {}).get("demand_level", "media"),
         confidence_bucket=confidence_bucket,
     )
-    return PricingPolicyService.compute_pricing(db, context)
+
+
+def compute_pricing_from_result(
+    payload: LeadInputSchema,
+    result: dict[str, Any],
+    *,
+    confidence_bucket: str | None = None,
+    snapshot: ZoneSnapshot | None = None,
+) -> dict[str, Any]:
+    snapshot = snapshot or ZoneService.snapshot()
+    context = _pricing_context(payload, result, confidence_bucket)
+    policy = snapshot.policy(normalize_zone_key(payload.property.zone_key))
+    started = time.perf_counter()
+    pricing = PricingPolicyService.compute_pricing_with_policy(context, policy)
+    ENGINE_SECONDS.observe(time.perf_counter() - started, "compute_pricing")
+    return pricing
+
+
+def validation_exception(exc: ValidationError) -> ApiException:
+    return ApiException(
+        status_code=400,
+        code="VALIDATION_ERROR",
+        message="Datos de entrada invalidos.",
+        details={"issues": exc.errors(include_url=False)},
+    )
+
+
+def _error_item(index: int, exc: ApiException) -> dict[str, Any]:
+    error = error_payload(exc.code, exc.message, exc.details)["error"]
+    return {"index": index, "ok": False, "result": None, "error": error}
+
+
+def score_inputs_batch(
+    valid: list[tuple[int, LeadInputSchema]],
+) -> tuple[
+    dict[int, ApiException],
+    list[tuple[int, LeadInputSchema, engine_module.LeadInput, engine_module.IEIResult, dict[str, Any], dict[str, Any]]],
+]:
+    """Scorea inputs ya validados con el motor en lote.
+
+    Zona y política de pricing se resuelven una vez por zona distinta contra el snapshot del registro. Devuelve los errores por
+    índice (zona no configurada) y, para el resto, `(index, payload, lead, result, serialized, pricing)`.
+    """
+    snapshot = ZoneService.snapshot()
+
+    zone_errors: dict[str, ApiException] = {}
+    zone_policies: dict[str, tuple[str, bool, dict[str, Any]]] = {}
+    for zone_key in {normalize_zone_key(payload.property.zone_key) for _, payload in valid}:
+        try:
+            ZoneService.assert_zone_configured(zone_key, snapshot)
+        except ApiException as exc:
+            zone_errors[zone_key] = exc
+            continue
+        zone_policies[zone_key] = snapshot.policy(zone_key)
+
+    errors: dict[int, ApiException] = {}
+    scorable: list[tuple[int, LeadInputSchema]] = []
+    for index, payload in valid:
+        zone_key = normalize_zone_key(payload.property.zone_key)
+        if zone_key in zone_errors:
+            errors[index] = zone_errors[zone_key]
+        else:
+            scorable.append((index, payload))
+
+    if not scorable:
+        return errors, []
+
+    leads = [build_lead_input(payload) for _, payload in scorable]
+    started = time.perf_counter()
+    batch_result = compute_iei_batch(LeadBatch.from_leads(leads), snapshot.tables)
+    ENGINE_SECONDS.observe(time.perf_counter() - started, "compute_iei_batch")
+
+    scored = []
+    for position, (index, payload) in enumerate(scorable):
+        raw_result = batch_result.result(position)
+        result = _serialize_result(raw_result)
+        context = _pricing_context(payload, result, None)
+        started = time.perf_counter()
+        pricing = PricingPolicyService.compute_pricing_with_policy(
+            context,
+            zone_policies[normalize_zone_key(payload.property.zone_key)],
+        )
+        ENGINE_SECONDS.observe(time.perf_counter() - started, "compute_pricing")
+        scored.append((index, payload, leads[position], raw_result, result, pricing))
+    return errors, scored
+
+
+def score_leads_batch(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Scorea una lista de inputs crudos con el motor en lote.
+
+    Los errores se devuelven por item (validación, zona no configurada) sin abortar el resto del lote.
+    """
+    responses: list[dict[str, Any] | None] = [None] * len(items)
+    valid: list[tuple[int, LeadInputSchema]] = []
+
+    for index, raw in enumerate(items):
+        try:
+            payload = LeadInputSchema.model_validate(raw)
+            validate_lead_input(payload)
+        except ValidationError as exc:
+            responses[index] = _error_item(index, validation_exception(exc))
+            continue
+        except ApiException as exc:
+            responses[index] = _error_item(index, exc)
+            continue
+        valid.append((index, payload))
+
+    errors, scored = score_inputs_batch(valid)
+    for index, exc in errors.items():
+        responses[index] = _error_item(index, exc)
+
+    framework = get_framework_metadata()
+    for index, _, _, _, result, pricing in scored:
+        result["pricing"] = {
+            "lead_price_eur": pricing["lead_price_eur"],
+            "segment": pricing["segment"],
+            "policy": pricing["policy"],
+            "confidence_bucket": pricing["confidence_bucket"],
+        }
+        if framework:
+            result["iei_framework"] = framework
+        responses[index] = {"index": index, "ok": True, "result": result, "error": None}
+
+    return responses
 
 
 def get_framework_metadata() -> dict[str, Any] | None:
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import csv
+import json
+from collections.abc import Callable, Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from itertools import islice
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from api.errors import ApiException, error_payload
+from api.models import IEIResultRecord, Lead, OwnerSignal, PropertyInput
+from api.schemas import (
+    LeadCreateInfoSchema,
+    LeadCreateRequestSchema,
+    LeadInputSchema,
+    OwnerSignalsSchema,
+    PropertyFeaturesSchema,
+)
+from api.services.iei_service import score_inputs_batch, validation_exception
+from api.services.lead_service import build_lead_records
+from api.services.lead_totals import lead_totals_cache
+from api.settings import get_settings
+from api.utils.ip_hash import hash_phone
+from api.utils.validation import normalize_zone_key, validate_lead_input
+
+IMPORT_FORMATS = ("ndjson", "csv")
+MAX_REPORTED_REJECTS = 1000
+
+# Orden de inserción: las tablas hijas referencian leads.id.
+_INSERT_ORDER = (Lead, PropertyInput, OwnerSignal, IEIResultRecord)
+
+# CSV plano: columnas = campos de lead, property e input.owner (sin colisiones de nombre).
+CSV_COLUMNS: dict[str, tuple[str, ...]] = {
+    **{name: ("lead", name) for name in LeadCreateInfoSchema.model_fields},
+    **{name: ("input", "property", name) for name in PropertyFeaturesSchema.model_fields},
+    **{name: ("input", "owner", name) for name in OwnerSignalsSchema.model_fields},
+}
+
+Record = tuple[int, dict[str, Any] | ApiException]
+
+
+def iter_ndjson_records(lines: Iterable[str]) -> Iterator[Record]:
+    """Una petición de `POST /api/leads` por línea; las líneas vacías se ignoran."""
+    for row, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield row, ApiException(
+                status_code=400,
+                code="INVALID_JSON",
+                message="Linea NDJSON invalida.",
+                details={"reason": exc.msg},
+            )
+            continue
+        if not isinstance(raw, dict):
+            yield row, ApiException(
+                status_code=400,
+                code="INVALID_JSON",
+                message="Cada linea debe ser un objeto JSON.",
+                details={},
+            )
+            continue
+        yield row, raw
+
+
+def iter_csv_records(lines: Iterable[str]) -> Iterator[Record]:
+    """CSV con cabecera y columnas de `CSV_COLUMNS`; las celdas vacías se omiten."""
+    reader = csv.DictReader(lines)
+    unknown = [name for name in reader.fieldnames or [] if name not in CSV_COLUMNS]
+    if unknown:
+        raise ApiException(
+            status_code=400,
+            code="VALIDATION_ERROR",
+            message="Columnas CSV desconocidas.",
+            details={"unknown_columns": unknown, "allowed_columns": list(CSV_COLUMNS)},
+        )
+
+    for row, values in enumerate(reader, start=1):
+        raw: dict[str, Any] = {"lead": {}, "input": {"property": {}, "owner": {}}}
+        for name, value in values.items():
+            if value is None or value == "":
+                continue
+            *parents, field = CSV_COLUMNS[name]
+            target = raw
+            for parent in parents:
+                target = target[parent]
+            target[field] = value
+        yield row, raw
+
+
+def iter_records(lines: Iterable[str], import_format: str) -> Iterator[Record]:
+    if import_format == "csv":
+        return iter_csv_records(lines)
+    return iter_ndjson_records(lines)
+
+
+class LeadImportReport:
+    """Contadores y rechazos por fila de una importación."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.rejects: list[dict[str, Any]] = []
+        self.rejects_truncated = False
+
+    def reject(self, row: int, exc: ApiException) -> None:
+        self.rejected += 1
+        self._record(row, exc)
+
+    def duplicate(self, row: int, exc: ApiException) -> None:
+        """Fila duplicada: cuenta solo en `duplicates`, pero se detalla en `rejects` con su código."""
+        self.duplicates += 1
+        self._record(row, exc)
+
+    def _record(self, row: int, exc: ApiException) -> None:
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({"row": row, **error_payload(exc.code, exc.message, exc.details)})
+        else:
+            self.rejects_truncated = True
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "received": self.received,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "rejects": self.rejects,
+            "rejects_truncated": self.rejects_truncated,
+        }
+
+
+class LeadImportService:
+    @staticmethod
+    def import_records(
+        db: Session,
+        records: Iterable[Record],
+        *,
+        chunk_size: int | None = None,
+        ip_hash: str | None = None,
+        on_progress: Callable[[LeadImportReport], None] | None = None,
+    ) -> LeadImportReport:
+        """Importa leads por chunks: valida, deduplica, scorea en lote e inserta en una transacción por chunk.
+
+        `records` se consume de forma perezosa, así que una fuente de 50k filas nunca está entera en memoria.
+        """
+        size = chunk_size or get_settings().lead_import_chunk_size
+        report = LeadImportReport()
+        seen: set[tuple[str, str]] = set()
+        iterator = iter(records)
+
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                break
+            LeadImportService.import_chunk(db, chunk, report, ip_hash=ip_hash, seen=seen)
+            if on_progress:
+                on_progress(report)
+
+        return report
+
+    @staticmethod
+    def import_chunk(
+        db: Session,
+        chunk: list[Record],
+        report: LeadImportReport,
+        *,
+        ip_hash: str | None = None,
+        seen: set[tuple[str, str]] | None = None,
+    ) -> None:
+        settings = get_settings()
+        now = datetime.now(UTC)
+        seen = set() if seen is None else seen
+        report.received += len(chunk)
+        report.chunks += 1
+
+        valid: list[tuple[int, LeadCreateRequestSchema, str | None]] = []
+        for row, raw in chunk:
+            if isinstance(raw, ApiException):
+                report.reject(row, raw)
+                continue
+            try:
+                payload = LeadCreateRequestSchema.model_validate(raw)
+                validate_lead_input(payload.input)
+                if not payload.lead.consent_contact:
+                    raise ApiException(
+                        status_code=400,
+                        code="CONSENT_REQUIRED",
+                        message="Se requiere consentimiento para crear el lead.",
+                        details={},
+                    )
+            except ValidationError as exc:
+                report.reject(row, validation_exception(exc))
+                continue
+            except ApiException as exc:
+                report.reject(row, exc)
+                continue
+            phone_hash = hash_phone(payload.lead.owner_phone) if payload.lead.owner_phone else None
+            valid.append((row, payload, phone_hash))
+
+        existing: dict[tuple[str, str], str] = {}
+        if settings.dedupe_window_days > 0:
+            phone_hashes = {phone_hash for _, _, phone_hash in valid if phone_hash}
+            if phone_hashes:
+                cutoff = now - timedelta(days=settings.dedupe_window_days)
+                rows = (
+                    db.query(Lead.phone_hash, PropertyInput.zone_key, Lead.id)
+                    .join(PropertyInput, PropertyInput.lead_id == Lead.id)
+                    .filter(Lead.phone_hash.in_(phone_hashes), Lead.created_at >= cutoff)
+                    .all()
+                )
+                existing = {(phone_hash, zone_key): lead_id for phone_hash, zone_key, lead_id in rows}
+
+        to_score: list[tuple[int, LeadInputSchema]] = []
+        phone_hashes_by_row: dict[int, str | None] = {}
+        payloads_by_row: dict[int, LeadCreateRequestSchema] = {}
+        for row, payload, phone_hash in valid:
+            if settings.dedupe_window_days > 0 and phone_hash:
+                key = (phone_hash, normalize_zone_key(payload.input.property.zone_key))
+                if key in existing or key in seen:
+                    report.duplicate(
+                        row,
+                        ApiException(
+                            status_code=409,
+                            code="DUPLICATE_PHONE_ZONE_30D",
+                            message="Lead duplicado (telefono + zona).",
+                            details={"existing_lead_id": existing.get(key)},
+                        ),
+                    )
+                    continue
+                seen.add(key)
+            to_score.append((row, payload.input))
+            phone_hashes_by_row[row] = phone_hash
+            payloads_by_row[row] = payload
+
+        errors, scored = score_inputs_batch(to_score)
+        for row, exc in errors.items():
+            report.reject(row, exc)
+        if not scored:
+            return
+
+        rows_by_model: dict[type, list[dict[str, Any]]] = {model: [] for model in _INSERT_ORDER}
+        for row, _, lead_input, raw_result, result, pricing in scored:
+            _, records, _, _ = build_lead_records(
+                payloads_by_row[row].lead,
+                lead_input,
+                raw_result,
+                result,
+                pricing,
+                ip_hash=ip_hash,
+                phone_hash=phone_hashes_by_row[row],
+                now=now,
+            )
+            for model, values in records.items():
+                rows_by_model[model].append(values)
+
+        try:
+            for model in _INSERT_ORDER:
+                # render_nulls: mismas columnas en todas las filas -> un único executemany por tabla.
+                db.execute(insert(model).execution_options(render_nulls=True), rows_by_model[model])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        lead_totals_cache.invalidate()
+        report.imported += len(scored)
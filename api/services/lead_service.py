@@ -1,23 +1,241 @@
 from __future__ import annotations
 
+import base64
+import json
 from datetime import UTC, datetime, timedelta
+from typing import Any
 from uuid import uuid4
 
+import iei_engine as engine_module
+from sqlalchemy import and_, case, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from api.errors import ApiException
 from api.iei_framework import IEI_POWERED_BY
-from api.models import IEIResultRecord, Lead, OwnerSignal, PropertyInput
-from api.schemas import LeadCreateRequestSchema
+from api.models import IEIResultRecord, Lead, LeadReservation, LeadSale, OwnerSignal, PropertyInput
+from api.schemas import LeadCreateInfoSchema, LeadCreateRequestSchema
 from api.services.commercial_service import CommercialService
-from api.services.iei_service import build_lead_card, compute_pricing_from_result, get_framework_metadata, score_lead
+from api.services.lead_totals import lead_totals_cache
+from api.services.iei_service import (
+    build_lead_card,
+    compute_pricing_from_result,
+    get_framework_metadata,
+    score_lead,
+    score_lead_from_token,
+)
+from api.services.zone_service import ZoneService
 from api.settings import get_settings
 from api.utils.ip_hash import hash_phone
 
 
+def encode_lead_cursor(created_at: datetime, lead_id: str) -> str:
+    raw = json.dumps({"c": _as_utc(created_at).isoformat(), "i": lead_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_lead_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return _as_utc(datetime.fromisoformat(data["c"])), str(data["i"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ApiException(
+            status_code=400,
+            code="VALIDATION_ERROR",
+            message="Cursor invalido.",
+            details={"field": "cursor"},
+        ) from exc
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def build_lead_records(
+    lead: LeadCreateInfoSchema,
+    lead_input: engine_module.LeadInput,
+    raw_result: engine_module.IEIResult,
+    result: dict[str, Any],
+    pricing: dict[str, Any],
+    *,
+    ip_hash: str | None,
+    phone_hash: str | None,
+    now: datetime,
+) -> tuple[str, dict[type, dict[str, Any]], dict[str, Any], dict[str, Any] | None]:
+    """Valores de columnas de las cuatro filas de un lead (alta unitaria e importación masiva)."""
+    settings = get_settings()
+    lead_card = build_lead_card(lead_input, raw_result)
+    framework = get_framework_metadata()
+    pricing_public = {
+        "lead_price_eur": pricing["lead_price_eur"],
+        "segment": pricing["segment"],
+        "policy": pricing["policy"],
+        "confidence_bucket": pricing["confidence_bucket"],
+    }
+    result["pricing"] = pricing_public
+    if framework:
+        result["iei_framework"] = framework
+    lead_card["pricing_lead"] = pricing_public
+    if framework:
+        lead_card["iei_framework"] = framework
+        lead_card["powered_by"] = IEI_POWERED_BY
+
+    lead_id = str(uuid4())
+
+    lead_row = dict(
+        id=lead_id,
+        status="nuevo",
+        owner_name=lead.owner_name,
+        owner_email=lead.owner_email,
+        owner_phone=lead.owner_phone,
+        consent_contact=lead.consent_contact,
+        consent_text_version=lead.consent_text_version,
+        consent_timestamp=now,
+        source_campaign=lead.source_campaign,
+        utm_source=lead.utm_source,
+        utm_medium=lead.utm_medium,
+        utm_campaign=lead.utm_campaign,
+        utm_term=lead.utm_term,
+        utm_content=lead.utm_content,
+        ip_hash=ip_hash,
+        phone_hash=phone_hash,
+        pricing_policy=pricing["policy"],
+        is_premium_zone=bool(pricing["is_premium_zone"]),
+        lead_price_eur=pricing["lead_price_eur"],
+        segment=pricing["segment"],
+        confidence_bucket=pricing["confidence_bucket"],
+        created_at=now,
+        updated_at=now,
+    )
+
+    property_row = dict(
+        id=str(uuid4()),
+        lead_id=lead_id,
+        zone_key=lead_input.property.zone_key,
+        municipality=lead_input.property.municipality,
+        neighborhood=lead_input.property.neighborhood,
+        postal_code=lead_input.property.postal_code,
+        property_type=lead_input.property.property_type.value,
+        m2=lead_input.property.m2,
+        condition=lead_input.property.condition.value,
+        year_built=lead_input.property.year_built,
+        has_elevator=lead_input.property.has_elevator,
+        has_terrace=lead_input.property.has_terrace,
+        terrace_m2=lead_input.property.terrace_m2,
+        has_parking=lead_input.property.has_parking,
+        has_views=lead_input.property.has_views,
+        created_at=now,
+    )
+
+    owner_row = dict(
+        id=str(uuid4()),
+        lead_id=lead_id,
+        sale_horizon=lead_input.owner.sale_horizon.value,
+        motivation=lead_input.owner.motivation.value,
+        already_listed=lead_input.owner.already_listed.value,
+        exclusivity=lead_input.owner.exclusivity.value,
+        expected_price=lead_input.owner.expected_price,
+        created_at=now,
+    )
+
+    alignment = result["pricing_alignment"]
+    price = result["price_estimate"]
+
+    iei_row = dict(
+        id=str(uuid4()),
+        lead_id=lead_id,
+        iei_score=result["iei_score"],
+        tier=result["tier"],
+        breakdown_intencion=result["breakdown"]["intencion"],
+        breakdown_precio=result["breakdown"]["precio"],
+        breakdown_mercado=result["breakdown"]["mercado"],
+        base_per_m2=price["base_per_m2"],
+        base_price=price["base_price"],
+        adjusted_price=price["adjusted_price"],
+        range_low=price["range_low"],
+        range_high=price["range_high"],
+        demand_level=price["demand_level"],
+        pricing_expected_price=alignment.get("expected_price"),
+        pricing_delta=alignment.get("delta"),
+        pricing_gap_percent=alignment.get("gap_percent"),
+        pricing_note=alignment.get("note"),
+        recommendation=result["recommendation"],
+        applied_factors_json=price.get("applied_factors", {}),
+        lead_card_json=lead_card,
+        pricing_json={
+            "policy": pricing["policy"],
+            "policy_version": pricing["policy_version"],
+            "segment": pricing["segment"],
+            "lead_price_eur": pricing["lead_price_eur"],
+            "confidence_bucket": pricing["confidence_bucket"],
+            "is_premium_zone": pricing["is_premium_zone"],
+            "policy_snapshot": pricing["policy_json"],
+            "iei_framework_version": framework["version"] if framework else None,
+            "powered_by": IEI_POWERED_BY if framework else None,
+        },
+        engine_version=settings.engine_version,
+        created_at=now,
+    )
+
+    records = {Lead: lead_row, PropertyInput: property_row, OwnerSignal: owner_row, IEIResultRecord: iei_row}
+    return lead_id, records, pricing_public, framework
+
+
 class LeadService:
     @staticmethod
     def create_lead(db: Session, payload: LeadCreateRequestSchema, ip_hash: str) -> dict:
+        now = datetime.now(UTC)
+        phone_hash = LeadService._check_consent_and_hash_phone(payload)
+
+        duplicate_query = LeadService._duplicate_query(payload, phone_hash, now)
+        if duplicate_query is not None:
+            duplicate = db.execute(duplicate_query).first()
+            if duplicate:
+                return LeadService._duplicate_response(duplicate[0])
+
+        lead_id, records, response = LeadService._score_and_build(payload, ip_hash=ip_hash, phone_hash=phone_hash, now=now)
+        try:
+            for model, values in records.items():
+                db.add(model(**values))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        lead_totals_cache.invalidate()
+        return response
+
+    @staticmethod
+    async def create_lead_async(db: AsyncSession, payload: LeadCreateRequestSchema, ip_hash: str) -> dict:
+        """`create_lead` sobre `AsyncSession`: mismas reglas, sin ocupar un hilo mientras espera a la DB.
+
+        El scoring es CPU pura sobre el snapshot de zonas (sin SQL), así que solo el dedupe y el INSERT
+        son `await`.
+        """
+        now = datetime.now(UTC)
+        phone_hash = LeadService._check_consent_and_hash_phone(payload)
+
+        duplicate_query = LeadService._duplicate_query(payload, phone_hash, now)
+        if duplicate_query is not None:
+            duplicate = (await db.execute(duplicate_query)).first()
+            if duplicate:
+                return LeadService._duplicate_response(duplicate[0])
+
+        await ZoneService.ensure_snapshot_loaded()
+        lead_id, records, response = LeadService._score_and_build(payload, ip_hash=ip_hash, phone_hash=phone_hash, now=now)
+        try:
+            db.add_all(model(**values) for model, values in records.items())
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        lead_totals_cache.invalidate()
+        return response
+
+    @staticmethod
+    def _check_consent_and_hash_phone(payload: LeadCreateRequestSchema) -> str | None:
         if not payload.lead.consent_contact:
             raise ApiException(
                 status_code=400,
@@ -25,157 +243,59 @@ class LeadService:
                 message="Se requiere consentimiento para crear el lead.",
                 details={},
             )
+        return hash_phone(payload.lead.owner_phone or "") if payload.lead.owner_phone else None
 
-        now = datetime.now(UTC)
+    @staticmethod
+    def _duplicate_query(payload: LeadCreateRequestSchema, phone_hash: str | None, now: datetime):
         settings = get_settings()
-        phone_hash = hash_phone(payload.lead.owner_phone or "") if payload.lead.owner_phone else None
-        zone_key = payload.input.property.zone_key.lower().strip()
-
-        if settings.dedupe_window_days > 0 and phone_hash:
-            cutoff = now - timedelta(days=settings.dedupe_window_days)
-            duplicate = (
-                db.query(Lead.id)
-                .join(PropertyInput, PropertyInput.lead_id == Lead.id)
-                .filter(
-                    Lead.phone_hash == phone_hash,
-                    PropertyInput.zone_key == zone_key,
-                    Lead.created_at >= cutoff,
-                )
-                .order_by(Lead.created_at.desc())
-                .first()
+        if settings.dedupe_window_days <= 0 or not phone_hash:
+            return None
+        cutoff = now - timedelta(days=settings.dedupe_window_days)
+        return (
+            select(Lead.id)
+            .join(PropertyInput, PropertyInput.lead_id == Lead.id)
+            .where(
+                Lead.phone_hash == phone_hash,
+                PropertyInput.zone_key == payload.input.property.zone_key.lower().strip(),
+                Lead.created_at >= cutoff,
             )
-            if duplicate:
-                return {
-                    "duplicate": True,
-                    "existing_lead_id": duplicate[0],
-                    "note": "DUPLICATE_PHONE_ZONE_30D",
-                }
+            .order_by(Lead.created_at.desc())
+            .limit(1)
+        )
 
-        lead_input, raw_result, result = score_lead(db, payload.input)
-        lead_card = build_lead_card(lead_input, raw_result)
-        pricing = compute_pricing_from_result(db, payload.input, result, confidence_bucket=None)
-        framework = get_framework_metadata()
-        pricing_public = {
-            "lead_price_eur": pricing["lead_price_eur"],
-            "segment": pricing["segment"],
-            "policy": pricing["policy"],
-            "confidence_bucket": pricing["confidence_bucket"],
+    @staticmethod
+    def _duplicate_response(existing_lead_id: str) -> dict:
+        return {
+            "duplicate": True,
+            "existing_lead_id": existing_lead_id,
+            "note": "DUPLICATE_PHONE_ZONE_30D",
         }
-        result["pricing"] = pricing_public
-        if framework:
-            result["iei_framework"] = framework
-        lead_card["pricing_lead"] = pricing_public
-        if framework:
-            lead_card["iei_framework"] = framework
-            lead_card["powered_by"] = IEI_POWERED_BY
-
-        lead_id = str(uuid4())
-
-        lead_row = Lead(
-            id=lead_id,
-            status="nuevo",
-            owner_name=payload.lead.owner_name,
-            owner_email=payload.lead.owner_email,
-            owner_phone=payload.lead.owner_phone,
-            consent_contact=payload.lead.consent_contact,
-            consent_text_version=payload.lead.consent_text_version,
-            consent_timestamp=now,
-            source_campaign=payload.lead.source_campaign,
-            utm_source=payload.lead.utm_source,
-            utm_medium=payload.lead.utm_medium,
-            utm_campaign=payload.lead.utm_campaign,
-            utm_term=payload.lead.utm_term,
-            utm_content=payload.lead.utm_content,
+
+    @staticmethod
+    def _score_and_build(
+        payload: LeadCreateRequestSchema,
+        *,
+        ip_hash: str,
+        phone_hash: str | None,
+        now: datetime,
+    ) -> tuple[str, dict[type, dict[str, Any]], dict]:
+        scored = score_lead_from_token(payload.input, payload.score_token)
+        if scored:
+            lead_input, raw_result, result, pricing = scored
+        else:
+            lead_input, raw_result, result = score_lead(payload.input)
+            pricing = compute_pricing_from_result(payload.input, result, confidence_bucket=None)
+        lead_id, records, pricing_public, framework = build_lead_records(
+            payload.lead,
+            lead_input,
+            raw_result,
+            result,
+            pricing,
             ip_hash=ip_hash,
             phone_hash=phone_hash,
-            pricing_policy=pricing["policy"],
-            is_premium_zone=bool(pricing["is_premium_zone"]),
-            lead_price_eur=pricing["lead_price_eur"],
-            segment=pricing["segment"],
-            confidence_bucket=pricing["confidence_bucket"],
-            created_at=now,
-            updated_at=now,
-        )
-
-        property_row = PropertyInput(
-            id=str(uuid4()),
-            lead_id=lead_id,
-            zone_key=lead_input.property.zone_key,
-            municipality=lead_input.property.municipality,
-            neighborhood=lead_input.property.neighborhood,
-            postal_code=lead_input.property.postal_code,
-            property_type=lead_input.property.property_type.value,
-            m2=lead_input.property.m2,
-            condition=lead_input.property.condition.value,
-            year_built=lead_input.property.year_built,
-            has_elevator=lead_input.property.has_elevator,
-            has_terrace=lead_input.property.has_terrace,
-            terrace_m2=lead_input.property.terrace_m2,
-            has_parking=lead_input.property.has_parking,
-            has_views=lead_input.property.has_views,
-            created_at=now,
+            now=now,
         )
 
-        owner_row = OwnerSignal(
-            id=str(uuid4()),
-            lead_id=lead_id,
-            sale_horizon=lead_input.owner.sale_horizon.value,
-            motivation=lead_input.owner.motivation.value,
-            already_listed=lead_input.owner.already_listed.value,
-            exclusivity=lead_input.owner.exclusivity.value,
-            expected_price=lead_input.owner.expected_price,
-            created_at=now,
-        )
-
-        alignment = result["pricing_alignment"]
-        price = result["price_estimate"]
-
-        iei_row = IEIResultRecord(
-            id=str(uuid4()),
-            lead_id=lead_id,
-            iei_score=result["iei_score"],
-            tier=result["tier"],
-            breakdown_intencion=result["breakdown"]["intencion"],
-            breakdown_precio=result["breakdown"]["precio"],
-            breakdown_mercado=result["breakdown"]["mercado"],
-            base_per_m2=price["base_per_m2"],
-            base_price=price["base_price"],
-            adjusted_price=price["adjusted_price"],
-            range_low=price["range_low"],
-            range_high=price["range_high"],
-            demand_level=price["demand_level"],
-            pricing_expected_price=alignment.get("expected_price"),
-            pricing_delta=alignment.get("delta"),
-            pricing_gap_percent=alignment.get("gap_percent"),
-            pricing_note=alignment.get("note"),
-            recommendation=result["recommendation"],
-            applied_factors_json=price.get("applied_factors", {}),
-            lead_card_json=lead_card,
-            pricing_json={
-                "policy": pricing["policy"],
-                "policy_version": pricing["policy_version"],
-                "segment": pricing["segment"],
-                "lead_price_eur": pricing["lead_price_eur"],
-                "confidence_bucket": pricing["confidence_bucket"],
-                "is_premium_zone": pricing["is_premium_zone"],
-                "policy_snapshot": pricing["policy_json"],
-                "iei_framework_version": framework["version"] if framework else None,
-                "powered_by": IEI_POWERED_BY if framework else None,
-            },
-            engine_version=settings.engine_version,
-            created_at=now,
-        )
-
-        try:
-            db.add(lead_row)
-            db.add(property_row)
-            db.add(owner_row)
-            db.add(iei_row)
-            db.commit()
-        except Exception:
-            db.rollback()
-            raise
-
         response_lead_card = {
             "iei_score": result["iei_score"],
             "tier": result["tier"],
@@ -188,7 +308,7 @@ class LeadService:
             response_lead_card["iei_framework"] = framework
             response_lead_card["powered_by"] = IEI_POWERED_BY
 
-        return {
+        response = {
             "lead_id": lead_id,
             "status": "nuevo",
             "result": {"iei_score": result["iei_score"], "tier": result["tier"]},
@@ -197,6 +317,7 @@ class LeadService:
             "iei_framework": framework,
             "created_at": now,
         }
+        return lead_id, records, response
 
     @staticmethod
     def list_leads(
@@ -210,9 +331,16 @@ class LeadService:
         date_to: datetime | None,
         page: int,
         page_size: int,
+        cursor: str | None = None,
+        include_total: bool = True,
     ) -> dict:
+        """Listado admin ordenado por `(created_at, id)` descendente.
+
+        Con `cursor` (el `next_cursor` de la página anterior) pagina por keyset y `page` se ignora; sin él
+        usa OFFSET. El total es opcional y se cachea por combinación de filtros (`lead_totals_cache`).
+        """
         query = (
-            db.query(Lead, PropertyInput, OwnerSignal, IEIResultRecord)
+            db.query(Lead.id)
             .join(PropertyInput, PropertyInput.lead_id == Lead.id)
             .join(OwnerSignal, OwnerSignal.lead_id == Lead.id)
             .join(IEIResultRecord, IEIResultRecord.lead_id == Lead.id)
@@ -231,41 +359,86 @@ class LeadService:
         if date_to:
             query = query.filter(Lead.created_at <= date_to)
 
-        total = query.count()
+        total = None
+        if include_total:
+            filters_key = (tier, zone_key, sale_horizon, status, date_from, date_to)
+            total = lead_totals_cache.get_or_compute(filters_key, query.count)
+
+        if cursor:
+            cursor_created_at, cursor_id = decode_lead_cursor(cursor)
+            query = query.filter(tuple_(Lead.created_at, Lead.id) < tuple_(cursor_created_at, cursor_id))
+
+        # Estado comercial en la misma consulta (sin escrituras): una reserva "active" vencida
+        # cuenta como disponible.
+        reservation_active = and_(
+            LeadReservation.status == "active",
+            LeadReservation.reserved_until > datetime.now(UTC),
+        )
         rows = (
-            query.order_by(Lead.created_at.desc())
-            .offset((page - 1) * page_size)
-            .limit(page_size)
+            query.outerjoin(LeadSale, LeadSale.lead_id == Lead.id)
+            .outerjoin(LeadReservation, LeadReservation.lead_id == Lead.id)
+            .with_entities(
+                Lead.id,
+                Lead.created_at,
+                Lead.status,
+                Lead.owner_name,
+                Lead.owner_phone,
+                Lead.lead_price_eur,
+                Lead.segment,
+                Lead.pricing_policy,
+                Lead.is_premium_zone,
+                Lead.confidence_bucket,
+                IEIResultRecord.tier,
+                IEIResultRecord.iei_score,
+                PropertyInput.zone_key,
+                OwnerSignal.sale_horizon,
+                LeadSale.sold_at,
+                case((reservation_active, LeadReservation.reserved_until), else_=None).label("reserved_until"),
+                case((reservation_active, LeadReservation.agency_id), else_=None).label("reserved_to_agency_id"),
+            )
+            .order_by(Lead.created_at.desc(), Lead.id.desc())
+            .offset(0 if cursor else (page - 1) * page_size)
+            .limit(page_size + 1)
             .all()
         )
 
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_lead_cursor(rows[-1].created_at, rows[-1].id)
+
         items = []
-        for lead, prop, owner, res in rows:
-            commercial = CommercialService.get_commercial_state(db, lead.id)
+        for row in rows:
+            if row.sold_at is not None:
+                commercial_state = "sold"
+            elif row.reserved_until is not None:
+                commercial_state = "reserved"
+            else:
+                commercial_state = "available"
             items.append(
                 {
-                    "lead_id": lead.id,
-                    "created_at": lead.created_at,
-                    "status": lead.status,
-                    "tier": res.tier,
-                    "iei_score": res.iei_score,
-                    "zone_key": prop.zone_key,
-                    "sale_horizon": owner.sale_horizon,
-                    "owner_name": lead.owner_name,
-                    "owner_phone": lead.owner_phone,
-                    "commercial_state": commercial["commercial_state"],
-                    "reserved_until": commercial["reserved_until"],
-                    "reserved_to_agency_id": commercial["reserved_to_agency_id"],
-                    "sold_at": commercial["sold_at"],
-                    "lead_price_eur": lead.lead_price_eur,
-                    "segment": lead.segment,
-                    "pricing_policy": lead.pricing_policy,
-                    "is_premium_zone": bool(lead.is_premium_zone),
-                    "confidence_bucket": lead.confidence_bucket,
+                    "lead_id": row.id,
+                    "created_at": row.created_at,
+                    "status": row.status,
+                    "tier": row.tier,
+                    "iei_score": row.iei_score,
+                    "zone_key": row.zone_key,
+                    "sale_horizon": row.sale_horizon,
+                    "owner_name": row.owner_name,
+                    "owner_phone": row.owner_phone,
+                    "commercial_state": commercial_state,
+                    "reserved_until": row.reserved_until if commercial_state == "reserved" else None,
+                    "reserved_to_agency_id": row.reserved_to_agency_id if commercial_state == "reserved" else None,
+                    "sold_at": row.sold_at,
+                    "lead_price_eur": row.lead_price_eur,
+                    "segment": row.segment,
+                    "pricing_policy": row.pricing_policy,
+                    "is_premium_zone": bool(row.is_premium_zone),
+                    "confidence_bucket": row.confidence_bucket,
                 }
             )
 
-        return {"items": items, "page": page, "page_size": page_size, "total": total}
+        return {"items": items, "page": page, "page_size": page_size, "total": total, "next_cursor": next_cursor}
 
     @staticmethod
     def get_lead_detail(db: Session, lead_id: str) -> dict:
@@ -335,6 +508,7 @@ class LeadService:
         db.add(lead)
         db.commit()
         db.refresh(lead)
+        lead_totals_cache.invalidate()
 
         return {
             "lead_id": lead.id,
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from api.settings import get_settings
+
+
+class LeadTotalsCache:
+    """Totales de `GET /api/admin/leads` por combinación de filtros.
+
+    Cada entrada vive `LEAD_LIST_TOTAL_TTL_SECONDS`; las escrituras de leads de este proceso vacían la
+    caché (`invalidate()`), las de otros workers se ven como mucho tras el TTL.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, int]] = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], int]) -> int:
+        ttl = get_settings().lead_list_total_ttl_seconds
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        total = compute()
+        if ttl > 0:
+            with self._lock:
+                if generation != self._generation:
+                    # Hubo una escritura mientras se contaba: no guardar un total que puede estar viejo.
+                    return total
+                self._entries[key] = (now + ttl, total)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+lead_totals_cache = LeadTotalsCache()
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+# Buckets de latencia HTTP (segundos), los mismos que usa por defecto el cliente de Prometheus.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+# El motor tarda decenas de microsegundos: buckets desde 10µs.
+ENGINE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+POOL_CHECKOUT_BUCKETS = (0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+DB_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos; `observe()` es un bisect y tres sumas bajo un lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de labels: [conteos por bucket (+Inf al final), suma, total].
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._series.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Valor leído al exponer (p.ej. los contadores que ya llevan los `stats()` de cada servicio).
+
+    `fn` devuelve un número o un dict `{valores de labels: número}`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        fn: Callable[[], float | dict[tuple[str, ...], float]],
+        *,
+        kind: str = "gauge",
+        labels: tuple[str, ...] = (),
+    ):
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self._fn = fn
+
+    def render(self) -> list[str]:
+        value = self._fn()
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in items if v is not None
+        ]
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso, expuesto en formato texto de Prometheus (`GET /metrics`)."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(
+        self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help_text: str,
+        fn: Callable[[], float | dict[tuple[str, ...], float]],
+        *,
+        kind: str = "gauge",
+        labels: tuple[str, ...] = (),
+    ) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, fn, kind=kind, labels=labels))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "iei_http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por plantilla de ruta y status.",
+    ("method", "route", "status"),
+)
+ENGINE_SECONDS = metrics.histogram(
+    "iei_engine_seconds",
+    "Tiempo del motor de scoring y del pricing por operación.",
+    ("op",),
+    ENGINE_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    "iei_db_queries_per_request",
+    "Consultas SQL ejecutadas por petición HTTP.",
+    ("route",),
+    QUERY_COUNT_BUCKETS,
+)
+DB_SECONDS_PER_REQUEST = metrics.histogram(
+    "iei_db_seconds_per_request",
+    "Tiempo en consultas SQL por petición HTTP.",
+    ("route",),
+    DB_TIME_BUCKETS,
+)
+DB_QUERIES = metrics.counter("iei_db_queries_total", "Consultas SQL ejecutadas (peticiones y procesos de fondo).")
+DB_QUERY_SECONDS = metrics.counter("iei_db_query_seconds_total", "Tiempo acumulado en consultas SQL.")
+DB_POOL_CHECKOUT_SECONDS = metrics.histogram(
+    "iei_db_pool_checkout_seconds",
+    "Espera hasta obtener conexión del pool (incluye abrirla o el ping si tocan).",
+    ("pool",),
+    POOL_CHECKOUT_BUCKETS,
+)
+DB_POOL_TIMEOUTS = metrics.counter(
+    "iei_db_pool_timeouts_total",
+    "Checkouts que agotaron DB_POOL_TIMEOUT_SECONDS con el pool lleno.",
+    ("pool",),
+)
+DB_POOL_PINGS = metrics.counter(
+    "iei_db_pool_pings_total",
+    "Pings de conexiones inactivas al sacarlas del pool (DB_POOL_PRE_PING=idle).",
+    ("pool", "result"),
+)
+RATE_LIMIT_REJECTIONS = metrics.counter(
+    "iei_rate_limit_rejections_total",
+    "Peticiones rechazadas con 429 por el rate limit.",
+    ("limit",),
+)
+
+
+@dataclass(slots=True)
+class RequestDbStats:
+    queries: int = 0
+    seconds: float = 0.0
+    # Solo con el perfilado activo (`DbProfileMiddleware`): veces que se ejecuta cada forma de SQL
+    # (texto con parámetros sin sustituir), para detectar N+1.
+    statements: dict[str, int] | None = None
+
+    @property
+    def duplicates(self) -> int:
+        """Ejecuciones que repiten una forma ya vista en la misma petición."""
+        if not self.statements:
+            return 0
+        return sum(count - 1 for count in self.statements.values())
+
+
+# Acumulador de la petición en curso; el threadpool de AnyIO copia el contexto, así que las rutas sync
+# también suman aquí.
+request_db_stats: ContextVar[RequestDbStats | None] = ContextVar("request_db_stats", default=None)
+
+
+def instrument_engine(engine) -> None:
+    """Cuenta y cronometra cada consulta del engine (sync, o `AsyncEngine.sync_engine`)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERIES.inc()
+        DB_QUERY_SECONDS.inc(amount=elapsed)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+            if stats.statements is not None:
+                stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Sin `after_cursor_execute`: se descarta la marca para no desalinear la pila de la conexión.
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
@@ -69,7 +69,7 @@ class PricingPolicyService:
         return db.query(Zone).filter(Zone.zone_key == zone_key.lower().strip()).first()
 
     @classmethod
-    def _resolve_policy(cls, zone: Zone | None, zone_key: str) -> tuple[str, bool, dict[str, Any]]:
+    def resolve_policy(cls, zone: Zone | None, zone_key: str) -> tuple[str, bool, dict[str, Any]]:
         normalized_zone = zone_key.lower().strip()
 
         if zone and isinstance(zone.pricing_json, dict) and zone.pricing_json:
@@ -115,12 +115,22 @@ class PricingPolicyService:
 
         return "A"
 
+    @classmethod
+    def resolve_zone_policy(cls, db: Session, zone_key: str) -> tuple[str, bool, dict[str, Any]]:
+        normalized_zone = zone_key.lower().strip()
+        return cls.resolve_policy(cls._zone_row(db, normalized_zone), normalized_zone)
+
     @classmethod
     def compute_pricing(cls, db: Session, context: PricingContext) -> dict[str, Any]:
-        zone_key = context.zone_key.lower().strip()
-        zone = cls._zone_row(db, zone_key)
+        return cls.compute_pricing_with_policy(context, cls.resolve_zone_policy(db, context.zone_key))
 
-        policy_name, is_premium_zone, policy_json = cls._resolve_policy(zone, zone_key)
+    @classmethod
+    def compute_pricing_with_policy(
+        cls,
+        context: PricingContext,
+        resolved_policy: tuple[str, bool, dict[str, Any]],
+    ) -> dict[str, Any]:
+        policy_name, is_premium_zone, policy_json = resolved_policy
         confidence_bucket = cls._resolve_confidence_bucket(context.confidence_bucket)
         segment = cls._segment_from_context(context)
 
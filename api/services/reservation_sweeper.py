@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable
+
+from sqlalchemy.orm import Session
+
+from api.services.commercial_service import CommercialService
+from api.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationSweeper:
+    """Hilo en segundo plano que marca como "expired" las reservas vencidas.
+
+    Las lecturas calculan el estado efectivo sin escribir; este barrido solo mantiene la columna `status`
+    al día cada `RESERVATION_SWEEP_SECONDS` con un único UPDATE por pasada (0 lo desactiva).
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] | None = None):
+        self._session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.runs = 0
+        self.expired = 0
+        self.failures = 0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from api.db import SessionLocal
+
+            return SessionLocal()
+        return self._session_factory()
+
+    def sweep(self) -> int:
+        db = self._new_session()
+        try:
+            expired = CommercialService.expire_reservations(db)
+        finally:
+            db.close()
+        self.runs += 1
+        self.expired += expired
+        return expired
+
+    def start(self) -> None:
+        interval = get_settings().reservation_sweep_seconds
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="reservation-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "runs": self.runs,
+            "expired": self.expired,
+            "failures": self.failures,
+        }
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception:
+                self.failures += 1
+                logger.exception("reservation sweep failed")
+
+
+reservation_sweeper = ReservationSweeper()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from api.schemas import LeadInputSchema
+from api.services.pricing_policy import BAIX_LLOBREGAT_PREMIUM_POLICY_VERSION
+from api.settings import get_settings
+from api.utils.validation import normalize_zone_key
+
+
+def canonical_input_hash(payload: LeadInputSchema) -> str:
+    data = payload.model_dump(mode="json")
+    data["property"]["zone_key"] = normalize_zone_key(data["property"]["zone_key"])
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ScoreResultCache:
+    """LRU con TTL de respuestas ya serializadas de /api/iei/score."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(payload: LeadInputSchema, zones_version: str) -> str:
+        settings = get_settings()
+        return ":".join(
+            [
+                canonical_input_hash(payload),
+                zones_version,
+                BAIX_LLOBREGAT_PREMIUM_POLICY_VERSION,
+                settings.engine_version,
+            ]
+        )
+
+    def get(self, key: str) -> bytes | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, body = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_settings = get_settings()
+score_cache = ScoreResultCache(
+    max_entries=_settings.score_cache_max_entries,
+    ttl_seconds=_settings.score_cache_ttl_seconds,
+)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+import zlib
+from typing import Any
+
+from api.settings import get_settings
+
+SCORE_TOKEN_VERSION = 3
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(body: bytes) -> bytes:
+    settings = get_settings()
+    digest = hmac.new(settings.session_secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return _b64encode(digest).encode("ascii")
+
+
+def issue_score_token(
+    *,
+    input_hash: str,
+    zones_version: str,
+    result: dict[str, Any],
+    pricing: dict[str, Any],
+) -> str:
+    """Firma el resultado y el pricing resuelto para que /api/leads no vuelva a scorear.
+
+    `policy_json` no viaja: con la misma versión de zonas es la del snapshot del registro.
+    """
+    settings = get_settings()
+    claims = {
+        "v": SCORE_TOKEN_VERSION,
+        "h": input_hash,
+        "z": zones_version,
+        "ev": settings.engine_version,
+        "exp": int(time.time()) + settings.score_token_ttl_seconds,
+        "r": result,
+        "p": {key: value for key, value in pricing.items() if key != "policy_json"},
+    }
+    raw = json.dumps(claims, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    body = _b64encode(zlib.compress(raw))
+    return f"{body}.{_sign(body.encode('ascii')).decode('ascii')}"
+
+
+def read_score_token(token: str | None, *, input_hash: str, zones_version: str) -> dict[str, Any] | None:
+    """Devuelve los claims si el token es auténtico, vigente y corresponde al input y a las zonas actuales."""
+    if not token or "." not in token:
+        return None
+
+    body, _, signature = token.partition(".")
+    try:
+        # Token del cliente: con caracteres no ASCII se trata como inválido, no como error.
+        if not hmac.compare_digest(signature.encode("ascii"), _sign(body.encode("ascii"))):
+            return None
+        claims = json.loads(zlib.decompress(_b64decode(body)))
+    except (UnicodeError, TypeError, ValueError, zlib.error):
+        return None
+    if not isinstance(claims, dict):
+        return None
+
+    settings = get_settings()
+    if (
+        claims.get("v") != SCORE_TOKEN_VERSION
+        or claims.get("exp", 0) < time.time()
+        or claims.get("h") != input_hash
+        or claims.get("z") != zones_version
+        or claims.get("ev") != settings.engine_version
+    ):
+        return None
+    return claims
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from sqlalchemy.exc import DBAPIError
+
+from api.services.metrics import metrics
+from api.services.zone_registry import read_zones_version, zone_registry
+from api.services.zone_service import ZoneService
+from api.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODES = ("dev", "production")
+READY_RETRY_SECONDS = 0.5
+
+# Último arranque de este proceso: duración por fase y total.
+_last_startup: dict[str, Any] = {}
+
+
+class StartupError(RuntimeError):
+    """La DB no está lista (inaccesible o sin migrar) al agotar STARTUP_READY_TIMEOUT_SECONDS."""
+
+
+def wait_until_ready(timeout: float | None = None) -> int:
+    """Comprobación de disponibilidad única: una lectura por PK de `zones_version` (migración 004).
+
+    Reintenta mientras la DB no responda (arranque en paralelo con Postgres en autoscaling) y falla con
+    `StartupError` si pasado `timeout` no hay conexión o falta el esquema.
+    """
+    from api.db import SessionLocal
+
+    timeout = get_settings().startup_ready_timeout_seconds if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    while True:
+        db = SessionLocal()
+        try:
+            return read_zones_version(db)
+        except DBAPIError as exc:
+            if time.monotonic() >= deadline:
+                raise StartupError(
+                    f"DB no lista tras {timeout:.0f}s (aplicar db/migrations con scripts/db_apply.sh): {exc.orig}"
+                ) from exc
+        finally:
+            db.close()
+        time.sleep(READY_RETRY_SECONDS)
+
+
+def run_startup(mode: str | None = None) -> dict[str, Any]:
+    """Arranque del worker según STARTUP_MODE.
+
+    - `dev`: crea las tablas que falten y las zonas por defecto (cómodo en local y en tests).
+    - `production`: sin DDL ni escrituras (el esquema es de `db/migrations`); una comprobación de
+      disponibilidad, registro de zonas cargado y pool precalentado antes de aceptar tráfico.
+    """
+    from api.db import Base, SessionLocal, engine, warm_pool
+
+    mode = mode or get_settings().startup_mode
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"STARTUP_MODE debe ser uno de {STARTUP_MODES}: {mode!r}")
+
+    phases: dict[str, float] = {}
+    started = time.perf_counter()
+
+    def phase(name: str, since: float) -> float:
+        now = time.perf_counter()
+        phases[name] = round(now - since, 6)
+        return now
+
+    mark = started
+    if mode == "dev":
+        Base.metadata.create_all(bind=engine)
+        mark = phase("create_all", mark)
+        db = SessionLocal()
+        try:
+            ZoneService.ensure_default_zones(db)
+            mark = phase("default_zones", mark)
+            zone_registry.refresh(db)
+            mark = phase("zone_registry", mark)
+        finally:
+            db.close()
+    else:
+        wait_until_ready()
+        mark = phase("ready_check", mark)
+        db = SessionLocal()
+        try:
+            zone_registry.refresh(db)
+        finally:
+            db.close()
+        mark = phase("zone_registry", mark)
+        warmed = warm_pool()
+        mark = phase("pool_warm", mark)
+        phases["pool_warm_connections"] = warmed
+
+    total = round(mark - started, 6)
+    _last_startup.clear()
+    _last_startup.update({"mode": mode, "seconds": total, "phases": phases})
+    logger.info("startup %s en %.3fs %s", mode, total, phases)
+    return dict(_last_startup)
+
+
+def startup_stats() -> dict[str, Any]:
+    return dict(_last_startup)
+
+
+def _startup_phase_seconds() -> dict[tuple[str, ...], float]:
+    phases = _last_startup.get("phases", {})
+    return {(name,): seconds for name, seconds in phases.items() if name != "pool_warm_connections"}
+
+
+metrics.callback(
+    "iei_startup_seconds",
+    "Duración del último arranque del worker.",
+    lambda: {(_last_startup["mode"],): _last_startup["seconds"]} if _last_startup else {},
+    labels=("mode",),
+)
+metrics.callback(
+    "iei_startup_phase_seconds",
+    "Duración de cada fase del último arranque.",
+    _startup_phase_seconds,
+    labels=("phase",),
+)
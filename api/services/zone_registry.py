@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any
+
+import iei_engine as engine_module
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from api.models import Zone, ZonesVersion
+from api.services.pricing_policy import PricingPolicyService
+from api.settings import get_settings
+
+ResolvedPolicy = tuple[str, bool, dict[str, Any]]
+
+# Tras un fallo de refresco se sigue sirviendo el snapshot anterior y se reintenta pasado este margen.
+REFRESH_RETRY_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class ZoneSnapshot:
+    """Estado de zonas inmutable: lo que el scoring necesita sin tocar la DB."""
+
+    version: int
+    source_version: int
+    cache_version: str
+    tables: engine_module.ZoneTables
+    active_zones: frozenset[str]
+    policies: Mapping[str, ResolvedPolicy]
+    fingerprint: tuple
+    loaded_at: float
+
+    def is_configured(self, zone_key: str) -> bool:
+        return zone_key in self.active_zones and zone_key in self.tables.base_price_per_m2
+
+    def policy(self, zone_key: str) -> ResolvedPolicy:
+        resolved = self.policies.get(zone_key)
+        if resolved is None:
+            # Zona sin fila: política por defecto (pura, sin SQL).
+            resolved = PricingPolicyService.resolve_policy(None, zone_key)
+        return resolved
+
+
+def _json_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def read_zones_version(db: Session) -> int:
+    """Contador de versión de zonas (lectura por PK); 0 si aún no existe la fila."""
+    return db.execute(select(ZonesVersion.version).where(ZonesVersion.id == 1)).scalar() or 0
+
+
+def bump_zones_version(db: Session) -> None:
+    """Incrementa el contador dentro de la transacción del llamante (se publica con su commit)."""
+    bumped = db.execute(update(ZonesVersion).where(ZonesVersion.id == 1).values(version=ZonesVersion.version + 1))
+    if bumped.rowcount == 0:
+        db.add(ZonesVersion(id=1, version=1))
+
+
+class ZoneRegistry:
+    """Registro de zonas por proceso con stale-while-revalidate y single-flight.
+
+    Los requests leen `current()` sin bloquear: si toca revisar el snapshot se devuelve igualmente y un
+    único hilo en segundo plano hace el trabajo. Cada `ZONES_VERSION_POLL_SECONDS` ese hilo lee el
+    contador `zones_version` y solo recarga si otro worker lo ha incrementado; cada
+    `ZONE_CACHE_TTL_SECONDS` recarga igualmente (red de seguridad para ediciones fuera de la API). Solo el
+    primer acceso (o tras `invalidate()`) carga en línea, y los hilos concurrentes esperan a esa misma
+    carga en vez de lanzar la suya.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] | None = None):
+        self._session_factory = session_factory
+        self._snapshot: ZoneSnapshot | None = None
+        self._load_lock = threading.Lock()
+        self._version = 0
+        self._retry_at = 0.0
+        self._checked_at = 0.0
+        self.hits = 0
+        self.loads = 0
+        self.version_checks = 0
+        self.background_refreshes = 0
+        self.failures = 0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from api.db import SessionLocal
+
+            return SessionLocal()
+        return self._session_factory()
+
+    def current(self) -> ZoneSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._load_blocking()
+        self.hits += 1
+
+        now = time.monotonic()
+        if now >= self._retry_at:
+            settings = get_settings()
+            if now - snapshot.loaded_at >= settings.zone_cache_ttl_seconds:
+                self._refresh_in_background(only_if_version_changed=False)
+            elif now - self._checked_at >= settings.zones_version_poll_seconds:
+                self._refresh_in_background(only_if_version_changed=True)
+        return snapshot
+
+    @property
+    def loaded(self) -> bool:
+        """Hay snapshot: `current()` no hará la carga en línea (con SQL) en el hilo que llama."""
+        return self._snapshot is not None
+
+    def refresh(self, db: Session) -> ZoneSnapshot:
+        """Recarga síncrona con la sesión del llamante (admin, arranque)."""
+        with self._load_lock:
+            return self._load(db)
+
+    def invalidate(self) -> None:
+        """Descarta el snapshot: el siguiente `current()` recarga en línea."""
+        with self._load_lock:
+            self._snapshot = None
+
+    def stats(self) -> dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "zones": len(snapshot.active_zones) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 3) if snapshot else None,
+            "source_version": snapshot.source_version if snapshot else None,
+            "hits": self.hits,
+            "loads": self.loads,
+            "version_checks": self.version_checks,
+            "background_refreshes": self.background_refreshes,
+            "failures": self.failures,
+        }
+
+    def _load_blocking(self) -> ZoneSnapshot:
+        with self._load_lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            db = self._new_session()
+            try:
+                return self._load(db)
+            finally:
+                db.close()
+
+    def _refresh_in_background(self, *, only_if_version_changed: bool) -> None:
+        # Single-flight: si ya hay una carga en curso, este request sigue con el snapshot actual.
+        if not self._load_lock.acquire(blocking=False):
+            return
+        self._checked_at = time.monotonic()
+
+        def run() -> None:
+            db = self._new_session()
+            try:
+                if only_if_version_changed:
+                    self.version_checks += 1
+                    snapshot = self._snapshot
+                    if snapshot is not None and read_zones_version(db) == snapshot.source_version:
+                        return
+                self._load(db)
+                self.background_refreshes += 1
+            except Exception:
+                self.failures += 1
+                self._retry_at = time.monotonic() + REFRESH_RETRY_SECONDS
+            finally:
+                db.close()
+                self._load_lock.release()
+
+        try:
+            threading.Thread(target=run, name="zone-registry-refresh", daemon=True).start()
+        except Exception:
+            self._load_lock.release()
+            raise
+
+    def _load(self, db: Session) -> ZoneSnapshot:
+        """Debe ejecutarse con `_load_lock` tomado."""
+        settings = get_settings()
+        source_version = read_zones_version(db)
+        rows = db.query(Zone).order_by(Zone.zone_key.asc()).all()
+        fingerprint = tuple(
+            (
+                row.zone_key,
+                row.is_active,
+                row.base_per_m2,
+                row.demand_level,
+                _json_key(row.type_factor_overrides),
+                _json_key(row.condition_factor_overrides),
+                _json_key(row.extras_add_overrides),
+                row.extras_cap_override,
+                row.pricing_policy,
+                _json_key(row.pricing_json),
+                row.is_premium,
+            )
+            for row in rows
+        )
+        # Con USE_DB_ZONES=false las tablas del motor son la fuente; su versión entra en la huella.
+        engine_version = None if settings.use_db_zones else engine_module.get_zone_tables().version
+        fingerprint = (source_version, settings.use_db_zones, engine_version, fingerprint)
+
+        previous = self._snapshot
+        now = time.monotonic()
+        self._checked_at = now
+        if previous is not None and previous.fingerprint == fingerprint:
+            snapshot = replace(previous, loaded_at=now)
+            self._snapshot = snapshot
+            return snapshot
+
+        policies = {
+            ZoneRegistry._normalize(row.zone_key): PricingPolicyService.resolve_policy(row, row.zone_key)
+            for row in rows
+        }
+
+        if settings.use_db_zones:
+            active_rows = [row for row in rows if row.is_active]
+            tables = self._compile_tables(active_rows)
+            active_zones = frozenset(ZoneRegistry._normalize(row.zone_key) for row in active_rows)
+        else:
+            tables = engine_module.get_zone_tables()
+            active_zones = frozenset(tables.base_price_per_m2)
+
+        self._version += 1
+        snapshot = ZoneSnapshot(
+            version=self._version,
+            source_version=source_version,
+            # Igual en todos los workers con los mismos datos: clave de caché y de score_token.
+            cache_version=f"{source_version}.{hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:12]}",
+            tables=tables,
+            active_zones=active_zones,
+            policies=MappingProxyType(policies),
+            fingerprint=fingerprint,
+            loaded_at=now,
+        )
+        self._snapshot = snapshot
+        self._retry_at = 0.0
+        self.loads += 1
+        return snapshot
+
+    @staticmethod
+    def _normalize(zone_key: str) -> str:
+        return zone_key.lower().strip()
+
+    @staticmethod
+    def _compile_tables(active_rows: list[Zone]) -> engine_module.ZoneTables:
+        base_map: dict[str, float] = {}
+        demand_map: dict[str, engine_module.DemandLevel] = {}
+        type_overrides: dict[str, dict[str, float]] = {}
+        condition_overrides: dict[str, dict[str, float]] = {}
+        extras_overrides: dict[str, dict[str, float]] = {}
+        cap_overrides: dict[str, float | None] = {}
+
+        for row in active_rows:
+            zone_key = ZoneRegistry._normalize(row.zone_key)
+            base_map[zone_key] = float(row.base_per_m2)
+            try:
+                demand_map[zone_key] = engine_module.DemandLevel(row.demand_level)
+            except ValueError:
+                demand_map[zone_key] = engine_module.DemandLevel.MEDIA
+            type_overrides[zone_key] = row.type_factor_overrides or {}
+            condition_overrides[zone_key] = row.condition_factor_overrides or {}
+            extras_overrides[zone_key] = row.extras_add_overrides or {}
+            cap_overrides[zone_key] = row.extras_cap_override
+
+        current = engine_module.get_zone_tables()
+        if not base_map:
+            return current
+
+        # Publicación atómica: los workers que ya leyeron el snapshot anterior lo conservan.
+        # Los overrides se resuelven aquí una vez por refresco, no en cada request.
+        tables = engine_module.ZoneTables.compile(
+            base_map,
+            demand_map,
+            version=current.version + 1,
+            type_factor_overrides=type_overrides,
+            condition_factor_overrides=condition_overrides,
+            extras_add_overrides=extras_overrides,
+            extras_cap_overrides=cap_overrides,
+        )
+        engine_module.set_zone_tables(tables)
+        return tables
+
+
+zone_registry = ZoneRegistry()
@@ -1,22 +1,17 @@
 from __future__ import annotations
 
-import threading
-import time
 from uuid import uuid4
 
-import iei_engine as engine_module
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from api.errors import ApiException
 from api.models import Zone
 from api.schemas import ZonePatchRequestSchema
-from api.settings import get_settings
+from api.services.zone_registry import ZoneSnapshot, bump_zones_version, zone_registry
 
 
 class ZoneService:
-    _lock = threading.RLock()
-    _cache_expire_at = 0.0
-
     @staticmethod
     def normalize_zone_key(zone_key: str) -> str:
         return zone_key.lower().strip()
@@ -79,78 +74,40 @@ class ZoneService:
         if now_rows:
             for row in now_rows:
                 db.add(row)
+            bump_zones_version(db)
             db.commit()
 
-    @classmethod
-    def assert_zone_configured(cls, db: Session, zone_key: str) -> None:
-        normalized = cls.normalize_zone_key(zone_key)
-        settings = get_settings()
+    @staticmethod
+    def snapshot() -> ZoneSnapshot:
+        return zone_registry.current()
 
-        if settings.use_db_zones:
-            zone = (
-                db.query(Zone)
-                .filter(Zone.zone_key == normalized, Zone.is_active.is_(True))
-                .first()
-            )
-            if not zone:
-                raise ApiException(
-                    status_code=422,
-                    code="ZONE_NOT_CONFIGURED",
-                    message=f"Zona no configurada: {normalized}",
-                    details={"zone_key": normalized},
-                )
-        else:
-            if normalized not in engine_module.BASE_PRICE_PER_M2:
-                raise ApiException(
-                    status_code=422,
-                    code="ZONE_NOT_CONFIGURED",
-                    message=f"Zona no configurada: {normalized}",
-                    details={"zone_key": normalized},
-                )
+    @staticmethod
+    async def ensure_snapshot_loaded() -> None:
+        """Para rutas async: con el registro frío la carga ejecuta SQL, así que se hace en el threadpool y
+        no bloquea el event loop. Con snapshot cargado no cuesta nada."""
+        if not zone_registry.loaded:
+            await run_in_threadpool(zone_registry.current)
 
     @classmethod
-    def apply_runtime_engine_zone_tables(cls, db: Session) -> None:
-        settings = get_settings()
-        if not settings.use_db_zones:
-            return
-
-        now = time.time()
-
-        with cls._lock:
-            if now < cls._cache_expire_at:
-                return
-
-            active_zones = (
-                db.query(Zone)
-                .filter(Zone.is_active.is_(True))
-                .order_by(Zone.zone_key.asc())
-                .all()
+    def assert_zone_configured(cls, zone_key: str, snapshot: ZoneSnapshot | None = None) -> None:
+        normalized = cls.normalize_zone_key(zone_key)
+        snapshot = snapshot or zone_registry.current()
+        if not snapshot.is_configured(normalized):
+            raise ApiException(
+                status_code=422,
+                code="ZONE_NOT_CONFIGURED",
+                message=f"Zona no configurada: {normalized}",
+                details={"zone_key": normalized},
             )
 
-            base_map: dict[str, float] = {}
-            demand_map: dict[str, engine_module.DemandLevel] = {}
-
-            for row in active_zones:
-                zone_key = cls.normalize_zone_key(row.zone_key)
-                base_map[zone_key] = float(row.base_per_m2)
-                try:
-                    demand_map[zone_key] = engine_module.DemandLevel(row.demand_level)
-                except ValueError:
-                    demand_map[zone_key] = engine_module.DemandLevel.MEDIA
-
-            if base_map:
-                engine_module.BASE_PRICE_PER_M2.clear()
-                engine_module.BASE_PRICE_PER_M2.update(base_map)
-
-                engine_module.DEMAND_INDEX.clear()
-                engine_module.DEMAND_INDEX.update(demand_map)
-
-            cls._cache_expire_at = now + settings.zone_cache_ttl_seconds
+    @staticmethod
+    def invalidate_cache() -> None:
+        zone_registry.invalidate()
 
-    @classmethod
-    def invalidate_cache(cls) -> None:
-        with cls._lock:
-            cls._cache_expire_at = 0
+    @staticmethod
+    def zones_version(snapshot: ZoneSnapshot | None = None) -> str:
+        # Cambia con cada cambio de zonas/políticas y coincide entre workers con los mismos datos.
+        return (snapshot or zone_registry.current()).cache_version
 
     @classmethod
     def update_zone(cls, db: Session, zone_id: str, payload: ZonePatchRequestSchema) -> Zone:
@@ -168,8 +125,10 @@ class ZoneService:
             setattr(zone, key, value)
 
         db.add(zone)
+        bump_zones_version(db)
         db.commit()
         db.refresh(zone)
 
-        cls.invalidate_cache()
+        # Este worker recarga en el propio request de admin; el resto lo detecta al sondear zones_version.
+        zone_registry.refresh(db)
         return zone
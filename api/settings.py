@@ -15,10 +15,21 @@ def _as_bool(value: str, default: bool = False) -> bool:
 class Settings:
     app_name: str
     app_env: str
+    startup_mode: str
+    startup_ready_timeout_seconds: float
     database_url: str
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout_seconds: float
+    db_pool_recycle_seconds: int
+    db_pool_pre_ping: str
+    db_pool_pre_ping_idle_seconds: float
+    db_async: bool
+    async_database_url: str | None
     cors_origins: list[str]
     use_db_zones: bool
     zone_cache_ttl_seconds: int
+    zones_version_poll_seconds: float
     engine_version: str
 
     admin_password: str
@@ -33,7 +44,27 @@ class Settings:
 
     rate_limit_per_minute: int
     rate_limit_leads_per_minute: int
+    rate_limit_max_keys: int
+    rate_limit_shards: int
+    rate_limit_backend: str
+    rate_limit_sqlite_path: str
     iei_framework_enabled: bool
+    metrics_enabled: bool
+    metrics_token: str
+    db_profile_headers: bool
+
+    score_cache_enabled: bool
+    score_cache_max_entries: int
+    score_cache_ttl_seconds: int
+    score_token_ttl_seconds: int
+    score_batch_max_items: int
+    lead_import_chunk_size: int
+    lead_list_total_ttl_seconds: int
+    reservation_sweep_seconds: float
+    event_queue_max_size: int
+    event_flush_batch_size: int
+    event_flush_interval_seconds: float
+    event_dedupe_cache_size: int
 
 
 def _split_csv(value: str) -> list[str]:
@@ -46,10 +77,21 @@ def get_settings() -> Settings:
     return Settings(
         app_name=os.getenv("APP_NAME", "IEI Inmobiliario API"),
         app_env=os.getenv("APP_ENV", "dev"),
+        startup_mode=os.getenv("STARTUP_MODE", "dev").strip().lower(),
+        startup_ready_timeout_seconds=float(os.getenv("STARTUP_READY_TIMEOUT_SECONDS", "30")),
         database_url=db_url,
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        db_pool_timeout_seconds=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+        db_pool_recycle_seconds=int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        db_pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "idle").strip().lower(),
+        db_pool_pre_ping_idle_seconds=float(os.getenv("DB_POOL_PRE_PING_IDLE_SECONDS", "30")),
+        db_async=_as_bool(os.getenv("DB_ASYNC", "false"), default=False),
+        async_database_url=os.getenv("ASYNC_DATABASE_URL") or None,
         cors_origins=_split_csv(os.getenv("CORS_ORIGINS", "*")),
         use_db_zones=_as_bool(os.getenv("USE_DB_ZONES", "true"), default=True),
         zone_cache_ttl_seconds=int(os.getenv("ZONE_CACHE_TTL_SECONDS", "300")),
+        zones_version_poll_seconds=float(os.getenv("ZONES_VERSION_POLL_SECONDS", "2")),
         engine_version=os.getenv("ENGINE_VERSION", "iei_engine_mvp_v1"),
         admin_password=os.getenv("ADMIN_PASSWORD", "change-me"),
         session_secret=os.getenv("SESSION_SECRET", "change-me-too"),
@@ -60,5 +102,24 @@ def get_settings() -> Settings:
         export_pii=_as_bool(os.getenv("EXPORT_PII", "false"), default=False),
         rate_limit_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "120")),
         rate_limit_leads_per_minute=int(os.getenv("RATE_LIMIT_LEADS_PER_MINUTE", "20")),
+        rate_limit_max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")),
+        rate_limit_shards=int(os.getenv("RATE_LIMIT_SHARDS", "16")),
+        rate_limit_backend=os.getenv("RATE_LIMIT_BACKEND", "memory").strip(),
+        rate_limit_sqlite_path=os.getenv("RATE_LIMIT_SQLITE_PATH", "/tmp/iei_rate_limit.sqlite3"),
         iei_framework_enabled=_as_bool(os.getenv("IEI_FRAMEWORK_ENABLED", "true"), default=True),
+        metrics_enabled=_as_bool(os.getenv("METRICS_ENABLED", "true"), default=True),
+        metrics_token=os.getenv("METRICS_TOKEN", "").strip(),
+        db_profile_headers=_as_bool(os.getenv("DB_PROFILE_HEADERS", "false"), default=False),
+        score_cache_enabled=_as_bool(os.getenv("SCORE_CACHE_ENABLED", "true"), default=True),
+        score_cache_max_entries=int(os.getenv("SCORE_CACHE_MAX_ENTRIES", "10000")),
+        score_cache_ttl_seconds=int(os.getenv("SCORE_CACHE_TTL_SECONDS", "300")),
+        score_token_ttl_seconds=int(os.getenv("SCORE_TOKEN_TTL_SECONDS", "1800")),
+        score_batch_max_items=int(os.getenv("SCORE_BATCH_MAX_ITEMS", "1000")),
+        lead_import_chunk_size=int(os.getenv("LEAD_IMPORT_CHUNK_SIZE", "500")),
+        lead_list_total_ttl_seconds=int(os.getenv("LEAD_LIST_TOTAL_TTL_SECONDS", "30")),
+        reservation_sweep_seconds=float(os.getenv("RESERVATION_SWEEP_SECONDS", "60")),
+        event_queue_max_size=int(os.getenv("EVENT_QUEUE_MAX_SIZE", "10000")),
+        event_flush_batch_size=int(os.getenv("EVENT_FLUSH_BATCH_SIZE", "500")),
+        event_flush_interval_seconds=float(os.getenv("EVENT_FLUSH_INTERVAL_SECONDS", "1")),
+        event_dedupe_cache_size=int(os.getenv("EVENT_DEDUPE_CACHE_SIZE", "100000")),
     )
@@ -17,6 +17,17 @@ def get_client_ip(request: Request) -> str:
     return "unknown"
 
 
+def scope_client_ip(scope: dict) -> str:
+    """`get_client_ip` para middlewares ASGI puros (sin construir un `Request`)."""
+    for name, value in scope.get("headers") or ():
+        if name == b"x-forwarded-for":
+            return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    if client and client[0]:
+        return client[0]
+    return "unknown"
+
+
 def hash_ip(ip: str) -> str:
     settings = get_settings()
     payload = f"{settings.ip_hash_salt}:{ip}".encode("utf-8")
@@ -0,0 +1,12 @@
+-- Contador de versión de zonas para invalidar la caché de zonas entre workers.
+-- Cada escritura de zonas desde la API incrementa `version` en la misma transacción; los workers
+-- lo sondean (lectura por PK) y solo recargan zonas cuando cambia. Las ediciones manuales de la
+-- tabla zones deben incrementarlo también.
+
+create table if not exists zones_version (
+  id smallint primary key default 1 check (id = 1),
+  version bigint not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+insert into zones_version (id, version) values (1, 0) on conflict (id) do nothing;
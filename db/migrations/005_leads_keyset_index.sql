@@ -0,0 +1,3 @@
+-- Paginación por cursor (keyset) del listado admin: orden (created_at, id) descendente.
+
+create index if not exists idx_leads_created_at_id on leads (created_at desc, id desc);
@@ -0,0 +1,3 @@
+-- Tier vigente de un lead (último resultado) resuelto dentro del INSERT condicional de reserva/venta.
+
+create index if not exists idx_iei_results_lead_created_at on iei_results (lead_id, created_at desc);
@@ -0,0 +1,14 @@
+-- Un único evento submit_lead por lead: el volcado de /api/events inserta con ON CONFLICT DO NOTHING.
+-- Antes de crear el índice se eliminan los duplicados existentes (se conserva el más antiguo).
+
+delete from events e
+using events older
+where e.event_name = 'submit_lead'
+  and older.event_name = 'submit_lead'
+  and e.lead_id is not null
+  and older.lead_id = e.lead_id
+  and (older.created_at, older.id) < (e.created_at, e.id);
+
+create unique index if not exists uq_events_submit_lead
+  on events (lead_id)
+  where event_name = 'submit_lead' and lead_id is not null;
@@ -4,3 +4,11 @@
 \i /workspace/db/migrations/002_commercial_ops.sql
 \echo 'Applying migrations from /workspace/db/migrations/003_premium_pricing_fields.sql'
 \i /workspace/db/migrations/003_premium_pricing_fields.sql
+\echo 'Applying migrations from /workspace/db/migrations/004_zones_version.sql'
+\i /workspace/db/migrations/004_zones_version.sql
+\echo 'Applying migrations from /workspace/db/migrations/005_leads_keyset_index.sql'
+\i /workspace/db/migrations/005_leads_keyset_index.sql
+\echo 'Applying migrations from /workspace/db/migrations/006_iei_results_lead_index.sql'
+\i /workspace/db/migrations/006_iei_results_lead_index.sql
+\echo 'Applying migrations from /workspace/db/migrations/007_events_submit_lead_unique.sql'
+\i /workspace/db/migrations/007_events_submit_lead_unique.sql
@@ -115,6 +115,7 @@
       },
       input: leadInput,
       company_website: String(fd.get("company_website") || "").trim() || null,
+      score_token: scoreData?.score_token || null,
     };
 
     const leadResp = await fetch(`${API_BASE}/api/leads`, {
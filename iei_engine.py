@@ -14,7 +14,8 @@ from __future__ import annotations
 
 from dataclasses import dataclass, asdict
 from enum import Enum
-from typing import Dict, Any, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Tuple
 import math
 
 
@@ -141,6 +142,7 @@ class IEIResult:
     price_estimate: PriceEstimate
     pricing_alignment: Dict[str, Any]  # delta, expected_price, gap_percent, note
     recommendation: str
+    zone_tables_version: Optional[int] = None  # versión del snapshot de zonas usado
 
 
 # -----------------------------
@@ -190,6 +192,100 @@ EXTRAS_ADD: Dict[str, float] = {
 EXTRAS_CAP = 0.10  # máximo +10% acumulado
 
 
+# -----------------------------
+# Snapshot de tablas de zona
+# -----------------------------
+#
+# El motor lee las tablas de zona desde un snapshot inmutable. Para actualizarlas se compila
+# un ZoneTables nuevo y se publica con set_zone_tables (una única asignación de referencia):
+# quien esté calculando sigue con el snapshot que leyó, sin locks ni tablas a medio rellenar.
+
+# Ordinales de enums / extras: índices de las tablas densas por zona.
+PROPERTY_TYPE_ORDINAL: Dict[PropertyType, int] = {t: i for i, t in enumerate(PropertyType)}
+CONDITION_ORDINAL: Dict[PropertyCondition, int] = {c: i for i, c in enumerate(PropertyCondition)}
+EXTRAS_KEYS: Tuple[str, ...] = tuple(EXTRAS_ADD)
+EXTRA_ELEVATOR, EXTRA_TERRACE_BIG, EXTRA_TERRACE_SMALL, EXTRA_PARKING, EXTRA_VIEWS = range(len(EXTRAS_KEYS))
+
+
+def _dense_factors(keys: Tuple[Any, ...], defaults: Mapping[Any, float], overrides: Optional[Mapping[str, float]]) -> Tuple[float, ...]:
+    # Overrides de zona (JSON con claves string) sobre la tabla global; claves desconocidas se ignoran
+    overrides = overrides or {}
+    values = []
+    for key in keys:
+        name = key.value if isinstance(key, Enum) else key
+        value = overrides.get(name)
+        values.append(float(value) if value is not None else float(defaults[key]))
+    return tuple(values)
+
+
+@dataclass(frozen=True)
+class ZoneTables:
+    version: int
+    base_price_per_m2: Mapping[str, float]
+    demand_index: Mapping[str, DemandLevel]
+    # Factores por zona ya resueltos (global + overrides), indexados por ordinal
+    type_factor: Mapping[str, Tuple[float, ...]]        # PROPERTY_TYPE_ORDINAL
+    condition_factor: Mapping[str, Tuple[float, ...]]   # CONDITION_ORDINAL
+    extras_add: Mapping[str, Tuple[float, ...]]         # EXTRAS_KEYS
+    extras_cap: Mapping[str, float]
+
+    @classmethod
+    def compile(
+        cls,
+        base_price_per_m2: Mapping[str, float],
+        demand_index: Mapping[str, DemandLevel],
+        *,
+        version: int,
+        type_factor_overrides: Optional[Mapping[str, Mapping[str, float]]] = None,
+        condition_factor_overrides: Optional[Mapping[str, Mapping[str, float]]] = None,
+        extras_add_overrides: Optional[Mapping[str, Mapping[str, float]]] = None,
+        extras_cap_overrides: Optional[Mapping[str, Optional[float]]] = None,
+    ) -> "ZoneTables":
+        type_factor_overrides = type_factor_overrides or {}
+        condition_factor_overrides = condition_factor_overrides or {}
+        extras_add_overrides = extras_add_overrides or {}
+        extras_cap_overrides = extras_cap_overrides or {}
+
+        base: Dict[str, float] = {}
+        type_factor: Dict[str, Tuple[float, ...]] = {}
+        condition_factor: Dict[str, Tuple[float, ...]] = {}
+        extras_add: Dict[str, Tuple[float, ...]] = {}
+        extras_cap: Dict[str, float] = {}
+
+        for raw_zone, value in base_price_per_m2.items():
+            zone = raw_zone.lower().strip()
+            base[zone] = float(value)
+            type_factor[zone] = _dense_factors(tuple(PropertyType), TYPE_FACTOR, type_factor_overrides.get(raw_zone))
+            condition_factor[zone] = _dense_factors(
+                tuple(PropertyCondition), CONDITION_FACTOR, condition_factor_overrides.get(raw_zone)
+            )
+            extras_add[zone] = _dense_factors(EXTRAS_KEYS, EXTRAS_ADD, extras_add_overrides.get(raw_zone))
+            cap = extras_cap_overrides.get(raw_zone)
+            extras_cap[zone] = float(cap) if cap is not None else EXTRAS_CAP
+
+        return cls(
+            version=version,
+            base_price_per_m2=MappingProxyType(base),
+            demand_index=MappingProxyType({k.lower().strip(): DemandLevel(v) for k, v in demand_index.items()}),
+            type_factor=MappingProxyType(type_factor),
+            condition_factor=MappingProxyType(condition_factor),
+            extras_add=MappingProxyType(extras_add),
+            extras_cap=MappingProxyType(extras_cap),
+        )
+
+
+_ZONE_TABLES = ZoneTables.compile(BASE_PRICE_PER_M2, DEMAND_INDEX, version=0)
+
+
+def get_zone_tables() -> ZoneTables:
+    return _ZONE_TABLES
+
+
+def set_zone_tables(tables: ZoneTables) -> None:
+    global _ZONE_TABLES
+    _ZONE_TABLES = tables
+
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -245,42 +341,46 @@ def _extras_points(p: PropertyFeatures) -> int:
 # Precio (rango conservador)
 # -----------------------------
 
-def estimate_price(p: PropertyFeatures) -> PriceEstimate:
+def estimate_price(p: PropertyFeatures, tables: Optional[ZoneTables] = None) -> PriceEstimate:
+    tables = tables or _ZONE_TABLES
     zone = p.zone_key.lower().strip()
-    if zone not in BASE_PRICE_PER_M2:
+    if zone not in tables.base_price_per_m2:
         raise ValueError(f"Zona no configurada: {zone}")
 
-    base_per_m2 = BASE_PRICE_PER_M2[zone]
-    demand_level = DEMAND_INDEX.get(zone, DemandLevel.MEDIA)
+    base_per_m2 = tables.base_price_per_m2[zone]
+    demand_level = tables.demand_index.get(zone, DemandLevel.MEDIA)
 
     base_price = p.m2 * base_per_m2
 
+    # Factores de la zona (globales + overrides), compilados en el snapshot
+    extras = tables.extras_add[zone]
+
     factors: Dict[str, float] = {}
-    f_type = TYPE_FACTOR[p.property_type]
-    f_cond = CONDITION_FACTOR[p.condition]
+    f_type = tables.type_factor[zone][PROPERTY_TYPE_ORDINAL[p.property_type]]
+    f_cond = tables.condition_factor[zone][CONDITION_ORDINAL[p.condition]]
     factors["type"] = f_type
     factors["condition"] = f_cond
 
     extras_add = 0.0
     if p.has_elevator:
-        extras_add += EXTRAS_ADD["elevator"]
-        factors["extra_elevator"] = 1.0 + EXTRAS_ADD["elevator"]
+        extras_add += extras[EXTRA_ELEVATOR]
+        factors["extra_elevator"] = 1.0 + extras[EXTRA_ELEVATOR]
     if p.has_parking:
-        extras_add += EXTRAS_ADD["parking"]
-        factors["extra_parking"] = 1.0 + EXTRAS_ADD["parking"]
+        extras_add += extras[EXTRA_PARKING]
+        factors["extra_parking"] = 1.0 + extras[EXTRA_PARKING]
     if p.has_views:
-        extras_add += EXTRAS_ADD["views"]
-        factors["extra_views"] = 1.0 + EXTRAS_ADD["views"]
+        extras_add += extras[EXTRA_VIEWS]
+        factors["extra_views"] = 1.0 + extras[EXTRA_VIEWS]
 
     if p.has_terrace:
         if p.terrace_m2 is not None and p.terrace_m2 > 10:
-            extras_add += EXTRAS_ADD["terrace_big"]
-            factors["extra_terrace"] = 1.0 + EXTRAS_ADD["terrace_big"]
+            extras_add += extras[EXTRA_TERRACE_BIG]
+            factors["extra_terrace"] = 1.0 + extras[EXTRA_TERRACE_BIG]
         else:
-            extras_add += EXTRAS_ADD["terrace_small"]
-            factors["extra_terrace"] = 1.0 + EXTRAS_ADD["terrace_small"]
+            extras_add += extras[EXTRA_TERRACE_SMALL]
+            factors["extra_terrace"] = 1.0 + extras[EXTRA_TERRACE_SMALL]
 
-    extras_add = _clamp(extras_add, 0.0, EXTRAS_CAP)
+    extras_add = _clamp(extras_add, 0.0, tables.extras_cap[zone])
     extras_factor = 1.0 + extras_add
     factors["extras_factor_capped"] = extras_factor
 
@@ -423,12 +523,94 @@ def _recommendation(score: int, price_note: str, est: PriceEstimate, o: OwnerSig
     return f"Ventabilidad baja. {price_note} Recomendado revisar precio/condición o esperar a un mejor momento de mercado."
 
 
-def compute_iei(lead: LeadInput) -> IEIResult:
-    est = estimate_price(lead.property)
+# -----------------------------
+# Tablas precalculadas (parte discreta del score)
+# -----------------------------
+#
+# _intention_score solo depende de 4 enums (4*9*3*3 = 324 combinaciones) y _market_score de
+# demanda, tipología, estado y nº de extras (3*5*4*5 = 300). Se precalculan al importar llamando
+# a las propias reglas (idénticas por construcción) en tablas planas de enteros; cada enum
+# aporta su offset ya multiplicado por el stride, así el índice es una suma de 4 términos.
+
+def _offsets(members: Tuple[Any, ...], stride: int) -> Dict[Any, int]:
+    return {member: idx * stride for idx, member in enumerate(members)}
+
+
+_INT_HORIZON = _offsets(tuple(SaleHorizon), len(Motivation) * len(ListingStatus) * len(ExclusivityDisposition))
+_INT_MOTIVATION = _offsets(tuple(Motivation), len(ListingStatus) * len(ExclusivityDisposition))
+_INT_LISTED = _offsets(tuple(ListingStatus), len(ExclusivityDisposition))
+_INT_EXCLUSIVITY = _offsets(tuple(ExclusivityDisposition), 1)
 
-    s_int = _intention_score(lead.owner)
+MARKET_EXTRAS_SLOTS = 5  # 0..4 extras
+_MKT_DEMAND = _offsets(tuple(DemandLevel), len(PropertyType) * len(PropertyCondition) * MARKET_EXTRAS_SLOTS)
+_MKT_TYPE = _offsets(tuple(PropertyType), len(PropertyCondition) * MARKET_EXTRAS_SLOTS)
+_MKT_CONDITION = _offsets(tuple(PropertyCondition), MARKET_EXTRAS_SLOTS)
+
+
+def _build_intention_table() -> Tuple[int, ...]:
+    return tuple(
+        _intention_score(OwnerSignals(h, m, li, e, None))
+        for h in SaleHorizon
+        for m in Motivation
+        for li in ListingStatus
+        for e in ExclusivityDisposition
+    )
+
+
+def _build_market_table() -> Tuple[int, ...]:
+    table = []
+    for d in DemandLevel:
+        est = PriceEstimate(0.0, 0.0, 0.0, 0.0, 0.0, d, {})
+        for t in PropertyType:
+            for c in PropertyCondition:
+                for n in range(MARKET_EXTRAS_SLOTS):
+                    p = PropertyFeatures(
+                        zone_key="",
+                        municipality="",
+                        neighborhood=None,
+                        postal_code=None,
+                        property_type=t,
+                        m2=1.0,
+                        condition=c,
+                        has_elevator=n >= 1,
+                        has_parking=n >= 2,
+                        has_terrace=n >= 3,
+                        has_views=n >= 4,
+                    )
+                    table.append(_market_score(p, est))
+    return tuple(table)
+
+
+INTENTION_TABLE: Tuple[int, ...] = _build_intention_table()
+MARKET_TABLE: Tuple[int, ...] = _build_market_table()
+
+
+def _intention_score_lookup(o: OwnerSignals) -> int:
+    return INTENTION_TABLE[
+        _INT_HORIZON[o.sale_horizon]
+        + _INT_MOTIVATION[o.motivation]
+        + _INT_LISTED[o.already_listed]
+        + _INT_EXCLUSIVITY[o.exclusivity]
+    ]
+
+
+def _market_score_lookup(p: PropertyFeatures, est: PriceEstimate) -> int:
+    extras = p.has_elevator + p.has_parking + p.has_terrace + p.has_views
+    return MARKET_TABLE[_MKT_DEMAND[est.demand_level] + _MKT_TYPE[p.property_type] + _MKT_CONDITION[p.condition] + extras]
+
+
+def compute_iei(lead: LeadInput, tables: Optional[ZoneTables] = None, *, precomputed: bool = True) -> IEIResult:
+    # precomputed=False evalúa las reglas directamente (modo referencia, mismo resultado)
+    tables = tables or _ZONE_TABLES
+    est = estimate_price(lead.property, tables)
+
+    if precomputed:
+        s_int = _intention_score_lookup(lead.owner)
+        s_market = _market_score_lookup(lead.property, est)
+    else:
+        s_int = _intention_score(lead.owner)
+        s_market = _market_score(lead.property, est)
     s_price, align = _price_alignment_score(lead.owner.expected_price, est)
-    s_market = _market_score(lead.property, est)
 
     total = int(_clamp(s_int + s_price + s_market, 0, 100))
     tier = _tier_from_score(total)
@@ -442,6 +624,7 @@ def compute_iei(lead: LeadInput) -> IEIResult:
         price_estimate=est,
         pricing_alignment=align,
         recommendation=rec,
+        zone_tables_version=tables.version,
     )
 
 
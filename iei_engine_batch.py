@@ -0,0 +1,368 @@
+# iei_engine_batch.py
+# IEI Inmobiliario — Motor de scoring en lote (columnar, NumPy)
+#
+# Objetivo:
+# - Re-scorear decenas de miles de leads (p.ej. tras cambiar la tabla de zonas) sin pagar
+#   el coste por-lead de dataclasses + lookups en dicts de `iei_engine.compute_iei`.
+# - Entrada struct-of-arrays (`LeadBatch`) y salida struct-of-arrays (`IEIBatchResult`).
+# - Resultados idénticos al camino escalar: `IEIBatchResult.result(i)` materializa el mismo
+#   `IEIResult` que devolvería `compute_iei` para el lead i.
+#
+# Nota:
+# - Las tablas discretas (puntos de intención / mercado) son las precalculadas en `iei_engine`
+#   (INTENTION_TABLE / MARKET_TABLE), así que no hay una segunda copia de los valores.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+import iei_engine as engine
+from iei_engine import (
+    DemandLevel,
+    ExclusivityDisposition,
+    IEIResult,
+    LeadInput,
+    ListingStatus,
+    Motivation,
+    PriceEstimate,
+    PropertyCondition,
+    PropertyType,
+    SaleHorizon,
+    Tier,
+    ZoneTables,
+)
+
+
+# -----------------------------
+# Ordinales de enums
+# -----------------------------
+
+PROPERTY_TYPES = tuple(PropertyType)
+PROPERTY_CONDITIONS = tuple(PropertyCondition)
+SALE_HORIZONS = tuple(SaleHorizon)
+MOTIVATIONS = tuple(Motivation)
+LISTING_STATUSES = tuple(ListingStatus)
+EXCLUSIVITIES = tuple(ExclusivityDisposition)
+DEMAND_LEVELS = tuple(DemandLevel)
+TIERS = tuple(Tier)
+
+
+def _ordinals(members: Sequence[Any]) -> Dict[Any, int]:
+    return {member: idx for idx, member in enumerate(members)}
+
+
+_PROPERTY_TYPE_ORD = engine.PROPERTY_TYPE_ORDINAL
+_CONDITION_ORD = engine.CONDITION_ORDINAL
+_SALE_HORIZON_ORD = _ordinals(SALE_HORIZONS)
+_MOTIVATION_ORD = _ordinals(MOTIVATIONS)
+_LISTING_ORD = _ordinals(LISTING_STATUSES)
+_EXCLUSIVITY_ORD = _ordinals(EXCLUSIVITIES)
+_DEMAND_ORD = _ordinals(DEMAND_LEVELS)
+
+
+# -----------------------------
+# Tablas discretas (derivadas de las reglas escalares)
+# -----------------------------
+
+# Mismas tablas planas que usa compute_iei, vistas como arrays N-dimensionales
+INTENTION_POINTS = np.array(engine.INTENTION_TABLE, dtype=np.int64).reshape(
+    len(SALE_HORIZONS), len(MOTIVATIONS), len(LISTING_STATUSES), len(EXCLUSIVITIES)
+)
+MARKET_POINTS = np.array(engine.MARKET_TABLE, dtype=np.int64).reshape(
+    len(DEMAND_LEVELS), len(PROPERTY_TYPES), len(PROPERTY_CONDITIONS), engine.MARKET_EXTRAS_SLOTS
+)
+
+
+# -----------------------------
+# Entrada / salida columnar
+# -----------------------------
+
+@dataclass(frozen=True)
+class LeadBatch:
+    """Leads en formato struct-of-arrays.
+
+    Los enums van como ordinales (`np.int8`, índice en la tupla correspondiente de este módulo),
+    la zona va codificada como diccionario (`zones` + índice `zone`) y los opcionales numéricos
+    como `NaN` (terrace_m2, expected_price).
+    """
+
+    zones: tuple[str, ...]        # claves de zona normalizadas
+    zone: np.ndarray              # índice en `zones`
+    property_type: np.ndarray     # ordinal PROPERTY_TYPES
+    m2: np.ndarray                # float64
+    condition: np.ndarray         # ordinal PROPERTY_CONDITIONS
+    has_elevator: np.ndarray      # bool
+    has_terrace: np.ndarray       # bool
+    terrace_m2: np.ndarray        # float64 (NaN = None)
+    has_parking: np.ndarray       # bool
+    has_views: np.ndarray         # bool
+    sale_horizon: np.ndarray      # ordinal SALE_HORIZONS
+    motivation: np.ndarray        # ordinal MOTIVATIONS
+    already_listed: np.ndarray    # ordinal LISTING_STATUSES
+    exclusivity: np.ndarray       # ordinal EXCLUSIVITIES
+    expected_price: np.ndarray    # float64 (NaN = None)
+
+    def __len__(self) -> int:
+        return int(self.m2.shape[0])
+
+    @classmethod
+    def from_leads(cls, leads: Sequence[LeadInput]) -> "LeadBatch":
+        props = [lead.property for lead in leads]
+        owners = [lead.owner for lead in leads]
+        zone_codes: Dict[str, int] = {}
+        zone = [zone_codes.setdefault(p.zone_key.lower().strip(), len(zone_codes)) for p in props]
+        return cls(
+            zones=tuple(zone_codes),
+            zone=np.array(zone, dtype=np.int32),
+            property_type=np.array([_PROPERTY_TYPE_ORD[p.property_type] for p in props], dtype=np.int8),
+            m2=np.array([p.m2 for p in props], dtype=np.float64),
+            condition=np.array([_CONDITION_ORD[p.condition] for p in props], dtype=np.int8),
+            has_elevator=np.array([p.has_elevator for p in props], dtype=bool),
+            has_terrace=np.array([p.has_terrace for p in props], dtype=bool),
+            terrace_m2=np.array(
+                [np.nan if p.terrace_m2 is None else p.terrace_m2 for p in props], dtype=np.float64
+            ),
+            has_parking=np.array([p.has_parking for p in props], dtype=bool),
+            has_views=np.array([p.has_views for p in props], dtype=bool),
+            sale_horizon=np.array([_SALE_HORIZON_ORD[o.sale_horizon] for o in owners], dtype=np.int8),
+            motivation=np.array([_MOTIVATION_ORD[o.motivation] for o in owners], dtype=np.int8),
+            already_listed=np.array([_LISTING_ORD[o.already_listed] for o in owners], dtype=np.int8),
+            exclusivity=np.array([_EXCLUSIVITY_ORD[o.exclusivity] for o in owners], dtype=np.int8),
+            expected_price=np.array(
+                [np.nan if o.expected_price is None else o.expected_price for o in owners], dtype=np.float64
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class IEIBatchResult:
+    batch: LeadBatch
+    iei_score: np.ndarray         # int64
+    tier: np.ndarray              # ordinal TIERS
+    intencion: np.ndarray         # int64
+    precio: np.ndarray            # int64
+    mercado: np.ndarray           # int64
+    base_per_m2: np.ndarray       # float64
+    base_price: np.ndarray        # float64 (redondeado)
+    adjusted_price: np.ndarray    # float64 (redondeado)
+    range_low: np.ndarray         # float64 (redondeado)
+    range_high: np.ndarray        # float64 (redondeado)
+    demand_level: np.ndarray      # ordinal DEMAND_LEVELS
+    type_factor: np.ndarray       # float64
+    condition_factor: np.ndarray  # float64
+    extras_factor: np.ndarray     # float64 (capado)
+    delta: np.ndarray             # float64 (NaN si no hay expectativa)
+    tables: ZoneTables
+
+    def __len__(self) -> int:
+        return int(self.iei_score.shape[0])
+
+    def _price_estimate(self, i: int) -> PriceEstimate:
+        b = self.batch
+        extras = self.tables.extras_add[b.zones[int(b.zone[i])]]
+        factors: Dict[str, float] = {
+            "type": float(self.type_factor[i]),
+            "condition": float(self.condition_factor[i]),
+        }
+        if b.has_elevator[i]:
+            factors["extra_elevator"] = 1.0 + extras[engine.EXTRA_ELEVATOR]
+        if b.has_parking[i]:
+            factors["extra_parking"] = 1.0 + extras[engine.EXTRA_PARKING]
+        if b.has_views[i]:
+            factors["extra_views"] = 1.0 + extras[engine.EXTRA_VIEWS]
+        if b.has_terrace[i]:
+            terrace_m2 = b.terrace_m2[i]
+            big = not np.isnan(terrace_m2) and terrace_m2 > 10
+            factors["extra_terrace"] = 1.0 + extras[engine.EXTRA_TERRACE_BIG if big else engine.EXTRA_TERRACE_SMALL]
+        factors["extras_factor_capped"] = float(self.extras_factor[i])
+
+        return PriceEstimate(
+            base_per_m2=float(self.base_per_m2[i]),
+            base_price=float(self.base_price[i]),
+            adjusted_price=float(self.adjusted_price[i]),
+            range_low=float(self.range_low[i]),
+            range_high=float(self.range_high[i]),
+            demand_level=DEMAND_LEVELS[int(self.demand_level[i])],
+            applied_factors=factors,
+        )
+
+    def _alignment(self, i: int, est: PriceEstimate) -> Dict[str, Any]:
+        raw_expected = self.batch.expected_price[i]
+        expected: Optional[float] = None if np.isnan(raw_expected) else float(raw_expected)
+        if expected is None or expected <= 0:
+            return {
+                "expected_price": expected,
+                "estimated_range": (est.range_low, est.range_high),
+                "delta": None,
+                "gap_percent": None,
+                "note": "Sin expectativa de precio: alineación parcial (menor precisión comercial).",
+            }
+
+        delta = float(self.delta[i])
+        score = int(self.precio[i])
+        note = "Expectativa alineada con mercado." if score >= 22 else "Expectativa por encima del mercado: puede alargar venta."
+        if delta < -0.10:
+            note = "Expectativa por debajo del mercado: podría vender rápido, revisar condiciones."
+
+        return {
+            "expected_price": engine._round_price(expected),
+            "estimated_range": (est.range_low, est.range_high),
+            "delta": delta,
+            "gap_percent": round(delta * 100, 1),
+            "note": note,
+        }
+
+    def result(self, i: int) -> IEIResult:
+        """Materializa el `IEIResult` del lead i (idéntico al de `compute_iei`)."""
+        est = self._price_estimate(i)
+        align = self._alignment(i, est)
+        total = int(self.iei_score[i])
+        return IEIResult(
+            iei_score=total,
+            tier=TIERS[int(self.tier[i])],
+            breakdown={
+                "intencion": int(self.intencion[i]),
+                "precio": int(self.precio[i]),
+                "mercado": int(self.mercado[i]),
+            },
+            price_estimate=est,
+            pricing_alignment=align,
+            recommendation=engine._recommendation(total, align.get("note", ""), est, None),
+            zone_tables_version=self.tables.version,
+        )
+
+    def results(self) -> list[IEIResult]:
+        return [self.result(i) for i in range(len(self))]
+
+
+# -----------------------------
+# Helpers vectorizados
+# -----------------------------
+
+def _round_price(x: np.ndarray) -> np.ndarray:
+    # Igual que engine._round_price: np.round redondea a par, como round() de Python
+    return np.round(x / 500.0) * 500.0
+
+
+def _zone_columns(batch: LeadBatch, tables: ZoneTables) -> Dict[str, np.ndarray]:
+    # Una fila por zona distinta del lote; luego se expanden por lead con batch.zone
+    for zone in batch.zones:
+        if zone not in tables.base_price_per_m2:
+            raise ValueError(f"Zona no configurada: {zone}")
+
+    zones = batch.zones
+    return {
+        "base_per_m2": np.array([tables.base_price_per_m2[z] for z in zones], dtype=np.float64),
+        "demand_level": np.array(
+            [_DEMAND_ORD[tables.demand_index.get(z, DemandLevel.MEDIA)] for z in zones], dtype=np.int8
+        ),
+        "type_factor": np.array([tables.type_factor[z] for z in zones], dtype=np.float64).reshape(len(zones), -1),
+        "condition_factor": np.array([tables.condition_factor[z] for z in zones], dtype=np.float64).reshape(
+            len(zones), -1
+        ),
+        "extras_add": np.array([tables.extras_add[z] for z in zones], dtype=np.float64).reshape(len(zones), -1),
+        "extras_cap": np.array([tables.extras_cap[z] for z in zones], dtype=np.float64),
+    }
+
+
+# -----------------------------
+# Scoring en lote
+# -----------------------------
+
+def estimate_price_batch(batch: LeadBatch, tables: Optional[ZoneTables] = None) -> Dict[str, np.ndarray]:
+    cols = _zone_columns(batch, tables or engine.get_zone_tables())
+    zone = batch.zone
+
+    base_per_m2 = cols["base_per_m2"][zone]
+    demand_level = cols["demand_level"][zone]
+    base_price = batch.m2 * base_per_m2
+
+    type_factor = cols["type_factor"][zone, batch.property_type]
+    condition_factor = cols["condition_factor"][zone, batch.condition]
+
+    # Mismo orden de suma que el camino escalar (elevator, parking, views, terrace)
+    extras = cols["extras_add"][zone]
+    extras_add = np.zeros(len(batch), dtype=np.float64)
+    extras_add += np.where(batch.has_elevator, extras[:, engine.EXTRA_ELEVATOR], 0.0)
+    extras_add += np.where(batch.has_parking, extras[:, engine.EXTRA_PARKING], 0.0)
+    extras_add += np.where(batch.has_views, extras[:, engine.EXTRA_VIEWS], 0.0)
+    with np.errstate(invalid="ignore"):
+        terrace_big = batch.terrace_m2 > 10
+    terrace_add = np.where(terrace_big, extras[:, engine.EXTRA_TERRACE_BIG], extras[:, engine.EXTRA_TERRACE_SMALL])
+    extras_add += np.where(batch.has_terrace, terrace_add, 0.0)
+
+    extras_factor = 1.0 + np.clip(extras_add, 0.0, cols["extras_cap"][zone])
+
+    adjusted = base_price * type_factor * condition_factor * extras_factor
+
+    return {
+        "base_per_m2": base_per_m2,
+        "base_price": _round_price(base_price),
+        "adjusted_price": _round_price(adjusted),
+        "range_low": _round_price(adjusted * 0.97),
+        "range_high": _round_price(adjusted * 1.05),
+        "demand_level": demand_level,
+        "type_factor": type_factor,
+        "condition_factor": condition_factor,
+        "extras_factor": extras_factor,
+    }
+
+
+def _price_alignment_score_batch(expected_price: np.ndarray, adjusted_price: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    has_expectation = ~np.isnan(expected_price) & (np.nan_to_num(expected_price, nan=0.0) > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = np.where(has_expectation, (expected_price - adjusted_price) / adjusted_price, np.nan)
+
+    score = np.select(
+        [delta <= 0.05, delta <= 0.10, delta <= 0.15, delta <= 0.25],
+        [30, 22, 14, 6],
+        default=0,
+    )
+    score = np.where(delta < -0.10, 20, score)
+    score = np.where(has_expectation, score, 10).astype(np.int64)
+    return score, delta
+
+
+def _market_score_batch(batch: LeadBatch, demand_level: np.ndarray) -> np.ndarray:
+    extras = (
+        batch.has_elevator.astype(np.int64)
+        + batch.has_parking.astype(np.int64)
+        + batch.has_terrace.astype(np.int64)
+        + batch.has_views.astype(np.int64)
+    )
+    return MARKET_POINTS[demand_level, batch.property_type, batch.condition, extras]
+
+
+def _tier_from_score_batch(score: np.ndarray) -> np.ndarray:
+    return np.select(
+        [score >= 85, score >= 70, score >= 55],
+        [TIERS.index(Tier.A), TIERS.index(Tier.B), TIERS.index(Tier.C)],
+        default=TIERS.index(Tier.D),
+    ).astype(np.int8)
+
+
+def compute_iei_batch(batch: LeadBatch, tables: Optional[ZoneTables] = None) -> IEIBatchResult:
+    tables = tables or engine.get_zone_tables()
+    est = estimate_price_batch(batch, tables)
+
+    s_int = INTENTION_POINTS[batch.sale_horizon, batch.motivation, batch.already_listed, batch.exclusivity]
+    s_price, delta = _price_alignment_score_batch(batch.expected_price, est["adjusted_price"])
+    s_market = _market_score_batch(batch, est["demand_level"])
+
+    total = np.clip(s_int + s_price + s_market, 0, 100)
+
+    return IEIBatchResult(
+        batch=batch,
+        iei_score=total,
+        tier=_tier_from_score_batch(total),
+        intencion=s_int,
+        precio=s_price,
+        mercado=s_market,
+        delta=delta,
+        tables=tables,
+        **est,
+    )
@@ -30,6 +30,10 @@ SEED_SQL_001="db/seed/001_zones.sql"
 MIGRATION_SQL_002="db/migrations/002_commercial_ops.sql"
 SEED_SQL_002="db/seed/002_agencies_seed.sql"
 MIGRATION_SQL_003="db/migrations/003_premium_pricing_fields.sql"
+MIGRATION_SQL_004="db/migrations/004_zones_version.sql"
+MIGRATION_SQL_005="db/migrations/005_leads_keyset_index.sql"
+MIGRATION_SQL_006="db/migrations/006_iei_results_lead_index.sql"
+MIGRATION_SQL_007="db/migrations/007_events_submit_lead_unique.sql"
 SEED_SQL_003="db/seed/003_premium_zones.sql"
 
 if [ ! -f "$MIGRATION_SQL_001" ] || [ ! -f "$SEED_SQL_001" ]; then
@@ -50,6 +54,26 @@ if [ -f "$MIGRATION_SQL_003" ]; then
   psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$MIGRATION_SQL_003"
 fi
 
+if [ -f "$MIGRATION_SQL_004" ]; then
+  echo "[db] aplicando migración: $MIGRATION_SQL_004"
+  psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$MIGRATION_SQL_004"
+fi
+
+if [ -f "$MIGRATION_SQL_005" ]; then
+  echo "[db] aplicando migración: $MIGRATION_SQL_005"
+  psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$MIGRATION_SQL_005"
+fi
+
+if [ -f "$MIGRATION_SQL_006" ]; then
+  echo "[db] aplicando migración: $MIGRATION_SQL_006"
+  psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$MIGRATION_SQL_006"
+fi
+
+if [ -f "$MIGRATION_SQL_007" ]; then
+  echo "[db] aplicando migración: $MIGRATION_SQL_007"
+  psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$MIGRATION_SQL_007"
+fi
+
 echo "[db] aplicando seed: $SEED_SQL_001"
 psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SEED_SQL_001"
 
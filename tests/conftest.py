@@ -0,0 +1,13 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# `api.db` crea el engine al importarse: la DB de los tests se fija antes de recoger los módulos, en un
+# directorio temporal (nunca en el árbol del repo).
+_TEST_DB_DIR = Path(tempfile.mkdtemp(prefix="iei-tests-"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TEST_DB_DIR / 'test_api.db'}")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TEST_DB_DIR, ignore_errors=True)
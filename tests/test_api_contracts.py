@@ -1,15 +1,18 @@
 import os
 
-os.environ.setdefault("DATABASE_URL", "sqlite:///./test_api_contracts.db")
 os.environ.setdefault("USE_DB_ZONES", "false")
 os.environ.setdefault("ADMIN_PASSWORD", "test-admin")
 os.environ.setdefault("SESSION_SECRET", "test-secret")
+os.environ.setdefault("METRICS_TOKEN", "test-metrics-token")
+os.environ.setdefault("DB_PROFILE_HEADERS", "true")
 
+import pytest
 from fastapi.testclient import TestClient
 
 from api.db import Base, SessionLocal, engine
 from api.main import app
 from api.models import Zone
+from api.services.zone_registry import zone_registry
 from iei_engine import _tier_from_score, Tier
 
 client = TestClient(app)
@@ -44,6 +47,7 @@ def setup_module():
         db.commit()
     finally:
         db.close()
+    zone_registry.invalidate()
 
 
 def teardown_module():
@@ -77,6 +81,16 @@ def valid_score_payload(zone_key="castelldefels"):
     }
 
 
+def assert_query_budget(resp, max_queries, max_duplicates=0):
+    """Presupuesto de SQL de una petición, leído de las cabeceras de `DB_PROFILE_HEADERS`."""
+    label = f"{resp.request.method} {resp.request.url.path}"
+    queries = int(resp.headers["x-db-queries"])
+    duplicates = int(resp.headers["x-db-duplicate-queries"])
+    assert queries <= max_queries, f"{label}: {queries} consultas (presupuesto {max_queries})"
+    assert duplicates <= max_duplicates, f"{label}: {duplicates} consultas repetidas (posible N+1)"
+    return resp
+
+
 def valid_lead_payload(consent=True):
     return {
         "lead": {
@@ -163,3 +177,734 @@ def test_lead_201_contains_pricing_and_admin_list_exposes_fields():
     assert "segment" in row
     assert "pricing_policy" in row
     assert "is_premium_zone" in row
+
+
+def test_score_cache_hits_on_identical_payload_and_misses_after_zone_change():
+    from api.services.score_cache import score_cache
+
+    score_cache.clear()
+    payload = valid_score_payload()
+    payload["owner"]["expected_price"] = 371000
+
+    first = client.post("/api/iei/score", json=payload)
+    before = score_cache.stats()
+    payload["property"]["zone_key"] = " Castelldefels "
+    second = client.post("/api/iei/score", json=payload)
+    after_hit = score_cache.stats()
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert after_hit["hits"] == before["hits"] + 1
+
+    login_resp = client.post("/api/admin/login", json={"password": "test-admin"})
+    assert login_resp.status_code == 200
+    patch = client.patch("/api/admin/zones/z-castelldefels", json={"base_per_m2": 3350})
+    assert patch.status_code == 200
+
+    third = client.post("/api/iei/score", json=payload)
+    assert third.status_code == 200
+    assert score_cache.stats()["misses"] == after_hit["misses"] + 1
+
+    stats = client.get("/api/admin/ops/cache")
+    assert stats.status_code == 200
+    assert {"hits", "misses", "evictions", "size"} <= set(stats.json()["score_cache"])
+
+
+def test_score_cache_is_bounded_and_expires():
+    from api.services.score_cache import ScoreResultCache
+
+    cache = ScoreResultCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    expired = ScoreResultCache(max_entries=2, ttl_seconds=0)
+    expired.put("a", b"1")
+    assert expired.get("a") is None
+
+
+def test_lead_reuses_signed_score_token_and_rejects_tampered_one(monkeypatch):
+    import iei_engine
+    import api.services.iei_service as iei_service_module
+    import api.services.lead_service as lead_service_module
+
+    payload = valid_lead_payload(consent=True)
+    payload["lead"]["owner_phone"] = "+34600999111"
+    score_resp = client.post("/api/iei/score", json=payload["input"])
+    assert score_resp.status_code == 200
+    token = score_resp.json()["score_token"]
+    # Sin `policy_json` (sale del snapshot de zonas).
+    assert token and len(token) < 900
+
+    def fail(*args, **kwargs):
+        raise AssertionError("con un token valido no se ejecuta el motor ni el pricing")
+
+    monkeypatch.setattr(iei_engine, "compute_iei", fail)
+    monkeypatch.setattr(iei_service_module, "score_lead", fail)
+    monkeypatch.setattr(iei_service_module, "compute_pricing_from_result", fail)
+    monkeypatch.setattr(lead_service_module, "score_lead", fail)
+    monkeypatch.setattr(lead_service_module, "compute_pricing_from_result", fail)
+    lead_resp = client.post("/api/leads", json={**payload, "score_token": token})
+    assert lead_resp.status_code == 201
+    assert lead_resp.json()["result"]["iei_score"] == score_resp.json()["iei_score"]
+    assert lead_resp.json()["pricing"] == score_resp.json()["pricing"]
+
+    # Token manipulado o de otro input: se ignora y se vuelve a scorear
+    monkeypatch.undo()
+    real_score_lead = lead_service_module.score_lead
+    calls = []
+
+    def counting_score_lead(*args, **kwargs):
+        calls.append(1)
+        return real_score_lead(*args, **kwargs)
+
+    monkeypatch.setattr(lead_service_module, "score_lead", counting_score_lead)
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    other_input = valid_score_payload()
+    other_input["property"]["m2"] = 120
+    attempts = [
+        ("+34600999222", {**payload, "score_token": tampered}),
+        ("+34600999333", {**payload, "input": other_input, "score_token": token}),
+        ("+34600999444", {**payload, "score_token": "abc.\u00e9"}),
+    ]
+    for phone, body in attempts:
+        body["lead"] = {**payload["lead"], "owner_phone": phone}
+        resp = client.post("/api/leads", json=body, headers={"x-session-id": "score-token"})
+        assert resp.status_code == 201
+    assert len(calls) == len(attempts)
+
+
+def test_read_score_token_treats_malformed_tokens_as_miss():
+    from api.services.score_token import _b64encode, _sign, read_score_token
+
+    body = _b64encode(b"[1]")
+    signed_list = f"{body}.{_sign(body.encode('ascii')).decode('ascii')}"
+    for token in ("abc.\u00e9", "\u00e9.abc", "\u00e9.\u00e9", "abc", signed_list):
+        assert read_score_token(token, input_hash="x", zones_version="1") is None
+
+
+def test_score_batch_returns_per_item_results_and_errors():
+    good = valid_score_payload()
+    invalid_m2 = valid_score_payload()
+    invalid_m2["property"]["m2"] = 0
+    bad_zone = valid_score_payload(zone_key="zona_inexistente")
+    bad_enum = valid_score_payload()
+    bad_enum["property"]["property_type"] = "castillo"
+
+    resp = client.post("/api/iei/score:batch", json={"items": [good, invalid_m2, bad_zone, bad_enum, good]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["scored"] == 2
+    assert body["failed"] == 3
+
+    items = body["items"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4]
+    assert items[1]["error"]["code"] == "VALIDATION_ERROR"
+    assert items[2]["error"]["code"] == "ZONE_NOT_CONFIGURED"
+    assert items[3]["error"]["code"] == "VALIDATION_ERROR"
+
+    single = client.post("/api/iei/score", json=good).json()
+    for key in ("iei_score", "tier", "breakdown", "price_estimate", "pricing_alignment", "recommendation", "pricing"):
+        assert items[0]["result"][key] == single[key]
+
+
+def test_score_batch_rejects_oversized_batches():
+    from api.settings import get_settings
+
+    limit = get_settings().score_batch_max_items
+    resp = client.post("/api/iei/score:batch", json={"items": [valid_score_payload()] * (limit + 1)})
+    assert resp.status_code == 400
+    assert resp.json()["error"]["code"] == "VALIDATION_ERROR"
+
+
+def test_admin_lead_import_ndjson_and_csv_with_per_row_rejects():
+    import json
+
+    login_resp = client.post("/api/admin/login", json={"password": "test-admin"})
+    assert login_resp.status_code == 200
+    total_before = client.get("/api/admin/leads?page=1&page_size=1").json()["total"]
+
+    def lead_with_phone(phone, consent=True, owner_name=None):
+        payload = valid_lead_payload(consent=consent)
+        payload["lead"]["owner_phone"] = phone
+        if owner_name is not None:
+            payload["lead"]["owner_name"] = owner_name
+        return json.dumps(payload, ensure_ascii=False)
+
+    lines = [
+        lead_with_phone("+34600000001"),
+        lead_with_phone("+34600000002"),
+        lead_with_phone("+34600000001"),
+        "{no es json",
+        lead_with_phone("+34600000003", consent=False),
+        "",
+        # U+2028 y U+0085 son válidos dentro de un string JSON: no cortan la fila.
+        lead_with_phone("+34600000004", owner_name="Ana\u2028Mar\u0085ia"),
+    ]
+    resp = client.post(
+        "/api/admin/leads/import?chunk_size=2",
+        content="\n".join(lines).encode("utf-8"),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["received"] == 6
+    assert report["imported"] == 3
+    assert report["duplicates"] == 1
+    assert report["rejected"] == 2
+    assert report["received"] == report["imported"] + report["duplicates"] + report["rejected"]
+    assert report["chunks"] == 3
+    assert {(item["row"], item["error"]["code"]) for item in report["rejects"]} == {
+        (3, "DUPLICATE_PHONE_ZONE_30D"),
+        (4, "INVALID_JSON"),
+        (5, "CONSENT_REQUIRED"),
+    }
+
+    csv_body = (
+        "owner_name,owner_phone,consent_contact,zone_key,municipality,property_type,m2,condition,"
+        "has_elevator,sale_horizon,motivation,already_listed,exclusivity,expected_price\n"
+        "Ana,+34600000005,true,castelldefels,Castelldefels,piso,85,buen_estado,true,<3m,traslado,no,si,350000\n"
+        "Luis,+34600000006,true,zona_inexistente,Nowhere,piso,85,buen_estado,false,<3m,traslado,no,si,\n"
+    )
+    resp = client.post("/api/admin/leads/import", content=csv_body, headers={"content-type": "text/csv"})
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["imported"] == 1
+    assert report["rejects"][0]["row"] == 2
+    assert report["rejects"][0]["error"]["code"] == "ZONE_NOT_CONFIGURED"
+
+    total_after = client.get("/api/admin/leads?page=1&page_size=1").json()["total"]
+    assert total_after == total_before + 4
+
+
+def test_score_runs_without_sql_once_zone_registry_is_warm():
+    import threading
+
+    from sqlalchemy import event
+
+    payload = valid_score_payload()
+    payload["owner"]["expected_price"] = 362000
+    assert client.post("/api/iei/score", json=payload).status_code == 200
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        # El sondeo de zones_version corre en su propio hilo, fuera del request.
+        if threading.current_thread().name != "zone-registry-refresh":
+            statements.append(statement)
+
+    payload["owner"]["expected_price"] = 363000
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        resp = client.post("/api/iei/score", json=payload)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert resp.status_code == 200
+    assert statements == []
+
+
+def test_zone_registry_serves_stale_snapshot_while_refreshing_in_background():
+    import time
+    from dataclasses import replace
+
+    from api.services.zone_registry import ZoneRegistry
+
+    registry = ZoneRegistry()
+    first = registry.current()
+    assert first.policy("castelldefels")[2]["A"] == 90
+
+    db = SessionLocal()
+    try:
+        zone = db.get(Zone, "z-castelldefels")
+        zone.pricing_json = {**zone.pricing_json, "A": 95}
+        db.commit()
+
+        registry._snapshot = replace(first, loaded_at=first.loaded_at - 10_000)
+        stale = registry.current()
+        assert stale.version == first.version
+
+        deadline = time.monotonic() + 5
+        while registry.background_refreshes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        fresh = registry.current()
+        assert fresh.version == first.version + 1
+        assert fresh.policy("castelldefels")[2]["A"] == 95
+        assert registry.loads == 2
+    finally:
+        zone = db.get(Zone, "z-castelldefels")
+        zone.pricing_json = {**zone.pricing_json, "A": 90}
+        db.commit()
+        db.close()
+
+
+def test_zone_registry_reloads_only_when_zones_version_changes():
+    import time
+
+    from api.services.zone_registry import ZoneRegistry, bump_zones_version
+
+    def wait_for(predicate):
+        deadline = time.monotonic() + 5
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    worker = ZoneRegistry()
+    first = worker.current()
+
+    worker._checked_at = 0.0
+    assert worker.current() is first
+    # `version_checks` sube antes de leer el contador: se espera también a que suelte el lock.
+    wait_for(lambda: worker.version_checks == 1 and not worker._load_lock.locked())
+    assert worker.loads == 1
+
+    # Otro worker edita la zona e incrementa el contador en la misma transacción.
+    db = SessionLocal()
+    try:
+        zone = db.get(Zone, "z-castelldefels")
+        zone.pricing_json = {**zone.pricing_json, "B": 60}
+        bump_zones_version(db)
+        db.commit()
+
+        wait_for(lambda: not worker._load_lock.locked())
+        worker._checked_at = 0.0
+        assert worker.current().version == first.version
+        wait_for(lambda: worker.background_refreshes == 1)
+
+        fresh = worker.current()
+        assert fresh.source_version == first.source_version + 1
+        assert fresh.cache_version != first.cache_version
+        assert fresh.policy("castelldefels")[2]["B"] == 60
+    finally:
+        zone = db.get(Zone, "z-castelldefels")
+        zone.pricing_json = {**zone.pricing_json, "B": 55}
+        bump_zones_version(db)
+        db.commit()
+        db.close()
+
+
+def test_admin_leads_cursor_pagination_walks_every_lead_once():
+    login_resp = client.post("/api/admin/login", json={"password": "test-admin"})
+    assert login_resp.status_code == 200
+
+    full = client.get("/api/admin/leads?page=1&page_size=100").json()
+    assert full["total"] == len(full["items"]) >= 3
+    expected = [item["lead_id"] for item in full["items"]]
+
+    seen = []
+    cursor = None
+    while True:
+        query = "/api/admin/leads?page_size=2&include_total=false"
+        if cursor:
+            query += f"&cursor={cursor}"
+        page = client.get(query).json()
+        assert page["total"] is None
+        seen.extend(item["lead_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == expected
+
+    bad = client.get("/api/admin/leads?cursor=no-es-un-cursor")
+    assert bad.status_code == 400
+    assert bad.json()["error"]["code"] == "VALIDATION_ERROR"
+
+
+def test_events_are_acknowledged_then_flushed_in_batches():
+    from uuid import uuid4
+
+    from api.errors import ApiException
+    from api.models import Event
+    from api.services.event_queue import EventQueue, event_queue
+
+    session_id = f"events-{uuid4()}"
+    lead_id = str(uuid4())
+    names = ["view_landing", "start_form", "step_complete", "submit_lead", "submit_lead"]
+    for name in names:
+        resp = client.post(
+            "/api/events",
+            json={"event_name": name, "session_id": session_id, "lead_id": lead_id, "payload": {"step": name}},
+        )
+        assert resp.status_code == 202
+    # El segundo submit_lead lo corta el LRU sin encolarse.
+    assert resp.json() == {"ok": True, "deduplicated": True, "queued": False}
+
+    assert event_queue.flush()
+    db = SessionLocal()
+    try:
+        stored = [row.event_name for row in db.query(Event).filter(Event.session_id == session_id)]
+    finally:
+        db.close()
+    assert sorted(stored) == sorted(names[:-1])
+    stats = event_queue.stats()
+    assert stats["depth"] == 0 and stats["deduplicated_cache"] >= 1 and stats["flushes"] >= 1
+
+    # Sin el LRU (otro worker, reinicio) el índice único parcial descarta el duplicado al volcar.
+    other_worker = EventQueue()
+    submit_lead = {"event_name": "submit_lead", "event_version": "v1", "session_id": session_id, "lead_id": lead_id, "payload": {}}
+    assert other_worker.submit(**submit_lead) is False
+    other_worker.stop()
+    assert other_worker.stats()["deduplicated_db"] == 1 and other_worker.stats()["flushed"] == 0
+
+    # Sin hilo de volcado y con la cola llena: backpressure en vez de crecer en memoria.
+    small = EventQueue(max_size=2)
+    small.start = lambda: None
+    event = {"event_name": "view_landing", "event_version": "v1", "session_id": session_id, "lead_id": None, "payload": {}}
+    small.submit(**event)
+    small.submit(**event)
+    with pytest.raises(ApiException) as exc_info:
+        small.submit(**event)
+    assert exc_info.value.status_code == 503 and exc_info.value.code == "EVENT_QUEUE_FULL"
+    small.stop()
+    assert small.stats()["flushed"] == 2
+
+    # lead_id no UUID: 400 en la ruta, nunca llega a un lote.
+    resp = client.post("/api/events", json={"event_name": "submit_lead", "session_id": session_id, "lead_id": "no-uuid"})
+    assert resp.status_code == 400 and resp.json()["error"]["details"] == {"field": "lead_id"}
+
+
+def test_dropped_event_batch_forgets_submit_lead_dedupe(monkeypatch):
+    from uuid import uuid4
+
+    import api.services.event_queue as event_queue_module
+    from api.services.event_queue import EventQueue
+
+    monkeypatch.setattr(event_queue_module, "FLUSH_RETRY_SECONDS", 0.0)
+    broken = EventQueue()
+    broken.start = lambda: None
+    monkeypatch.setattr(broken, "_insert_ignoring_duplicates", lambda db, rows: 1 / 0)
+    submit_lead = {"event_name": "submit_lead", "event_version": "v1", "session_id": "drop", "lead_id": str(uuid4()), "payload": {}}
+    assert broken.submit(**submit_lead) is False
+    broken.stop()
+    assert broken.stats()["dropped"] == 1
+    # El lote se perdió: el reintento del cliente se encola de nuevo en vez de contarse como duplicado.
+    assert broken.submit(**submit_lead) is False
+
+
+def test_gcra_rate_limiter_bursts_refills_and_stays_bounded():
+    from api.middleware.rate_limit import GcraRateLimiter
+
+    limiter = GcraRateLimiter(max_keys=64, shards=4)
+    assert all(limiter.hit("ip:/api/leads", 3, now=100.0) == 0.0 for _ in range(3))
+    retry_after = limiter.hit("ip:/api/leads", 3, now=100.0)
+    assert retry_after == pytest.approx(20.0)
+    assert limiter.hit("ip:/api/leads", 3, now=119.9) > 0
+    assert limiter.hit("ip:/api/leads", 3, now=120.0) == 0.0
+
+    # Inundación de claves únicas: la memoria no pasa de max_keys y las inactivas se purgan.
+    for i in range(10_000):
+        limiter.hit(f"flood-{i}:/api/iei/score", 120, now=200.0 + i * 0.001)
+    stats = limiter.stats()
+    assert stats["keys"] <= 64
+    assert stats["expired"] + stats["evicted"] >= 10_000 - 64
+
+
+def test_rate_limited_response_has_retry_after():
+    from api.middleware.rate_limit import GcraRateLimiter, RateLimitMiddleware
+
+    limited = TestClient(RateLimitMiddleware(app, limiter=GcraRateLimiter(max_keys=16)))
+    headers = {"x-forwarded-for": "203.0.113.9"}
+    statuses = [limited.get("/api/iei/unknown", headers=headers).status_code for _ in range(121)]
+    assert statuses[:120] == [404] * 120
+    assert statuses[120] == 429
+    resp = limited.get("/api/iei/unknown", headers=headers)
+    assert resp.json()["error"]["code"] == "RATE_LIMITED"
+    assert int(resp.headers["retry-after"]) >= 1
+
+
+def test_sqlite_rate_limit_backend_is_shared_across_workers(tmp_path):
+    from api.middleware.rate_limit import GcraRateLimiter, SqliteRateLimiter, build_rate_limiter
+
+    path = str(tmp_path / "rate_limit.sqlite3")
+    worker_a, worker_b = SqliteRateLimiter(path), SqliteRateLimiter(path)
+    key = "ip:no-session:/api/leads"
+    assert worker_a.hit(key, 4, now=1000.0) == 0.0
+    assert worker_b.hit(key, 4, now=1000.0) == 0.0
+    assert worker_a.hit(key, 4, now=1000.0) == 0.0
+    assert worker_b.hit(key, 4, now=1000.0) == 0.0
+    # Un contador por proceso dejaría pasar 4 por worker; compartido, la quinta se rechaza en ambos.
+    assert worker_a.hit(key, 4, now=1000.0) == pytest.approx(15.0)
+    assert worker_b.hit(key, 4, now=1000.0) == pytest.approx(15.0)
+    assert worker_b.hit(key, 4, now=1015.0) == 0.0
+    assert worker_a.stats()["keys"] == 1
+
+    # Fichero bloqueado por otro proceso: no espera segundos en el event loop, decide en memoria.
+    import sqlite3
+    import time
+
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("begin exclusive")
+    try:
+        started = time.perf_counter()
+        assert worker_a.hit("ip:no-session:/api/iei/score", 4, now=1020.0) == 0.0
+        assert time.perf_counter() - started < 0.5
+        assert worker_a.stats()["fallbacks"] == 1
+    finally:
+        holder.rollback()
+        holder.close()
+
+    assert isinstance(build_rate_limiter("memory"), GcraRateLimiter)
+    assert isinstance(build_rate_limiter("api.middleware.rate_limit:GcraRateLimiter"), GcraRateLimiter)
+    with pytest.raises(ValueError):
+        build_rate_limiter("redis")
+
+
+def test_request_id_is_propagated_or_generated():
+    resp = client.get("/health", headers={"x-request-id": "req-123"})
+    assert resp.headers["x-request-id"] == "req-123"
+
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 36 and generated != client.get("/health").headers["x-request-id"]
+
+
+def test_async_create_lead_matches_sync_contract(monkeypatch):
+    import asyncio
+    import threading
+
+    from api.db import async_database_url, dispose_async_engine, get_async_sessionmaker
+    from api.schemas import LeadCreateRequestSchema
+    from api.services.lead_service import LeadService
+
+    assert async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert async_database_url("postgresql+psycopg://u:p@h/db") == "postgresql+psycopg://u:p@h/db"
+
+    raw = valid_lead_payload()
+    raw["lead"]["owner_phone"] = "+34600999021"
+    payload = LeadCreateRequestSchema.model_validate(raw)
+
+    # Registro frío: la carga (con SQL) va al threadpool, no al hilo del event loop.
+    load_threads = []
+    load_blocking = zone_registry._load_blocking
+
+    def recording_load_blocking():
+        load_threads.append(threading.get_ident())
+        return load_blocking()
+
+    zone_registry.invalidate()
+    monkeypatch.setattr(zone_registry, "_load_blocking", recording_load_blocking)
+
+    async def run():
+        try:
+            async with get_async_sessionmaker()() as db:
+                created = await LeadService.create_lead_async(db, payload, ip_hash="async-test")
+            assert load_threads and threading.get_ident() not in load_threads
+            async with get_async_sessionmaker()() as db:
+                duplicate = await LeadService.create_lead_async(db, payload, ip_hash="async-test")
+            return created, duplicate
+        finally:
+            await dispose_async_engine()
+
+    created, duplicate = asyncio.run(run())
+    assert created["status"] == "nuevo" and created["lead_card"]["lead_price_eur"] > 0
+    assert duplicate == {"duplicate": True, "existing_lead_id": created["lead_id"], "note": "DUPLICATE_PHONE_ZONE_30D"}
+
+    # Lo escrito por el camino async se ve desde el sync (mismas tablas, mismas filas).
+    resp = client.post("/api/leads", json=raw, headers={"x-session-id": "async-dup"})
+    assert resp.status_code == 200 and resp.json()["existing_lead_id"] == created["lead_id"]
+
+
+def test_metrics_endpoint_exposes_route_engine_db_and_rate_limit_series():
+    from api.services.metrics import RATE_LIMIT_REJECTIONS
+
+    rejections = RATE_LIMIT_REJECTIONS.value("leads")
+    assert client.post("/api/iei/score", json=valid_score_payload()).status_code == 200
+    admin_status = client.get("/api/admin/leads/lead-que-no-existe").status_code
+    assert client.get("/ruta/que/no/existe").status_code == 404
+    headers = {"x-session-id": "metrics-rate-limit"}
+    statuses = [client.post("/api/leads", json={}, headers=headers).status_code for _ in range(21)]
+    assert statuses[-1] == 429
+    assert RATE_LIMIT_REJECTIONS.value("leads") == rejections + 1
+
+    # Sin token ni sesión admin no se exponen métricas internas.
+    anonymous = TestClient(app)
+    denied = anonymous.get("/metrics")
+    assert denied.status_code == 401
+    assert denied.json()["error"]["code"] == "UNAUTHORIZED"
+    assert anonymous.get("/metrics", headers={"authorization": "Bearer otro-token"}).status_code == 401
+    assert anonymous.post("/api/admin/login", json={"password": "test-admin"}).status_code == 200
+    assert anonymous.get("/metrics").status_code == 200
+
+    resp = TestClient(app).get("/metrics", headers={"authorization": "Bearer test-metrics-token"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    # Plantilla de ruta, nunca la URL concreta; lo que no casa con ninguna ruta se agrupa.
+    assert f'iei_http_request_duration_seconds_count{{method="GET",route="/api/admin/leads/{{lead_id}}",status="{admin_status}"}}' in text
+    assert "lead-que-no-existe" not in text and "/ruta/que/no/existe" not in text
+    assert 'route="<unmatched>",status="404"' in text
+    # El 429 no llega al router, pero se etiqueta con su ruta.
+    assert 'route="/api/leads",status="429"' in text
+    assert 'iei_http_request_duration_seconds_bucket{method="POST",route="/api/iei/score",status="200",le="+Inf"}' in text
+    assert 'iei_engine_seconds_count{op="compute_iei"}' in text
+    assert 'iei_db_queries_per_request_count{route="/api/iei/score"}' in text
+    assert 'iei_rate_limit_rejections_total{limit="leads"}' in text
+    for name in ("iei_zone_registry_hits_total", "iei_zone_registry_refreshes_total", "iei_db_queries_total"):
+        assert f"# TYPE {name} counter" in text
+
+
+def test_query_budget_per_endpoint():
+    import threading
+
+    from sqlalchemy import event
+
+    from api.models import Agency
+
+    db = SessionLocal()
+    try:
+        db.add(Agency(id="agency-query-budget", name="Agencia Presupuesto", is_active=True))
+        db.commit()
+    finally:
+        db.close()
+
+    session = {"x-session-id": "query-budget"}
+    assert_query_budget(client.post("/api/admin/login", json={"password": "test-admin"}), 0)
+
+    # Tier A (precio esperado = estimado): reservable y vendible.
+    payload = valid_lead_payload()
+    payload["lead"]["owner_phone"] = "+34600555023"
+    payload["input"]["property"].update({"m2": 95, "condition": "reformado", "has_parking": True, "has_views": True})
+    payload["input"]["owner"].update({"sale_horizon": "<3m", "motivation": "traslado", "exclusivity": "si", "expected_price": None})
+    # Con el registro de zonas caliente, el scoring no toca la DB.
+    score = assert_query_budget(client.post("/api/iei/score", json=payload["input"]), 2)
+    score = assert_query_budget(client.post("/api/iei/score", json=payload["input"]), 0)
+    assert float(score.headers["x-db-time-ms"]) == 0.0
+    assert_query_budget(client.post("/api/iei/score:batch", json={"items": [valid_score_payload()] * 5}), 0)
+    payload["input"]["owner"]["expected_price"] = score.json()["price_estimate"]["adjusted_price"]
+
+    created = assert_query_budget(client.post("/api/leads", json=payload, headers=session), 5)
+    lead_id = created.json()["lead_id"]
+    assert created.json()["result"]["tier"] == "A"
+    assert_query_budget(client.post("/api/leads", json=payload, headers=session), 1)
+
+    for phone in range(5):
+        extra = valid_lead_payload()
+        extra["lead"]["owner_phone"] = f"+3460055510{phone}"
+        client.post("/api/leads", json=extra, headers=session)
+    # El listado no crece con el número de filas (el N+1 de `get_commercial_state` por lead).
+    listing = assert_query_budget(client.get("/api/admin/leads", params={"page_size": 50}), 2)
+    assert len(listing.json()["items"]) >= 6
+    assert_query_budget(client.get(f"/api/admin/leads/{lead_id}"), 3)
+    assert_query_budget(client.patch(f"/api/admin/leads/{lead_id}", json={"status": "contactado"}), 3)
+    reserve = {"agency_id": "agency-query-budget", "hours": 24}
+    assert_query_budget(client.post(f"/api/admin/leads/{lead_id}/reserve", json=reserve), 1)
+    assert_query_budget(client.post(f"/api/admin/leads/{lead_id}/release-reservation", json={"reason": "test"}), 4)
+    sell = {"agency_id": "agency-query-budget", "price_eur": 90}
+    assert_query_budget(client.post(f"/api/admin/leads/{lead_id}/sell", json=sell), 3)
+    # En streaming las cabeceras salen antes de consultar: se cuenta el SQL mientras se consume el cuerpo.
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if threading.current_thread().name not in ("zone-registry-refresh", "event-queue-flush"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        export = client.get("/api/admin/sales/export.csv")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert export.status_code == 200 and lead_id in export.text
+    # Una sola SELECT para todas las ventas (sin consulta por fila).
+    assert len(statements) == 1, statements
+    assert_query_budget(client.get("/api/admin/zones"), 1)
+    assert_query_budget(client.get("/api/admin/ops/cache"), 0)
+    assert_query_budget(client.post("/api/privacy/delete-request", json={"email": "owner@example.com"}), 1)
+    event = {"event_name": "view_form", "event_version": "v1", "session_id": "query-budget", "payload": {}}
+    assert_query_budget(client.post("/api/events", json=event), 0)
+
+    # El guard detecta la misma forma de SQL repetida (N+1) aunque cambien los parámetros.
+    from api.models import Lead
+    from api.services.metrics import RequestDbStats, request_db_stats
+
+    stats = RequestDbStats(statements={})
+    token = request_db_stats.set(stats)
+    db = SessionLocal()
+    try:
+        for candidate in (lead_id, "otro-lead", "otro-mas"):
+            db.get(Lead, candidate)
+    finally:
+        db.close()
+        request_db_stats.reset(token)
+    assert stats.queries == 3 and stats.duplicates == 2
+
+
+def test_db_pool_settings_timeouts_and_idle_pre_ping(tmp_path):
+    from dataclasses import replace
+
+    from sqlalchemy import create_engine, exc, text
+
+    from api.db import InstrumentedQueuePool, _install_idle_pre_ping, pool_engine_kwargs
+    from api.services.metrics import DB_POOL_CHECKOUT_SECONDS, DB_POOL_PINGS, DB_POOL_TIMEOUTS
+    from api.settings import get_settings
+
+    config = replace(
+        get_settings(),
+        db_pool_size=1,
+        db_max_overflow=0,
+        db_pool_timeout_seconds=0.05,
+        db_pool_recycle_seconds=60,
+        db_pool_pre_ping="idle",
+    )
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    kwargs = pool_engine_kwargs(url, config)
+    assert kwargs["poolclass"] is InstrumentedQueuePool and kwargs["pool_pre_ping"] is False
+    assert pool_engine_kwargs("sqlite://", config) == {"pool_pre_ping": False}
+    with pytest.raises(ValueError):
+        pool_engine_kwargs(url, replace(config, db_pool_pre_ping="sometimes"))
+
+    test_engine = create_engine(url, **kwargs)
+    _install_idle_pre_ping(test_engine.pool, "sync", 0.0)
+    checkouts = DB_POOL_CHECKOUT_SECONDS.count("sync")
+    timeouts = DB_POOL_TIMEOUTS.value("sync")
+    pings = DB_POOL_PINGS.value("sync", "ok")
+    try:
+        with test_engine.connect() as conn:
+            conn.execute(text("select 1"))
+            # Pool de 1 sin overflow: el segundo checkout espera pool_timeout y falla.
+            with pytest.raises(exc.TimeoutError):
+                test_engine.connect()
+            assert test_engine.pool.checkedout() == 1
+        # Devuelta al pool: con umbral 0 el siguiente checkout la verifica con un ping.
+        with test_engine.connect() as conn:
+            conn.execute(text("select 1"))
+    finally:
+        test_engine.dispose()
+    assert DB_POOL_CHECKOUT_SECONDS.count("sync") == checkouts + 3
+    assert DB_POOL_TIMEOUTS.value("sync") == timeouts + 1
+    assert DB_POOL_PINGS.value("sync", "ok") == pings + 1
+
+
+def test_production_startup_skips_ddl_checks_readiness_and_warms(monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    from api.db import engine as db_engine
+    from api.services import startup
+    from api.services.metrics import RequestDbStats, metrics, request_db_stats
+
+    stats = RequestDbStats(statements={})
+    token = request_db_stats.set(stats)
+    try:
+        report = startup.run_startup("production")
+    finally:
+        request_db_stats.reset(token)
+
+    assert report["mode"] == "production" and report["seconds"] > 0
+    assert set(report["phases"]) == {"ready_check", "zone_registry", "pool_warm", "pool_warm_connections"}
+    # Solo lecturas: ni DDL ni las zonas por defecto.
+    assert stats.statements and all(sql.lstrip().lower().startswith("select") for sql in stats.statements)
+    assert db_engine.pool.checkedin() >= report["phases"]["pool_warm_connections"] > 0
+    text = metrics.render()
+    assert 'iei_startup_seconds{mode="production"}' in text
+    assert 'iei_startup_phase_seconds{phase="ready_check"}' in text
+
+    def not_migrated(db):
+        raise OperationalError("select version from zones_version", {}, Exception("no such table: zones_version"))
+
+    monkeypatch.setattr(startup, "read_zones_version", not_migrated)
+    with pytest.raises(startup.StartupError, match="db/migrations"):
+        startup.wait_until_ready(timeout=0)
+    with pytest.raises(ValueError):
+        startup.run_startup("staging")
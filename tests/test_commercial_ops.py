@@ -1,7 +1,6 @@
 import os
 from uuid import uuid4
 
-os.environ.setdefault("DATABASE_URL", "sqlite:///./test_api_contracts.db")
 os.environ.setdefault("USE_DB_ZONES", "false")
 os.environ.setdefault("ADMIN_PASSWORD", "test-admin")
 os.environ.setdefault("SESSION_SECRET", "test-secret")
@@ -14,6 +13,7 @@ from fastapi.testclient import TestClient
 from api.db import Base, SessionLocal, engine
 from api.main import app
 from api.models import Agency
+from api.services.zone_registry import zone_registry
 
 client = TestClient(app)
 
@@ -49,6 +49,7 @@ def setup_module():
         db.commit()
     finally:
         db.close()
+    zone_registry.invalidate()
 
 
 def teardown_module():
@@ -109,13 +110,14 @@ def build_lead_payload(phone: str, expected_price=None, honeypot=None):
     return payload
 
 
-def create_tier_a_lead(phone: str) -> str:
+def create_tier_a_lead(phone: str, session_id: str | None = None) -> str:
     score_resp = client.post("/api/iei/score", json=base_score_payload(expected_price=None))
     assert score_resp.status_code == 200
     adjusted = score_resp.json()["price_estimate"]["adjusted_price"]
 
     payload = build_lead_payload(phone=phone, expected_price=adjusted)
-    resp = client.post("/api/leads", json=payload)
+    headers = {"x-session-id": session_id} if session_id else None
+    resp = client.post("/api/leads", json=payload, headers=headers)
     assert resp.status_code == 201
     data = resp.json()
     assert data["result"]["tier"] == "A"
@@ -214,3 +216,174 @@ def test_sales_export_csv_works():
     body = export_resp.text
     assert "sold_at,lead_id,agency_id,agency_name,zone_key,tier,segment,pricing_policy,lead_price_eur,price_eur,iei_score,iei_framework_version,powered_by,owner_phone_masked,owner_email_masked" in body
     assert lead_id in body
+
+
+def test_list_agencies_returns_active_agencies():
+    admin_login()
+    resp = client.get("/api/admin/agencies")
+    assert resp.status_code == 200
+    assert [item["id"] for item in resp.json()["items"]] == [AGENCY_2, AGENCY_1]
+
+
+def test_admin_lead_list_uses_constant_queries_and_no_writes():
+    import threading
+    from datetime import UTC, datetime, timedelta
+
+    from sqlalchemy import event
+
+    from api.models import LeadReservation
+
+    admin_login()
+    reserved_id = create_tier_a_lead(phone=f"+34677{uuid4().int % 100000:05d}")
+    expired_id = create_tier_a_lead(phone=f"+34677{uuid4().int % 100000:05d}")
+    sold_id = create_non_reserved_sellable_lead(phone=f"+34677{uuid4().int % 100000:05d}")
+    assert client.post(f"/api/admin/leads/{reserved_id}/reserve", json={"agency_id": AGENCY_1}).status_code == 200
+    assert client.post(f"/api/admin/leads/{expired_id}/reserve", json={"agency_id": AGENCY_2}).status_code == 200
+    assert client.post(f"/api/admin/leads/{sold_id}/sell", json={"agency_id": AGENCY_1, "price_eur": 30}).status_code == 200
+
+    db = SessionLocal()
+    try:
+        reservation = db.query(LeadReservation).filter(LeadReservation.lead_id == expired_id).one()
+        reservation.reserved_until = datetime.now(UTC) - timedelta(hours=1)
+        db.commit()
+    finally:
+        db.close()
+
+    def list_page():
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if threading.current_thread().name != "zone-registry-refresh":
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            resp = client.get("/api/admin/leads?page=1&page_size=100")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert resp.status_code == 200
+        return resp.json()["items"], statements
+
+    items, statements = list_page()
+    states = {item["lead_id"]: item for item in items}
+    assert states[reserved_id]["commercial_state"] == "reserved"
+    assert states[reserved_id]["reserved_to_agency_id"] == AGENCY_1
+    assert states[expired_id]["commercial_state"] == "available"
+    assert states[expired_id]["reserved_until"] is None
+    assert states[sold_id]["commercial_state"] == "sold"
+    assert not any(statement.lstrip().upper().startswith(("UPDATE", "INSERT")) for statement in statements)
+
+    for _ in range(3):
+        create_non_reserved_sellable_lead(phone=f"+34677{uuid4().int % 100000:05d}")
+    more_items, more_statements = list_page()
+    assert len(more_items) == len(items) + 3
+    assert len(more_statements) == len(statements) == 2
+
+
+def test_sales_export_streams_in_chunks():
+    import csv
+    from io import StringIO
+
+    from api.services.commercial_service import CommercialService
+
+    admin_login()
+    lead_id = create_non_reserved_sellable_lead(phone=f"+34688{uuid4().int % 100000:05d}")
+    assert client.post(f"/api/admin/leads/{lead_id}/sell", json={"agency_id": AGENCY_1, "price_eur": 33}).status_code == 200
+
+    filters = {"date_from": None, "date_to": None, "zone_key": None, "agency_id": None, "tier": None}
+    chunks = list(CommercialService.iter_sales_csv(**filters, chunk_rows=1))
+    assert len(chunks) >= 2
+
+    body = client.get("/api/admin/sales/export.csv").text
+    assert "".join(chunks) == body
+
+    rows = list(csv.DictReader(StringIO(body)))
+    assert len(rows) >= 2
+    assert all(row["iei_framework_version"] and row["powered_by"] for row in rows)
+    assert all("***" in row["owner_phone_masked"] for row in rows)
+
+
+def test_expired_reservation_reads_as_available_and_sweeper_expires_it():
+    from datetime import UTC, datetime, timedelta
+
+    from api.models import LeadReservation
+    from api.services.reservation_sweeper import ReservationSweeper
+
+    admin_login()
+    db = SessionLocal()
+    try:
+        reservation = db.query(LeadReservation).filter(LeadReservation.status == "active").first()
+        assert reservation is not None
+        lead_id = reservation.lead_id
+        reservation.reserved_until = datetime.now(UTC) - timedelta(minutes=5)
+        db.commit()
+    finally:
+        db.close()
+
+    detail = client.get(f"/api/admin/leads/{lead_id}")
+    assert detail.status_code == 200
+    assert detail.json()["commercial_state"] == "available"
+
+    db = SessionLocal()
+    try:
+        # La lectura no escribe: la fila sigue "active" hasta el barrido.
+        assert db.query(LeadReservation.status).filter(LeadReservation.lead_id == lead_id).scalar() == "active"
+    finally:
+        db.close()
+
+    sweeper = ReservationSweeper()
+    assert sweeper.sweep() >= 1
+    assert sweeper.sweep() == 0
+
+    db = SessionLocal()
+    try:
+        assert db.query(LeadReservation.status).filter(LeadReservation.lead_id == lead_id).scalar() == "expired"
+    finally:
+        db.close()
+
+
+def test_concurrent_reserve_and_sell_have_a_single_winner():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from api.errors import ApiException
+    from api.services.commercial_service import CommercialService
+
+    lead_id = create_tier_a_lead(phone=f"+34699{uuid4().int % 100000:05d}", session_id="concurrency")
+    agencies = [AGENCY_1, AGENCY_2] * 4
+
+    def race(action):
+        barrier = threading.Barrier(len(agencies))
+
+        def run(agency_id):
+            db = SessionLocal()
+            try:
+                barrier.wait()
+                action(db, agency_id)
+                return agency_id, "ok"
+            except ApiException as exc:
+                return agency_id, exc.code
+            finally:
+                db.close()
+
+        with ThreadPoolExecutor(max_workers=len(agencies)) as pool:
+            return list(pool.map(run, agencies))
+
+    reserved = race(lambda db, agency_id: CommercialService.reserve_lead(db, lead_id, agency_id))
+    winners = [agency_id for agency_id, outcome in reserved if outcome == "ok"]
+    assert len(winners) == 1
+    assert sorted(outcome for _, outcome in reserved if outcome != "ok") == ["RESERVED"] * (len(agencies) - 1)
+
+    sold = race(lambda db, agency_id: CommercialService.sell_lead(db, lead_id, agency_id, price_eur=40))
+    assert [agency_id for agency_id, outcome in sold if outcome == "ok"] == winners
+    for agency_id, outcome in sold:
+        if outcome != "ok":
+            # La otra agencia ve la reserva vigente o, si la venta ya se confirmó, el lead vendido.
+            assert outcome == "SOLD" or (agency_id != winners[0] and outcome == "RESERVED_FOR_OTHER")
+
+    db = SessionLocal()
+    try:
+        state = CommercialService.get_commercial_state(db, lead_id)
+    finally:
+        db.close()
+    assert state["commercial_state"] == "sold"
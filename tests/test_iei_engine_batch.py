@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from iei_engine import (
+    ExclusivityDisposition,
+    LeadInput,
+    ListingStatus,
+    Motivation,
+    OwnerSignals,
+    PropertyCondition,
+    PropertyFeatures,
+    PropertyType,
+    SaleHorizon,
+    compute_iei,
+)
+from iei_engine_batch import LeadBatch, compute_iei_batch
+
+
+def random_lead(rng: random.Random) -> LeadInput:
+    has_terrace = rng.random() < 0.5
+    expected_price = rng.choice([None, 0.0, round(rng.uniform(150000, 700000), 2)])
+    return LeadInput(
+        property=PropertyFeatures(
+            zone_key=rng.choice(["castelldefels", "gava", " Sitges "]),
+            municipality="Test",
+            neighborhood=None,
+            postal_code=None,
+            property_type=rng.choice(list(PropertyType)),
+            m2=round(rng.uniform(40, 200), 1),
+            condition=rng.choice(list(PropertyCondition)),
+            has_elevator=rng.random() < 0.5,
+            has_terrace=has_terrace,
+            terrace_m2=rng.choice([None, 6.0, 10.0, 25.0]) if has_terrace else None,
+            has_parking=rng.random() < 0.5,
+            has_views=rng.random() < 0.5,
+        ),
+        owner=OwnerSignals(
+            sale_horizon=rng.choice(list(SaleHorizon)),
+            motivation=rng.choice(list(Motivation)),
+            already_listed=rng.choice(list(ListingStatus)),
+            exclusivity=rng.choice(list(ExclusivityDisposition)),
+            expected_price=expected_price,
+        ),
+    )
+
+
+def test_batch_matches_scalar_path_exactly():
+    rng = random.Random(7)
+    leads = [random_lead(rng) for _ in range(2000)]
+
+    batch_result = compute_iei_batch(LeadBatch.from_leads(leads))
+
+    assert len(batch_result) == len(leads)
+    for i, lead in enumerate(leads):
+        assert batch_result.result(i) == compute_iei(lead)
+
+
+def test_batch_zone_not_configured_raises():
+    rng = random.Random(1)
+    lead = random_lead(rng)
+    bad = LeadInput(
+        property=PropertyFeatures(**{**lead.property.__dict__, "zone_key": "zona_inexistente"}),
+        owner=lead.owner,
+    )
+    with pytest.raises(ValueError, match="Zona no configurada"):
+        compute_iei_batch(LeadBatch.from_leads([lead, bad]))
+
+
+def test_batch_matches_scalar_with_zone_overrides():
+    from iei_engine import DemandLevel, ZoneTables
+
+    tables = ZoneTables.compile(
+        {"castelldefels": 3350.0, "gava": 3100.0, "sitges": 4100.0},
+        {"castelldefels": DemandLevel.ALTA, "gava": DemandLevel.BAJA},
+        version=5,
+        type_factor_overrides={"gava": {"chalet": 1.2, "planta_baja": 0.9}},
+        condition_factor_overrides={"sitges": {"reformado": 1.15}},
+        extras_add_overrides={"castelldefels": {"views": 0.08, "terrace_big": 0.05}},
+        extras_cap_overrides={"castelldefels": 0.12, "gava": 0.05},
+    )
+    rng = random.Random(11)
+    leads = [random_lead(rng) for _ in range(1000)]
+
+    batch_result = compute_iei_batch(LeadBatch.from_leads(leads), tables)
+
+    for i, lead in enumerate(leads):
+        assert batch_result.result(i) == compute_iei(lead, tables)
@@ -99,3 +99,74 @@ def test_price_alignment_gap_buckets_behave():
     score_high = res_high.breakdown["precio"]
 
     assert score_ref > score_mid > score_high
+
+
+def test_zone_tables_snapshot_is_isolated_and_versioned():
+    from iei_engine import DemandLevel, ZoneTables, get_zone_tables, set_zone_tables
+
+    original = get_zone_tables()
+    snapshot = ZoneTables.compile({"castelldefels": 4000.0}, {"castelldefels": DemandLevel.BAJA}, version=original.version + 1)
+    lead = make_lead()
+
+    pinned = compute_iei(lead, snapshot)
+    assert pinned.price_estimate.base_per_m2 == 4000.0
+    assert pinned.zone_tables_version == snapshot.version
+
+    # Publicar un snapshot nuevo no altera lo que ve quien ya tiene uno fijado
+    set_zone_tables(snapshot)
+    try:
+        assert compute_iei(lead).zone_tables_version == snapshot.version
+        assert compute_iei(lead, original).price_estimate.base_per_m2 == 3350.0
+    finally:
+        set_zone_tables(original)
+
+    with pytest.raises(TypeError):
+        snapshot.base_price_per_m2["gava"] = 1.0
+
+
+def test_zone_overrides_are_compiled_into_snapshot():
+    from iei_engine import DemandLevel, ZoneTables
+
+    snapshot = ZoneTables.compile(
+        {"castelldefels": 3350.0},
+        {"castelldefels": DemandLevel.ALTA},
+        version=1,
+        type_factor_overrides={"castelldefels": {"piso": 1.10, "desconocido": 9.9}},
+        condition_factor_overrides={"castelldefels": {"buen_estado": 0.95}},
+        extras_add_overrides={"castelldefels": {"elevator": 0.01}},
+        extras_cap_overrides={"castelldefels": 0.02},
+    )
+    est = estimate_price(make_property(), snapshot)
+
+    assert est.applied_factors["type"] == 1.10
+    assert est.applied_factors["condition"] == 0.95
+    assert est.applied_factors["extra_elevator"] == 1.01
+    assert est.applied_factors["extras_factor_capped"] == 1.02
+
+    # Sin overrides se mantienen las tablas globales
+    default = estimate_price(
+        make_property(), ZoneTables.compile({"castelldefels": 3350.0}, {"castelldefels": DemandLevel.ALTA}, version=2)
+    )
+    assert default == estimate_price(make_property())
+
+
+def test_precomputed_tables_match_rules_for_every_combination():
+    import itertools
+
+    from iei_engine import DemandLevel, PriceEstimate, _intention_score, _intention_score_lookup, _market_score, _market_score_lookup
+
+    for h, m, li, e in itertools.product(SaleHorizon, Motivation, ListingStatus, ExclusivityDisposition):
+        owner = make_owner(None, sale_horizon=h, motivation=m, already_listed=li, exclusivity=e)
+        assert _intention_score_lookup(owner) == _intention_score(owner)
+
+    flags = ("has_elevator", "has_parking", "has_terrace", "has_views")
+    for d, t, c in itertools.product(DemandLevel, PropertyType, PropertyCondition):
+        est = PriceEstimate(0.0, 0.0, 0.0, 0.0, 0.0, d, {})
+        for combo in itertools.product([False, True], repeat=len(flags)):
+            prop = make_property(property_type=t, condition=c, **dict(zip(flags, combo)))
+            assert _market_score_lookup(prop, est) == _market_score(prop, est)
+
+
+def test_compute_iei_precomputed_equals_reference_mode():
+    lead = make_lead(owner_overrides={"sale_horizon": SaleHorizon.MENOS_3, "motivation": Motivation.HERENCIA})
+    assert compute_iei(lead) == compute_iei(lead, precomputed=False)
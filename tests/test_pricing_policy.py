@@ -1,6 +1,5 @@
 import os
 
-os.environ.setdefault("DATABASE_URL", "sqlite:///./test_pricing_policy.db")
 os.environ.setdefault("USE_DB_ZONES", "true")
 
 from api.db import Base, SessionLocal, engine
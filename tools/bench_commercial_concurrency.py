@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Reserva/venta concurrente: varias agencias compiten por los mismos leads (SQLite temporal o DATABASE_URL).
+
+Comprueba que cada lead termina con una sola venta, a la agencia que lo reservó, y mide throughput del
+camino atómico (`CommercialService`) frente al de leer-decidir-escribir anterior (`--mode legacy`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de reserva/venta concurrente")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla reproducible")
+    parser.add_argument("--leads", type=int, default=200, help="Leads Tier A en disputa")
+    parser.add_argument("--agencies", type=int, default=4, help="Agencias compitiendo por cada lead")
+    parser.add_argument("--workers", type=int, default=8, help="Hilos concurrentes")
+    parser.add_argument("--mode", choices=["atomic", "legacy", "both"], default="both")
+    parser.add_argument(
+        "--database-url",
+        type=str,
+        default=None,
+        help="Por defecto, SQLite temporal (las tablas se crean y se vacían en cada modo)",
+    )
+    return parser.parse_args()
+
+
+def seed(db, n_leads: int, n_agencies: int) -> tuple[list[str], list[str]]:
+    from api.models import Agency, IEIResultRecord, Lead
+
+    now = datetime.now(UTC)
+    agencies = [str(uuid4()) for _ in range(n_agencies)]
+    leads = [str(uuid4()) for _ in range(n_leads)]
+    db.add_all(Agency(id=agency_id, name=f"Bench {i}", is_active=True) for i, agency_id in enumerate(agencies))
+    db.add_all(Lead(id=lead_id, status="nuevo", consent_contact=True, created_at=now, updated_at=now) for lead_id in leads)
+    db.flush()
+    db.add_all(
+        IEIResultRecord(
+            id=str(uuid4()),
+            lead_id=lead_id,
+            iei_score=90,
+            tier="A",
+            breakdown_intencion=45,
+            breakdown_precio=25,
+            breakdown_mercado=20,
+            base_per_m2=4000.0,
+            base_price=380000.0,
+            adjusted_price=380000.0,
+            range_low=360000.0,
+            range_high=400000.0,
+            demand_level="alta",
+            recommendation="bench",
+            applied_factors_json={},
+            lead_card_json={},
+            engine_version="bench",
+            created_at=now,
+        )
+        for lead_id in leads
+    )
+    db.commit()
+    return leads, agencies
+
+
+def legacy_reserve(db, lead_id: str, agency_id: str, hours: int = 72) -> None:
+    """Camino anterior: varias lecturas, decisión en Python y escritura."""
+    from api.errors import ApiException
+    from api.models import Agency, IEIResultRecord, Lead, LeadReservation, LeadSale
+
+    if not db.query(Lead).filter(Lead.id == lead_id).first():
+        raise ApiException(status_code=404, code="NOT_FOUND", message="", details={})
+    if not db.query(Agency).filter(Agency.id == agency_id, Agency.is_active.is_(True)).first():
+        raise ApiException(status_code=404, code="NOT_FOUND", message="", details={})
+    row = (
+        db.query(IEIResultRecord)
+        .filter(IEIResultRecord.lead_id == lead_id)
+        .order_by(IEIResultRecord.created_at.desc())
+        .first()
+    )
+    if not row or row.tier != "A":
+        raise ApiException(status_code=400, code="RESERVATION_ONLY_TIER_A", message="", details={})
+    if db.query(LeadSale).filter(LeadSale.lead_id == lead_id).first():
+        raise ApiException(status_code=409, code="SOLD", message="", details={})
+    now = datetime.now(UTC)
+    reservation = db.query(LeadReservation).filter(LeadReservation.lead_id == lead_id).first()
+    if reservation and reservation.status == "active":
+        until = reservation.reserved_until
+        if (until if until.tzinfo else until.replace(tzinfo=UTC)) > now:
+            raise ApiException(status_code=409, code="RESERVED", message="", details={})
+    if reservation:
+        reservation.agency_id = agency_id
+        reservation.reserved_at = now
+        reservation.reserved_until = now + timedelta(hours=hours)
+        reservation.status = "active"
+    else:
+        db.add(
+            LeadReservation(
+                id=str(uuid4()),
+                lead_id=lead_id,
+                agency_id=agency_id,
+                reserved_at=now,
+                reserved_until=now + timedelta(hours=hours),
+                status="active",
+            )
+        )
+    db.commit()
+
+
+def legacy_sell(db, lead_id: str, agency_id: str, price_eur: int) -> None:
+    from api.errors import ApiException
+    from api.models import Agency, IEIResultRecord, Lead, LeadReservation, LeadSale
+
+    lead = db.query(Lead).filter(Lead.id == lead_id).first()
+    if not lead:
+        raise ApiException(status_code=404, code="NOT_FOUND", message="", details={})
+    if not db.query(Agency).filter(Agency.id == agency_id, Agency.is_active.is_(True)).first():
+        raise ApiException(status_code=404, code="NOT_FOUND", message="", details={})
+    if db.query(LeadSale).filter(LeadSale.lead_id == lead_id).first():
+        raise ApiException(status_code=409, code="SOLD", message="", details={})
+    now = datetime.now(UTC)
+    reservation = db.query(LeadReservation).filter(LeadReservation.lead_id == lead_id).first()
+    active = False
+    if reservation and reservation.status == "active":
+        until = reservation.reserved_until
+        active = (until if until.tzinfo else until.replace(tzinfo=UTC)) > now
+    if active and reservation.agency_id != agency_id:
+        raise ApiException(status_code=409, code="RESERVED_FOR_OTHER", message="", details={})
+    row = (
+        db.query(IEIResultRecord)
+        .filter(IEIResultRecord.lead_id == lead_id)
+        .order_by(IEIResultRecord.created_at.desc())
+        .first()
+    )
+    db.add(
+        LeadSale(
+            id=str(uuid4()),
+            lead_id=lead_id,
+            agency_id=agency_id,
+            sold_at=now,
+            tier=row.tier if row else "D",
+            price_eur=price_eur,
+        )
+    )
+    lead.status = "vendido"
+    if active:
+        reservation.status = "released"
+        reservation.released_at = now
+    db.commit()
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> bool:
+    from api.db import Base, SessionLocal, engine
+    from api.errors import ApiException
+    from api.models import LeadReservation, LeadSale
+    from api.services.commercial_service import CommercialService
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        leads, agencies = seed(db, args.leads, args.agencies)
+    finally:
+        db.close()
+
+    if mode == "atomic":
+        reserve, sell = CommercialService.reserve_lead, CommercialService.sell_lead
+    else:
+        reserve, sell = legacy_reserve, legacy_sell
+
+    rng = random.Random(args.seed)
+    # Cada agencia intenta reservar y después vender cada lead; el orden se baraja para forzar colisiones.
+    tasks = [(lead_id, agency_id) for lead_id in leads for agency_id in agencies]
+    rng.shuffle(tasks)
+    outcomes: Counter[str] = Counter()
+    outcomes_lock = threading.Lock()
+
+    def attempt(task: tuple[str, str]) -> None:
+        lead_id, agency_id = task
+        db = SessionLocal()
+        try:
+            for step, action in (
+                ("reserve", lambda: reserve(db, lead_id, agency_id)),
+                ("sell", lambda: sell(db, lead_id, agency_id, price_eur=40)),
+            ):
+                try:
+                    action()
+                    outcome = "ok"
+                except ApiException as exc:
+                    outcome = exc.code
+                except Exception as exc:
+                    # Carrera no controlada (p.ej. IntegrityError): en la API sería un 500.
+                    outcome = f"error:{type(exc).__name__}"
+                    db.rollback()
+                with outcomes_lock:
+                    outcomes[f"{step}:{outcome}"] += 1
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(attempt, tasks))
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        sales = {lead_id: agency_id for lead_id, agency_id in db.query(LeadSale.lead_id, LeadSale.agency_id)}
+        reservations = {
+            lead_id: agency_id for lead_id, agency_id in db.query(LeadReservation.lead_id, LeadReservation.agency_id)
+        }
+    finally:
+        db.close()
+
+    sold_to_reserver = sum(1 for lead_id, agency_id in sales.items() if reservations.get(lead_id) == agency_id)
+    errors = sum(count for key, count in outcomes.items() if ":error:" in key)
+    ok = len(sales) == len(leads) and sold_to_reserver == len(leads) and errors == 0
+
+    print(f"[bench] mode={mode} ops={len(tasks) * 2} workers={args.workers} {len(tasks) * 2 / elapsed:.0f} ops/s")
+    print(f"[bench]   vendidos={len(sales)}/{len(leads)} a_quien_reservo={sold_to_reserver} errores={errors}")
+    print(f"[bench]   {dict(sorted(outcomes.items()))}")
+    print(f"[bench]   {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main() -> int:
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        db_path = Path(tempfile.mkdtemp()) / "bench_commercial.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("FEATURE_RESERVATIONS", "true")
+
+    modes = ["legacy", "atomic"] if args.mode == "both" else [args.mode]
+    results = {mode: run_mode(mode, args) for mode in modes}
+    # Solo el camino atómico debe ser correcto; legacy se mide como referencia.
+    return 0 if results.get("atomic", True) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Benchmark del motor IEI en lote (columnar) frente al camino escalar `compute_iei`."""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from iei_engine import LeadInput, OwnerSignals, PropertyFeatures, compute_iei  # noqa: E402
+from iei_engine_batch import (  # noqa: E402
+    EXCLUSIVITIES,
+    LISTING_STATUSES,
+    MOTIVATIONS,
+    PROPERTY_CONDITIONS,
+    PROPERTY_TYPES,
+    SALE_HORIZONS,
+    LeadBatch,
+    compute_iei_batch,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark compute_iei vs compute_iei_batch")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla reproducible")
+    parser.add_argument("--n", type=int, default=1_000_000, help="Leads en el lote columnar")
+    parser.add_argument("--scalar-sample", type=int, default=50_000, help="Leads para medir el camino escalar")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (se toma la mejor)")
+    return parser.parse_args()
+
+
+def synthetic_batch(rng: np.random.Generator, n: int) -> LeadBatch:
+    has_terrace = rng.random(n) < 0.5
+    terrace_m2 = np.where(rng.random(n) < 0.4, rng.uniform(4, 40, n).round(1), np.nan)
+    expected = np.where(rng.random(n) < 0.12, np.nan, rng.uniform(150_000, 700_000, n).round(2))
+    return LeadBatch(
+        zones=("castelldefels", "gava", "sitges"),
+        zone=rng.integers(0, 3, n, dtype=np.int32),
+        property_type=rng.integers(0, len(PROPERTY_TYPES), n, dtype=np.int8),
+        m2=rng.uniform(40, 200, n).round(1),
+        condition=rng.integers(0, len(PROPERTY_CONDITIONS), n, dtype=np.int8),
+        has_elevator=rng.random(n) < 0.6,
+        has_terrace=has_terrace,
+        terrace_m2=np.where(has_terrace, terrace_m2, np.nan),
+        has_parking=rng.random(n) < 0.4,
+        has_views=rng.random(n) < 0.25,
+        sale_horizon=rng.integers(0, len(SALE_HORIZONS), n, dtype=np.int8),
+        motivation=rng.integers(0, len(MOTIVATIONS), n, dtype=np.int8),
+        already_listed=rng.integers(0, len(LISTING_STATUSES), n, dtype=np.int8),
+        exclusivity=rng.integers(0, len(EXCLUSIVITIES), n, dtype=np.int8),
+        expected_price=expected,
+    )
+
+
+def lead_at(batch: LeadBatch, i: int) -> LeadInput:
+    terrace_m2 = float(batch.terrace_m2[i])
+    expected = float(batch.expected_price[i])
+    return LeadInput(
+        property=PropertyFeatures(
+            zone_key=batch.zones[int(batch.zone[i])],
+            municipality="Bench",
+            neighborhood=None,
+            postal_code=None,
+            property_type=PROPERTY_TYPES[int(batch.property_type[i])],
+            m2=float(batch.m2[i]),
+            condition=PROPERTY_CONDITIONS[int(batch.condition[i])],
+            has_elevator=bool(batch.has_elevator[i]),
+            has_terrace=bool(batch.has_terrace[i]),
+            terrace_m2=None if np.isnan(terrace_m2) else terrace_m2,
+            has_parking=bool(batch.has_parking[i]),
+            has_views=bool(batch.has_views[i]),
+        ),
+        owner=OwnerSignals(
+            sale_horizon=SALE_HORIZONS[int(batch.sale_horizon[i])],
+            motivation=MOTIVATIONS[int(batch.motivation[i])],
+            already_listed=LISTING_STATUSES[int(batch.already_listed[i])],
+            exclusivity=EXCLUSIVITIES[int(batch.exclusivity[i])],
+            expected_price=None if np.isnan(expected) else expected,
+        ),
+    )
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    batch = synthetic_batch(rng, args.n)
+    batch_seconds = best_of(args.repeat, lambda: compute_iei_batch(batch))
+    batch_rate = args.n / batch_seconds
+
+    # El camino escalar se mide sobre una muestra del mismo lote (1M leads escalares tarda minutos)
+    sample_idx = random.Random(args.seed).sample(range(args.n), min(args.scalar_sample, args.n))
+    sample_leads = [lead_at(batch, i) for i in sample_idx]
+
+    def run_scalar() -> None:
+        for lead in sample_leads:
+            compute_iei(lead)
+
+    scalar_seconds = best_of(args.repeat, run_scalar)
+    scalar_rate = len(sample_leads) / scalar_seconds
+
+    # Verificación de paridad sobre la muestra
+    result = compute_iei_batch(batch)
+    mismatches = sum(1 for lead, i in zip(sample_leads, sample_idx) if result.result(i) != compute_iei(lead))
+
+    print(f"[bench] batch  : {args.n:>9} leads en {batch_seconds:.3f}s -> {batch_rate:,.0f} leads/s")
+    print(f"[bench] scalar : {len(sample_leads):>9} leads en {scalar_seconds:.3f}s -> {scalar_rate:,.0f} leads/s")
+    print(f"[bench] speedup: {batch_rate / scalar_rate:.1f}x")
+    print(f"[bench] paridad: {len(sample_leads) - mismatches}/{len(sample_leads)} resultados idénticos")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
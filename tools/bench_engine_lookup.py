@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Microbenchmark: tablas precalculadas (INTENTION_TABLE / MARKET_TABLE) frente a las reglas."""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import iei_engine as engine  # noqa: E402
+from simulate_leads import generate_synthetic_leads  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Microbenchmark de la parte discreta del IEI score")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla reproducible")
+    parser.add_argument("--n", type=int, default=5000, help="Leads sintéticos por pasada")
+    parser.add_argument("--repeat", type=int, default=7, help="Repeticiones (se toma la mejor)")
+    return parser.parse_args()
+
+
+def best_ns_per_lead(fn, n: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) / n * 1e9
+
+
+def report(label: str, rules_ns: float, lookup_ns: float) -> None:
+    print(f"[bench] {label:<14} reglas {rules_ns:8.0f} ns | tablas {lookup_ns:8.0f} ns | {rules_ns / lookup_ns:5.2f}x")
+
+
+def main() -> int:
+    args = parse_args()
+    leads = generate_synthetic_leads(random.Random(args.seed), args.n, list(engine.BASE_PRICE_PER_M2))
+    estimates = [engine.estimate_price(lead.property) for lead in leads]
+    pairs = list(zip(leads, estimates))
+
+    report(
+        "intencion",
+        best_ns_per_lead(lambda: [engine._intention_score(lead.owner) for lead in leads], args.n, args.repeat),
+        best_ns_per_lead(lambda: [engine._intention_score_lookup(lead.owner) for lead in leads], args.n, args.repeat),
+    )
+    report(
+        "mercado",
+        best_ns_per_lead(lambda: [engine._market_score(lead.property, est) for lead, est in pairs], args.n, args.repeat),
+        best_ns_per_lead(
+            lambda: [engine._market_score_lookup(lead.property, est) for lead, est in pairs], args.n, args.repeat
+        ),
+    )
+    report(
+        "compute_iei",
+        best_ns_per_lead(lambda: [engine.compute_iei(lead, precomputed=False) for lead in leads], args.n, args.repeat),
+        best_ns_per_lead(lambda: [engine.compute_iei(lead) for lead in leads], args.n, args.repeat),
+    )
+
+    mismatches = sum(1 for lead in leads if engine.compute_iei(lead) != engine.compute_iei(lead, precomputed=False))
+    print(f"[bench] paridad: {args.n - mismatches}/{args.n} resultados idénticos")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Sobrecoste por petición de la pila de middlewares (in-process, sin red, SQLite temporal).
+
+Monta la misma app con tres pilas y llama a la app ASGI directamente:
+- `none`: sin RequestID ni rate limit (referencia).
+- `base_http`: las versiones anteriores sobre `BaseHTTPMiddleware` (RequestID + deque por clave).
+- `asgi`: las actuales (`RequestIDMiddleware` + `RateLimitMiddleware`, ASGI puro).
+- `asgi_metrics`: `asgi` + `MetricsMiddleware` (histogramas por ruta y SQL por petición).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from pathlib import Path
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+SCORE_BODY = {
+    "property": {
+        "zone_key": "castelldefels",
+        "municipality": "Castelldefels",
+        "property_type": "piso",
+        "m2": 95,
+        "condition": "reformado",
+        "has_elevator": True,
+        "has_terrace": True,
+        "terrace_m2": 12,
+        "has_parking": True,
+        "has_views": False,
+    },
+    "owner": {
+        "sale_horizon": "<3m",
+        "motivation": "traslado",
+        "already_listed": "no",
+        "exclusivity": "si",
+        "expected_price": 390000,
+    },
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de middlewares ASGI")
+    parser.add_argument("--requests", type=int, default=5000, help="Peticiones por endpoint y pila")
+    parser.add_argument("--rounds", type=int, default=3, help="Rondas (se reporta la mejor)")
+    return parser.parse_args()
+
+
+def legacy_middlewares():
+    """Copias de los middlewares anteriores, solo como referencia del benchmark."""
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import JSONResponse
+
+    from api.settings import get_settings
+    from api.utils.ip_hash import request_ip_hash
+
+    class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+            request.state.request_id = request_id
+            response = await call_next(request)
+            response.headers["x-request-id"] = request_id
+            return response
+
+    class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+        _lock = threading.Lock()
+        _hits: dict[str, deque[float]] = defaultdict(deque)
+
+        async def dispatch(self, request, call_next):
+            path = request.url.path
+            if path.startswith("/api/admin") or path == "/health":
+                return await call_next(request)
+            settings = get_settings()
+            key = f"{request_ip_hash(request)}:{path}"
+            window_start = time.time() - 60.0
+            with self._lock:
+                queue = self._hits[key]
+                while queue and queue[0] < window_start:
+                    queue.popleft()
+                if len(queue) >= settings.rate_limit_per_minute:
+                    return JSONResponse(status_code=429, content={"error": {"code": "RATE_LIMITED"}})
+                queue.append(time.time())
+            return await call_next(request)
+
+    return LegacyRequestIDMiddleware, LegacyRateLimitMiddleware
+
+
+def build_app(stack: str):
+    from fastapi import FastAPI
+
+    from api.errors import register_exception_handlers
+    from api.middleware.metrics import MetricsMiddleware
+    from api.middleware.rate_limit import GcraRateLimiter, RateLimitMiddleware
+    from api.middleware.request_id import RequestIDMiddleware
+    from api.routes import iei
+
+    app = FastAPI()
+    if stack == "base_http":
+        request_id_cls, rate_limit_cls = legacy_middlewares()
+        app.add_middleware(request_id_cls)
+        app.add_middleware(rate_limit_cls)
+    elif stack in ("asgi", "asgi_metrics"):
+        app.add_middleware(RequestIDMiddleware)
+        app.add_middleware(RateLimitMiddleware, limiter=GcraRateLimiter())
+        if stack == "asgi_metrics":
+            app.add_middleware(MetricsMiddleware, routes=app.routes)
+    register_exception_handlers(app)
+    app.include_router(iei.router)
+
+    @app.get("/health")
+    def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    return app
+
+
+async def call(app, method: str, path: str, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, method: str, path: str, body: bytes, n: int) -> float:
+    for _ in range(50):
+        await call(app, method, path, body)
+    started = time.perf_counter()
+    for _ in range(n):
+        status = await call(app, method, path, body)
+        if status != 200:
+            raise SystemExit(f"[bench] FAIL {path}: status={status}")
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def main() -> int:
+    args = parse_args()
+    db_path = Path(tempfile.mkdtemp()) / "bench_middleware.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("USE_DB_ZONES", "false")
+    os.environ["RATE_LIMIT_PER_MINUTE"] = str(10**9)
+
+    from api.db import Base, SessionLocal, engine
+    from api.services.zone_registry import zone_registry
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        zone_registry.refresh(db)
+    finally:
+        db.close()
+
+    endpoints = [("GET", "/health", b""), ("POST", "/api/iei/score", json.dumps(SCORE_BODY).encode())]
+    stacks = ["none", "base_http", "asgi", "asgi_metrics"]
+    apps = {stack: build_app(stack) for stack in stacks}
+    for method, path, body in endpoints:
+        results = {
+            stack: min(asyncio.run(measure(apps[stack], method, path, body, args.requests)) for _ in range(args.rounds))
+            for stack in stacks
+        }
+        baseline = results["none"]
+        line = "  ".join(
+            f"{stack}={us:.1f}us (+{us - baseline:.1f})" if stack != "none" else f"{stack}={us:.1f}us"
+            for stack, us in results.items()
+        )
+        print(f"[bench] {method} {path}: {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
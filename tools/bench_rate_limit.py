@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Memoria y coste por petición del rate limit bajo una inundación de IPs únicas (reloj simulado).
+
+Compara el backend elegido (`memory` = `GcraRateLimiter`, `sqlite` = `SqliteRateLimiter` en un fichero
+temporal) con el esquema anterior (deque de timestamps por clave, sin expulsión).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from pathlib import Path
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de memoria del rate limit")
+    parser.add_argument("--n", type=int, default=1_000_000, help="Peticiones, cada una de una IP distinta")
+    parser.add_argument("--rps", type=float, default=20_000, help="Ritmo simulado de la inundación")
+    parser.add_argument("--limit", type=int, default=120, help="Peticiones por minuto por clave")
+    parser.add_argument("--legacy-n", type=int, default=100_000, help="Peticiones para el esquema anterior (0 = omitir)")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory", help="Backend a medir")
+    parser.add_argument("--checkpoints", type=int, default=5, help="Mediciones de memoria durante la inundación")
+    return parser.parse_args()
+
+
+def flood_key(i: int) -> str:
+    # Misma forma que la clave real: hash de IP (64 hex) + ruta.
+    return f"{i:064x}:/api/iei/score"
+
+
+def run_gcra(args: argparse.Namespace) -> None:
+    from api.middleware.rate_limit import build_rate_limiter
+
+    limiter = build_rate_limiter(args.backend)
+    step = 1.0 / args.rps
+    every = max(1, args.n // args.checkpoints)
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(args.n):
+        limiter.hit(flood_key(i), args.limit, now=i * step)
+        if (i + 1) % every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"[bench] {args.backend:<6} {i + 1:>9} peticiones  claves={limiter.stats()['keys']:>7}  mem={current / 1e6:7.1f}MB")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = limiter.stats()
+    print(
+        f"[bench] {args.backend:<6} pico={peak / 1e6:.1f}MB  expiradas={stats['expired']}  "
+        f"expulsadas={stats.get('evicted', 0)}  {elapsed / args.n * 1e6:.2f}us/peticion (con tracemalloc)"
+    )
+
+
+def run_legacy(args: argparse.Namespace) -> None:
+    hits: dict[str, deque[float]] = defaultdict(deque)
+    step = 1.0 / args.rps
+    n = args.legacy_n
+    every = max(1, n // args.checkpoints)
+    tracemalloc.start()
+    for i in range(n):
+        now = i * step
+        queue = hits[flood_key(i)]
+        while queue and queue[0] < now - 60.0:
+            queue.popleft()
+        if len(queue) < args.limit:
+            queue.append(now)
+        if (i + 1) % every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"[bench] legacy {i + 1:>9} peticiones  claves={len(hits):>7}  mem={current / 1e6:7.1f}MB")
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"[bench] legacy crece linealmente: ~{current / 1e6 * args.n / n:.0f}MB extrapolado a {args.n} IPs")
+
+
+def main() -> int:
+    args = parse_args()
+    os.environ["RATE_LIMIT_SQLITE_PATH"] = str(Path(tempfile.mkdtemp()) / "bench_rate_limit.sqlite3")
+    run_gcra(args)
+    if args.legacy_n > 0:
+        run_legacy(args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Latencia de POST /api/iei/score:batch (in-process, TestClient + SQLite temporal)."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de /api/iei/score:batch")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla reproducible")
+    parser.add_argument("--items", type=int, default=1000, help="Items por lote")
+    parser.add_argument("--requests", type=int, default=50, help="Lotes a enviar")
+    return parser.parse_args()
+
+
+def random_item(rng: random.Random) -> dict:
+    return {
+        "property": {
+            "zone_key": rng.choice(["castelldefels", "gava", "sitges"]),
+            "municipality": "Bench",
+            "property_type": rng.choice(["piso", "atico", "planta_baja", "casa_adosada", "chalet"]),
+            "m2": round(rng.uniform(40, 200), 1),
+            "condition": rng.choice(["reformado", "buen_estado", "a_reformar_parcial", "a_reformar_integral"]),
+            "has_elevator": rng.random() < 0.6,
+            "has_terrace": rng.random() < 0.5,
+            "terrace_m2": rng.choice([None, 8, 20]),
+            "has_parking": rng.random() < 0.4,
+            "has_views": rng.random() < 0.25,
+        },
+        "owner": {
+            "sale_horizon": rng.choice(["<3m", "3-6m", "6-12m", "valorando"]),
+            "motivation": rng.choice(["traslado", "herencia", "mejora", "inversion", "otro"]),
+            "already_listed": rng.choice(["no", "si_con_agencia", "si_por_su_cuenta"]),
+            "exclusivity": rng.choice(["si", "depende", "no"]),
+            "expected_price": rng.choice([None, round(rng.uniform(150000, 700000), 2)]),
+        },
+    }
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main() -> int:
+    args = parse_args()
+    db_path = Path(tempfile.mkdtemp()) / "bench_score_batch.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("USE_DB_ZONES", "true")
+    os.environ["RATE_LIMIT_PER_MINUTE"] = str(10**9)
+    os.environ["SCORE_BATCH_MAX_ITEMS"] = str(max(args.items, 1000))
+
+    from fastapi.testclient import TestClient
+
+    from api.main import app
+
+    rng = random.Random(args.seed)
+    latencies: list[float] = []
+    with TestClient(app) as client:
+        for _ in range(args.requests):
+            body = {"items": [random_item(rng) for _ in range(args.items)]}
+            started = time.perf_counter()
+            resp = client.post("/api/iei/score:batch", json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if resp.status_code != 200 or resp.json()["failed"]:
+                print(f"[bench] FAIL: status={resp.status_code}")
+                return 1
+
+    print(f"[bench] {args.requests} lotes x {args.items} items")
+    print(f"[bench] p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms p99={percentile(latencies, 99):.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Importación masiva de leads (NDJSON o CSV) contra la base de datos de DATABASE_URL."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Importador masivo de leads")
+    parser.add_argument("path", type=str, help="Fichero .ndjson/.jsonl o .csv")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None, help="Por defecto, según extensión")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Filas por transacción (LEAD_IMPORT_CHUNK_SIZE)")
+    parser.add_argument(
+        "--rejects-out",
+        type=str,
+        default=None,
+        help="Ruta opcional NDJSON con los rechazos por fila",
+    )
+    parser.add_argument("--create-tables", action="store_true", help="Ejecuta create_all antes de importar")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    from api.db import Base, SessionLocal, engine
+    from api.errors import ApiException
+    from api.services.lead_import import LeadImportService, iter_records
+
+    path = Path(args.path)
+    import_format = args.format or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+
+    if args.create_tables:
+        Base.metadata.create_all(bind=engine)
+
+    started = time.perf_counter()
+
+    def on_progress(report) -> None:
+        elapsed = time.perf_counter() - started
+        print(
+            f"[import] chunk={report.chunks} recibidos={report.received} importados={report.imported} "
+            f"duplicados={report.duplicates} rechazados={report.rejected} ({report.received / elapsed:.0f} filas/s)",
+            file=sys.stderr,
+        )
+
+    db = SessionLocal()
+    try:
+        with path.open(encoding="utf-8-sig", newline="") as handle:
+            report = LeadImportService.import_records(
+                db,
+                iter_records(handle, import_format),
+                chunk_size=args.chunk_size,
+                on_progress=on_progress,
+            )
+    except ApiException as exc:
+        print(f"[import] error: {exc.code} {exc.message} {exc.details}", file=sys.stderr)
+        return 2
+    finally:
+        db.close()
+
+    if args.rejects_out:
+        out = Path(args.rejects_out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", encoding="utf-8") as handle:
+            for reject in report.rejects:
+                handle.write(json.dumps(reject, ensure_ascii=False) + "\n")
+
+    summary = report.as_dict()
+    summary.pop("rejects")
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0 if report.rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Carga sostenida contra la API real (uvicorn en subproceso) con `DB_ASYNC=false` y `DB_ASYNC=true`.
+
+Cada modo arranca su propio servidor sobre una DB limpia (SQLite temporal o `--database-url`), lo satura
+con `--concurrency` clientes durante `--duration` segundos y reporta RPS sostenidos y latencias p50/p99.
+Con `--pool TAMAÑO:OVERFLOW[:PRE_PING]` (repetible) se repite cada modo por configuración del pool y se
+añade la espera media de checkout y los timeouts que el servidor expone en `/metrics`.
+Con SQLite el resultado mide sobre todo el driver; la diferencia relevante (threadpool frente a event loop
+esperando red) aparece contra Postgres.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+# Permite ejecutar el script desde /tools sin instalar paquete.
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+# Token de scraping solo para el servidor que lanza este script (lectura del pool en `/metrics`).
+METRICS_TOKEN = secrets.token_urlsafe(16)
+
+SCORE_BODY = {
+    "property": {
+        "zone_key": "castelldefels",
+        "municipality": "Castelldefels",
+        "property_type": "piso",
+        "m2": 95,
+        "condition": "reformado",
+        "has_elevator": True,
+        "has_terrace": True,
+        "terrace_m2": 12,
+        "has_parking": True,
+        "has_views": False,
+    },
+    "owner": {
+        "sale_horizon": "<3m",
+        "motivation": "traslado",
+        "already_listed": "no",
+        "exclusivity": "si",
+        "expected_price": 390000,
+    },
+}
+
+ENDPOINTS = ("leads", "score", "events")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Test de carga sync vs async de los endpoints públicos")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--endpoint", choices=[*ENDPOINTS, "mix"], default="leads", help="mix = reparto 1/1/1")
+    parser.add_argument("--concurrency", type=int, default=64, help="Clientes simultáneos")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de carga por modo")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn")
+    parser.add_argument(
+        "--pool",
+        action="append",
+        default=None,
+        metavar="SIZE:OVERFLOW[:PRE_PING]",
+        help="Configuración del pool (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING); repetible",
+    )
+    parser.add_argument("--pool-timeout", type=float, default=30.0, help="DB_POOL_TIMEOUT_SECONDS del servidor")
+    parser.add_argument(
+        "--database-url",
+        type=str,
+        default=None,
+        help="Por defecto, SQLite temporal por modo (con Postgres la DB debe estar vacía o ser desechable)",
+    )
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_pool(spec: str) -> dict[str, str]:
+    size, overflow, *rest = spec.split(":")
+    return {
+        "DB_POOL_SIZE": str(int(size)),
+        "DB_MAX_OVERFLOW": str(int(overflow)),
+        "DB_POOL_PRE_PING": rest[0] if rest else "idle",
+    }
+
+
+def start_server(mode: str, args: argparse.Namespace, port: int, pool: str | None = None) -> subprocess.Popen:
+    env = dict(os.environ)
+    if pool:
+        env.update(parse_pool(pool))
+    env["DB_POOL_TIMEOUT_SECONDS"] = str(args.pool_timeout)
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        env["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / f'load_{mode}.db'}"
+    env["DB_ASYNC"] = "true" if mode == "async" else "false"
+    # Se mide la ruta de la DB, no el rate limit.
+    env["RATE_LIMIT_PER_MINUTE"] = str(10**9)
+    env["RATE_LIMIT_LEADS_PER_MINUTE"] = str(10**9)
+    env["RATE_LIMIT_BACKEND"] = "memory"
+    env["METRICS_TOKEN"] = METRICS_TOKEN
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "api.main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(args.workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise SystemExit(f"[load] el servidor terminó al arrancar (exit={server.returncode})")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise SystemExit("[load] el servidor no respondió a /health")
+
+
+def build_request(endpoint: str, n: int, run_id: str) -> tuple[str, dict]:
+    if endpoint == "score":
+        return "/api/iei/score", SCORE_BODY
+    if endpoint == "events":
+        return "/api/events", {
+            "event_name": "view_form",
+            "event_version": "v1",
+            "session_id": f"load-{run_id}-{n % 1000}",
+            "payload": {"n": n},
+        }
+    # Teléfono distinto por petición: cada lead se inserta (sin cortar por dedupe).
+    return "/api/leads", {
+        "lead": {
+            "owner_name": "Load Test",
+            "owner_phone": f"+346{run_id}{n:08d}"[:16],
+            "consent_contact": True,
+            "consent_text_version": "v1",
+        },
+        "input": SCORE_BODY,
+    }
+
+
+async def drive(base_url: str, args: argparse.Namespace, run_id: str) -> tuple[list[float], Counter[int], float]:
+    endpoints = ENDPOINTS if args.endpoint == "mix" else (args.endpoint,)
+    counter = itertools.count()
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+
+        async def worker(until: float, record: bool) -> None:
+            while time.monotonic() < until:
+                n = next(counter)
+                path, body = build_request(endpoints[n % len(endpoints)], n, run_id)
+                started = time.perf_counter()
+                try:
+                    status = (await client.post(path, json=body)).status_code
+                except httpx.TransportError:
+                    status = 0
+                if record:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses[status] += 1
+
+        if args.warmup > 0:
+            until = time.monotonic() + args.warmup
+            await asyncio.gather(*(worker(until, False) for _ in range(args.concurrency)))
+
+        started = time.monotonic()
+        until = started + args.duration
+        await asyncio.gather(*(worker(until, True) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+    return latencies, statuses, elapsed
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def pool_metrics(base_url: str, pool_label: str) -> dict[str, float]:
+    """Espera media de checkout y timeouts del pool, leídos de `/metrics` (un solo worker)."""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        resp = await client.get("/metrics", headers={"authorization": f"Bearer {METRICS_TOKEN}"})
+    if resp.status_code != 200:
+        return {}
+    values = {}
+    for name in ("iei_db_pool_checkout_seconds_sum", "iei_db_pool_checkout_seconds_count", "iei_db_pool_timeouts_total"):
+        match = re.search(rf'^{name}{{pool="{pool_label}"}} (\S+)$', resp.text, re.MULTILINE)
+        values[name] = float(match.group(1)) if match else 0.0
+    count = values["iei_db_pool_checkout_seconds_count"]
+    return {
+        "checkout_avg_ms": values["iei_db_pool_checkout_seconds_sum"] / count * 1000 if count else 0.0,
+        "pool_timeouts": values["iei_db_pool_timeouts_total"],
+    }
+
+
+def run_mode(mode: str, args: argparse.Namespace, pool: str | None = None) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(mode, args, port, pool)
+    try:
+        asyncio.run(wait_ready(base_url, server))
+        run_id = f"{int(time.time()) % 100:02d}{1 if mode == 'async' else 0}"
+        latencies, statuses, elapsed = asyncio.run(drive(base_url, args, run_id))
+        pool_result = asyncio.run(pool_metrics(base_url, mode)) if pool else {}
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+
+    ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+    result = {
+        "mode": mode,
+        "pool": pool,
+        "requests": len(latencies),
+        "rps": ok / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "errors": len(latencies) - ok,
+        **pool_result,
+    }
+    pool_line = ""
+    if pool:
+        pool_line = (
+            f" pool={pool} checkout_avg={result.get('checkout_avg_ms', 0.0):.2f}ms "
+            f"pool_timeouts={result.get('pool_timeouts', 0.0):.0f}"
+        )
+    print(
+        f"[load] mode={mode:<5} endpoint={args.endpoint} c={args.concurrency}{pool_line} "
+        f"rps={result['rps']:.0f} p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+        f"errores={result['errors']} {dict(sorted(statuses.items()))}"
+    )
+    return result
+
+
+def main() -> int:
+    args = parse_args()
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    if args.pool:
+        pool_results = [run_mode(mode, args, pool) for pool in args.pool for mode in modes]
+        return 0 if all(result["errors"] == 0 for result in pool_results) else 1
+
+    results = {mode: run_mode(mode, args) for mode in modes}
+    if len(results) == 2 and results["sync"]["rps"]:
+        sync, async_ = results["sync"], results["async"]
+        print(
+            f"[load] async/sync: rps x{async_['rps'] / sync['rps']:.2f}  "
+            f"p99 {sync['p99_ms']:.1f}ms -> {async_['p99_ms']:.1f}ms"
+        )
+    return 0 if all(result["errors"] == 0 for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())